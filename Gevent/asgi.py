@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Gevent.settings')
+# Lectures asynchrones des chemins les plus sollicités (events.async_views)
+os.environ.setdefault('GEVENT_ASYNC_READS', '1')
 
 application = get_asgi_application()
@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 from pathlib import Path
 import os
 
+from .database import databases
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -54,6 +56,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'events.replicas.PrimaryAfterWriteMiddleware',
 ]
 
 ROOT_URLCONF = 'Gevent.urls'
@@ -79,12 +82,38 @@ WSGI_APPLICATION = 'Gevent.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DATABASE_URL (SQLite par défaut, PostgreSQL en production) et
+# DATABASE_REPLICA_URL pour lire sur un réplica, voir Gevent/database.py
+
+DATABASES = databases(BASE_DIR)
+DATABASE_ROUTERS = ['events.replicas.ReplicaRouter']
+
+# Après une écriture, lectures de l'utilisateur sur la base principale pendant (secondes)
+REPLICA_STICKY_SECONDS = 10
+
+# Lectures les plus sollicitées servies par des vues asynchrones (events.async_views) :
+# activé par Gevent/asgi.py, les vues DRF synchrones restent utilisées sous WSGI
+ASYNC_READ_VIEWS = os.environ.get('GEVENT_ASYNC_READS', '').lower() in ('1', 'true', 'yes', 'on')
+
+
+# Cache
+# LocMemCache (un processus) en développement ; avec plusieurs workers,
+# définir REDIS_URL pour partager le cache des réponses (paquet redis requis)
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'gevent',
+        }
     }
-}
 
 
 # Password validation
@@ -161,9 +190,46 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
-   
+    'DEFAULT_PAGINATION_CLASS': 'events.pagination.KeysetPagination',
+    'PAGE_SIZE': 20,
 }
 
+# Compte système qui reçoit la TVA (voir reconcile_platform_ledger)
+SYSTEM_ACCOUNT_USERNAME = 'gcash'
+
+# Tâches d'arrière-plan (events.tasks) : pool de threads du processus
+BACKGROUND_TASK_WORKERS = 2
+BACKGROUND_TASKS_EAGER = False
+
+# Annulation d'événement : billets remboursés par transaction (events.cancellation)
+EVENT_CANCELLATION_CHUNK_SIZE = 500
+
+# Score de tendance des événements (events.trending, commande refresh_trending)
+TRENDING_HALF_LIFE_HOURS = 48
+TRENDING_WEIGHTS = {'ticket': 1.0, 'favorite': 0.5, 'review': 0.3}
+TRENDING_POPULAR_COUNT = 20
+# Retard (secondes) de la fin de fenêtre sur l'heure courante : les transactions plus longues sont comptées au passage suivant
+TRENDING_GRACE_SECONDS = 300
+# Intervalle (secondes) du calcul dans le processus web ; None si planifié par cron
+TRENDING_REFRESH_INTERVAL = None
+
+# Rendu des QR codes à la demande (events.qr)
+QR_MEMORY_CACHE_SIZE = 1024
+QR_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'qr')
+
+# Largeurs (px) des variantes responsives des images téléversées (events.images)
+IMAGE_VARIANT_WIDTHS = {'thumb': 160, 'card': 640, 'full': 1280}
+
+# Rayon maximal (km) de /api/events/nearby/ (events.geo)
+NEARBY_MAX_RADIUS_KM = 100
+
+# Cache des réponses en lecture (events.response_cache) : fraîcheur et verrou de recalcul, en secondes
+RESPONSE_CACHE_TIMEOUT = 30
+RESPONSE_CACHE_LOCK_TIMEOUT = 5
+
+# Taille de page maximale demandable via ?page_size=
+PAGINATION_MAX_PAGE_SIZE = 100
+
 # Logging configuration
 LOGGING = {
     'version': 1,
@@ -0,0 +1,90 @@
+"""
+Moteur SQLite pour les déploiements sur un seul serveur
+(ENGINE 'Gevent.sqlite', activé par DATABASE_SQLITE_TUNED=1).
+
+- Journal WAL : les lectures ne bloquent plus l'écrivain ni l'inverse.
+- Transactions d'écriture en BEGIN IMMEDIATE : le verrou d'écriture est pris
+  au début de transaction.atomic(). En BEGIN simple, deux transactions qui
+  ont lu puis veulent écrire échouent aussitôt (« database is locked ») sans
+  que busy_timeout ne serve à rien.
+- busy_timeout : OPTIONS['timeout'] en secondes (paramètre de sqlite3.connect).
+- Si le verrou n'est toujours pas obtenu, l'instruction est réessayée
+  OPTIONS['lock_retries'] fois avec une attente croissante. Seules les
+  instructions hors transaction sont reprises (BEGIN IMMEDIATE, écritures en
+  autocommit) : refusées, elles n'ont rien écrit.
+"""
+import random
+import time
+
+from django.db.backends.sqlite3 import base
+from django.db.backends.sqlite3.base import Database
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    # Sûr en WAL : une coupure de courant peut perdre la dernière transaction, jamais corrompre la base
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,     # 64 Mo (valeur négative : en Kio)
+    'mmap_size': 268435456,   # 256 Mo
+    'temp_store': 'MEMORY',
+}
+
+LOCK_RETRIES = 3
+BACKOFF_BASE = 0.05
+BACKOFF_MAX = 1.0
+
+
+def is_lock_error(exc):
+    message = str(exc)
+    return 'database is locked' in message or 'database is busy' in message
+
+
+def retry_on_lock(func, retries):
+    for attempt in range(retries + 1):
+        try:
+            return func()
+        except Database.OperationalError as exc:
+            if not is_lock_error(exc) or attempt == retries:
+                raise
+        # Attente exponentielle avec gigue : les écrivains en attente ne repartent pas ensemble
+        time.sleep(min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1))
+
+
+class SQLiteCursorWrapper(base.SQLiteCursorWrapper):
+    lock_retries = LOCK_RETRIES
+
+    def execute(self, query, params=None):
+        if self.connection.in_transaction:
+            return super().execute(query, params)
+        return retry_on_lock(lambda: super(SQLiteCursorWrapper, self).execute(query, params), self.lock_retries)
+
+    def executemany(self, query, param_list):
+        if self.connection.in_transaction:
+            return super().executemany(query, param_list)
+        return retry_on_lock(
+            lambda: super(SQLiteCursorWrapper, self).executemany(query, param_list), self.lock_retries
+        )
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = {**PRAGMAS, **params.pop('pragmas', {})}
+        self.lock_retries = params.pop('lock_retries', LOCK_RETRIES)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def create_cursor(self, name=None):
+        return self.connection.cursor(factory=self._cursor_factory)
+
+    def _cursor_factory(self, conn):
+        cursor = SQLiteCursorWrapper(conn)
+        cursor.lock_retries = self.lock_retries
+        return cursor
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import User, Category, Event, EventImage, Attendee, Ticket, Order, Review, Favorite, WalletTransaction, TicketCategory
+from django.utils import timezone
+from .response_cache import invalidate_on_commit
+from .models import User, Category, Event, EventImage, Attendee, Ticket, Order, Review, Favorite, WalletTransaction, TicketCategory, PlatformLedgerEntry, TicketScan, EventCancellationJob
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
@@ -31,12 +33,14 @@ class EventAdmin(admin.ModelAdmin):
     actions = ['approve_events', 'reject_events']
     
     def approve_events(self, request, queryset):
-        queryset.update(is_approved=True)
+        queryset.update(is_approved=True, updated_at=timezone.now())
+        invalidate_on_commit('events')  # UPDATE sans signal post_save
         self.message_user(request, f"{queryset.count()} événements approuvés.")
     approve_events.short_description = "Approuver les événements sélectionnés"
     
     def reject_events(self, request, queryset):
-        queryset.update(is_approved=False)
+        queryset.update(is_approved=False, updated_at=timezone.now())
+        invalidate_on_commit('events')
         self.message_user(request, f"{queryset.count()} événements rejetés.")
     reject_events.short_description = "Rejeter les événements sélectionnés"
 
@@ -57,7 +61,7 @@ class TicketAdmin(admin.ModelAdmin):
     list_display = ['code', 'event', 'user', 'status', 'purchase_date']
     list_filter = ['status', 'purchase_date']
     search_fields = ['code', 'user__username', 'event__title']
-    readonly_fields = ['code', 'qr_code', 'tva_amount', 'price_ttc']
+    readonly_fields = ['code', 'qr_payload', 'tva_amount', 'price_ttc']
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
@@ -84,3 +88,23 @@ class WalletTransactionAdmin(admin.ModelAdmin):
     list_filter = ['transaction_type', 'created_at']
     search_fields = ['user__username', 'description']
     readonly_fields = ['balance_before', 'balance_after', 'created_at']
+
+@admin.register(PlatformLedgerEntry)
+class PlatformLedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ['entry_type', 'amount', 'order', 'ticket', 'reconciled_at', 'created_at']
+    list_filter = ['entry_type', 'reconciled_at', 'created_at']
+    search_fields = ['description']
+    readonly_fields = ['entry_type', 'amount', 'order', 'ticket', 'reconciled_at', 'created_at']
+
+@admin.register(TicketScan)
+class TicketScanAdmin(admin.ModelAdmin):
+    list_display = ['event', 'gate', 'result', 'source', 'latency_ms', 'created_at']
+    list_filter = ['result', 'source', 'created_at']
+    search_fields = ['gate', 'ticket__code', 'event__title']
+
+@admin.register(EventCancellationJob)
+class EventCancellationJobAdmin(admin.ModelAdmin):
+    list_display = ['event', 'status', 'processed_tickets', 'total_tickets', 'refunded_amount', 'created_at', 'finished_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['event__title']
+    readonly_fields = ['created_at', 'updated_at', 'finished_at']
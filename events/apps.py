@@ -1,5 +1,14 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class EventsConfig(AppConfig):
     name = 'events'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        interval = getattr(settings, 'TRENDING_REFRESH_INTERVAL', None)
+        if interval:
+            from .trending import start_scheduler
+            start_scheduler(interval)
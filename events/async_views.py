@@ -0,0 +1,140 @@
+"""
+Lectures asynchrones des chemins les plus sollicités, servies sous ASGI
+(Gevent/asgi.py) : liste et détail des événements, événements à venir,
+catégories et billets.
+
+Chaque vue asynchrone reprend le viewset DRF de son URL (queryset, filtres,
+plan de requêtes, sérialiseur, pagination, ETag, cache, réplica) mais lit la
+base avec l'ORM asynchrone (aget, aiterator, aaggregate) et le cache avec son
+API asynchrone : un client lent ou une base occupée ne retient plus de thread
+du serveur. Les objets sont entièrement chargés avant d'être sérialisés dans
+la boucle d'événements ; une requête SQL oubliée lèverait
+SynchronousOnlyOperation.
+
+Les contrôles de APIView.initial (version, permissions, limites de débit)
+sont appliqués tels quels et les erreurs (401, 403, 404, 429) rendues par le
+gestionnaire d'exceptions de DRF. Le reste (écritures, API navigable, suffixes
+de format, identifiants invalides) est délégué à la vue DRF synchrone de la
+même URL.
+"""
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from django.urls import URLPattern
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .replicas import replica_reads
+
+# Routes du routeur DRF dont le GET est servi en asynchrone
+ASYNC_READ_ROUTES = {'event-list', 'event-detail', 'event-upcoming', 'category-list', 'ticket-list'}
+
+
+async def aauthenticate(request):
+    """
+    (utilisateur, jeton) comme DEFAULT_AUTHENTICATION_CLASSES : jeton, puis
+    session. None si les identifiants fournis sont invalides.
+    """
+    auth = get_authorization_header(request).split()
+    if auth and auth[0].lower() == TokenAuthentication.keyword.lower().encode():
+        if len(auth) != 2:
+            return None
+        try:
+            token = await Token.objects.select_related('user').aget(key=auth[1].decode())
+        except (Token.DoesNotExist, UnicodeError):
+            return None
+        return (token.user, token) if token.user.is_active else None
+
+    auser = getattr(request, 'auser', None)
+    if auser is None:
+        return None
+    user = await auser()
+    if user.is_authenticated and not user.is_active:
+        return None
+    return user, None
+
+
+class AsyncReadMixin:
+    """`alist` et `aretrieve` d'un viewset paginé (PaginatedActionMixin)"""
+
+    async def alist(self, request, *args, **kwargs):
+        return await self.apaginated_response(self.filter_queryset(self.get_queryset()))
+
+    async def aget_object(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (queryset.model.DoesNotExist, TypeError, ValueError, ValidationError):
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        await self.aprepare_objects([instance])
+        return Response(self.get_serializer(instance).data)
+
+
+class AsyncReadView(View):
+    """GET servi par l'action asynchrone du viewset de `fallback`, tout le reste par `fallback`"""
+    fallback = None  # Vue DRF générée par le routeur pour la même URL
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD') and 'format' not in kwargs:
+            response = await self.get(request, *args, **kwargs)
+            if response is not None:
+                return response
+        return await sync_to_async(self.fallback)(request, *args, **kwargs)
+
+    async def get(self, request, *args, **kwargs):
+        """Réponse asynchrone, ou None pour laisser la vue DRF répondre"""
+        credentials = await aauthenticate(request)
+        if credentials is None:
+            return None
+        view = self.initialize_viewset(request, *credentials, kwargs)
+        try:
+            # API navigable : rendue par la vue synchrone
+            renderer, media_type = view.perform_content_negotiation(view.request)
+            if not isinstance(renderer, JSONRenderer):
+                return None
+            # Négociation, version, permissions et limites de débit, comme APIView.dispatch
+            view.initial(view.request, **kwargs)
+            async with replica_reads(view, view.request):
+                response = await getattr(view, f'a{view.action}')(view.request, **kwargs)
+        except Exception as exc:
+            response = view.handle_exception(exc)
+
+        response = view.finalize_response(view.request, response)
+        if isinstance(response, Response):
+            response.render()
+        return response
+
+    def initialize_viewset(self, request, user, auth, kwargs):
+        """Le viewset tel que DRF le prépare avant l'action, sans l'authentification synchrone"""
+        view = self.fallback.cls(**self.fallback.initkwargs)
+        action = self.fallback.actions['get']
+        view.action_map = {'get': action, 'head': action}
+        view.args, view.kwargs = (), kwargs
+        view.format_kwarg = None
+
+        drf_request = view.initialize_request(request, **kwargs)
+        drf_request.user, drf_request.auth = user, auth
+        view.request = drf_request
+        view.headers = view.default_response_headers
+        return view
+
+
+def async_read_urls(patterns):
+    """Routes du routeur DRF, celles de ASYNC_READ_ROUTES servies par AsyncReadView"""
+    return [
+        URLPattern(
+            pattern.pattern, csrf_exempt(AsyncReadView.as_view(fallback=pattern.callback)),
+            pattern.default_args, pattern.name,
+        ) if pattern.name in ASYNC_READ_ROUTES else pattern
+        for pattern in patterns
+    ]
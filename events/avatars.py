@@ -0,0 +1,114 @@
+"""
+Avatars par défaut des utilisateurs sans photo de profil.
+
+L'avatar ne dépend que des initiales et de la couleur : il n'est plus écrit
+dans MEDIA_ROOT à l'inscription, les serializers renvoient l'URL partagée
+/api/avatars/<initiales>-<couleur>.png (ou .svg), identique pour tous les
+utilisateurs qui ont les mêmes initiales. L'image est rendue au premier appel
+puis servie depuis un cache LRU en mémoire, et mise en cache par les clients
+et les proxys (URL immuable). La police est chargée une fois par processus.
+"""
+import hashlib
+import zlib
+from functools import lru_cache
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from django.urls import reverse
+from PIL import Image, ImageDraw, ImageFont
+
+AVATAR_CONTENT_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+AVATAR_SIZE = 200
+AVATAR_FONT_SIZE = 80
+# Couleurs de fond (hexadécimal sans #), choisies de façon stable d'après le nom d'utilisateur
+AVATAR_COLORS = ('007bff',)
+
+
+def _initial(name):
+    """Première lettre du nom, en majuscule et sur un seul caractère"""
+    letter = next((char for char in name or '' if char.isalpha()), None)
+    if letter is None:
+        return None
+    return next((char for char in letter.upper() if char.isalpha()), None)
+
+
+def avatar_initials(first_name, last_name):
+    """
+    Initiales en majuscules (deux lettres au plus), None si le prénom ou le
+    nom ne contient aucune lettre. La ponctuation et les chiffres sont
+    ignorés ('Ali -> A) ; une majuscule sur deux lettres est tronquée (ß -> S).
+    """
+    first, last = _initial(first_name), _initial(last_name)
+    if first is None or last is None:
+        return None
+    return f"{first}{last}"
+
+
+def avatar_color(username):
+    return AVATAR_COLORS[zlib.crc32(username.encode('utf-8')) % len(AVATAR_COLORS)]
+
+
+def is_valid_avatar(initials, color):
+    return 1 <= len(initials) <= 2 and initials.isalpha() and initials == initials.upper() and color in AVATAR_COLORS
+
+
+def default_avatar_url(user, request=None, fmt='png'):
+    """URL de l'avatar par défaut de l'utilisateur, None s'il n'a pas de prénom et de nom"""
+    initials = avatar_initials(user.first_name, user.last_name)
+    if initials is None:
+        return None
+    url = reverse('default_avatar', kwargs={'initials': initials, 'color': avatar_color(user.username), 'fmt': fmt})
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def avatar_etag(initials, color, fmt):
+    """ETag fort : l'image dépend uniquement des initiales, de la couleur et du format"""
+    digest = hashlib.sha256(f"{fmt}:{color}:{initials}".encode('utf-8')).hexdigest()
+    return f'"{digest[:40]}"'
+
+
+@lru_cache(maxsize=1)
+def _font():
+    try:
+        return ImageFont.truetype('arial.ttf', AVATAR_FONT_SIZE)
+    except OSError:
+        # Police vectorielle intégrée à Pillow (FreeType), à la bonne taille
+        return ImageFont.load_default(size=AVATAR_FONT_SIZE)
+
+
+def _render_png(initials, color):
+    img = Image.new('RGB', (AVATAR_SIZE, AVATAR_SIZE), color=f'#{color}')
+    draw = ImageDraw.Draw(img)
+    font = _font()
+    bbox = draw.textbbox((0, 0), initials, font=font)
+    x = (AVATAR_SIZE - (bbox[2] - bbox[0])) // 2 - bbox[0]
+    y = (AVATAR_SIZE - (bbox[3] - bbox[1])) // 2 - bbox[1]
+    draw.text((x, y), initials, fill='white', font=font)
+
+    buffer = BytesIO()
+    img.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def _render_svg(initials, color):
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{AVATAR_SIZE}" height="{AVATAR_SIZE}" '
+        f'viewBox="0 0 {AVATAR_SIZE} {AVATAR_SIZE}">'
+        f'<rect width="100%" height="100%" fill="#{color}"/>'
+        f'<text x="50%" y="50%" dy=".35em" text-anchor="middle" fill="#fff" '
+        f'font-family="Arial, Helvetica, sans-serif" font-size="{AVATAR_FONT_SIZE}">{escape(initials)}</text>'
+        f'</svg>'
+    ).encode('utf-8')
+
+
+@lru_cache(maxsize=2048)
+def render_avatar(initials, color, fmt='png'):
+    """Retourne l'image de l'avatar (bytes) au format png ou svg"""
+    if fmt not in AVATAR_CONTENT_TYPES:
+        raise ValueError(f"Format d'avatar non supporté: {fmt}")
+    if fmt == 'svg':
+        return _render_svg(initials, color)
+    return _render_png(initials, color)
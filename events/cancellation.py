@@ -0,0 +1,158 @@
+"""
+Annulation d'un événement en arrière-plan, avec remboursement intégral.
+
+Les billets confirmés sont traités par lots de EVENT_CANCELLATION_CHUNK_SIZE,
+chaque lot dans sa propre transaction :
+
+- remboursements agrégés par acheteur et passés en une seule écriture du
+  grand livre (events.ledger) : soldes mis à jour par F(), débit conditionnel
+  de l'organisateur, transactions wallet en bulk_create ;
+- billets annulés en un UPDATE.
+
+L'avancement est enregistré dans EventCancellationJob après chaque lot. Une
+tâche interrompue (redémarrage, solde organisateur insuffisant) reprend aux
+billets encore confirmés : les lots déjà validés ne sont jamais rejoués.
+"""
+import logging
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .ledger import CENT, PLATFORM, InsufficientFunds, Leg, post_entry
+from .models import Event, EventCancellationJob, Ticket
+from .response_cache import invalidate_on_commit
+from .tasks import run_in_background
+
+logger = logging.getLogger(__name__)
+
+COMMISSION_RATE = Decimal('0.10')
+
+
+class CancellationError(Exception):
+    pass
+
+
+def refund_total(event):
+    """Montant HT restant à reprendre à l'organisateur (billets encore confirmés)"""
+    return Ticket.objects.filter(event=event, status='confirmed').aggregate(
+        total=Sum('price')
+    )['total'] or Decimal('0')
+
+
+def start_cancellation(event, user):
+    """
+    Passe l'événement en `cancelled` (fin des ventes) et planifie les
+    remboursements. Reprend la tâche existante si une annulation précédente
+    n'a pas abouti.
+    """
+    with transaction.atomic():
+        job = (
+            EventCancellationJob.objects.select_for_update()
+            .filter(event=event)
+            .exclude(status='completed')
+            .first()
+        )
+        if job is None:
+            job = EventCancellationJob.objects.create(
+                event=event,
+                requested_by=user,
+                total_tickets=Ticket.objects.filter(event=event, status='confirmed').count()
+            )
+        else:
+            job.status = 'pending'
+            job.error = ''
+            job.save(update_fields=['status', 'error', 'updated_at'])
+
+        Event.objects.filter(pk=event.pk).update(status='cancelled', updated_at=timezone.now())
+        invalidate_on_commit('events')
+        run_in_background(run_cancellation, job.pk)
+    return job
+
+
+def _refund_chunk(job, event, chunk_size):
+    """Rembourse un lot de billets ; retourne le nombre de billets traités"""
+    now = timezone.now()
+
+    with transaction.atomic():
+        tickets = list(
+            Ticket.objects.select_for_update()
+            .filter(event=event, status='confirmed')
+            .order_by('id')
+            .only('id', 'code', 'user_id', 'price')[:chunk_size]
+        )
+        if not tickets:
+            return 0
+
+        refunds = defaultdict(lambda: [Decimal('0'), 0])
+        base_total = Decimal('0')
+        commission_total = Decimal('0')
+        for ticket in tickets:
+            commission = (ticket.price * COMMISSION_RATE).quantize(CENT)
+            refunds[ticket.user_id][0] += ticket.price + commission
+            refunds[ticket.user_id][1] += 1
+            base_total += ticket.price
+            commission_total += commission
+
+        # Rembourser 110% à chaque acheteur : prix HT repris à l'organisateur
+        # (seulement si son solde le permet), commission reprise sur le journal plateforme
+        legs = [
+            Leg(user_id, amount, 'refund',
+                f"Remboursement 110% ({count} billet(s)) - Événement annulé: {event.title}")
+            for user_id, (amount, count) in refunds.items()
+        ]
+        legs.append(Leg(event.organizer_id, -base_total, 'refund',
+                        f"Remboursement 100% ({len(tickets)} billet(s)) - Événement annulé: {event.title}"))
+        legs.append(Leg(PLATFORM, -commission_total, 'vat_refund',
+                        f"Remboursement commission 10% ({len(tickets)} billet(s)) - Événement annulé: {event.title}"))
+        try:
+            post_entry(legs)
+        except InsufficientFunds:
+            raise CancellationError(
+                f"Solde organisateur insuffisant pour rembourser {len(tickets)} billet(s) ({base_total} BIF)"
+            )
+
+        Ticket.objects.filter(pk__in=[ticket.pk for ticket in tickets]).update(
+            status='cancelled', cancelled_at=now, updated_at=now
+        )
+
+        EventCancellationJob.objects.filter(pk=job.pk).update(
+            processed_tickets=F('processed_tickets') + len(tickets),
+            refunded_amount=F('refunded_amount') + base_total + commission_total,
+            updated_at=now
+        )
+    return len(tickets)
+
+
+def run_cancellation(job_id, chunk_size=None):
+    """Exécute (ou reprend) une tâche d'annulation jusqu'au dernier billet"""
+    chunk_size = chunk_size or getattr(settings, 'EVENT_CANCELLATION_CHUNK_SIZE', 500)
+    job = EventCancellationJob.objects.select_related('event').get(pk=job_id)
+    if job.status == 'completed':
+        return job
+
+    event = job.event
+    EventCancellationJob.objects.filter(pk=job.pk).update(status='running', updated_at=timezone.now())
+
+    try:
+        while _refund_chunk(job, event, chunk_size):
+            pass
+    except Exception as e:
+        logger.exception("Échec de l'annulation de l'événement %s", event.pk)
+        EventCancellationJob.objects.filter(pk=job.pk).update(
+            status='failed', error=str(e), updated_at=timezone.now()
+        )
+    else:
+        now = timezone.now()
+        with transaction.atomic():
+            # Restaurer les sièges
+            Event.objects.filter(pk=event.pk).update(available_seats=F('total_capacity'), updated_at=now)
+            EventCancellationJob.objects.filter(pk=job.pk).update(
+                status='completed', finished_at=now, updated_at=now
+            )
+
+    job.refresh_from_db()
+    return job
@@ -0,0 +1,309 @@
+"""
+Contrôle d'accès aux entrées des événements.
+
+- Check-in : passage confirmed -> used par un UPDATE conditionnel, une seule
+  porte peut gagner ; chaque tentative est journalisée dans TicketScan.
+- Validation par lots : les scans mis en tampon par un tourniquet sont
+  résolus en une requête `code__in` et admis en un seul UPDATE.
+- Manifeste hors ligne : liste compacte des billets valides d'un événement,
+  versionnée pour être téléchargée de façon incrémentale par les scanners.
+- Synchronisation des scans hors ligne : les billets scannés sans réseau sont
+  marqués `used` en une transaction, avec rapport des doubles scans.
+"""
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Avg, Count, Max, Q
+from django.db.models.functions import TruncMinute
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Ticket, TicketScan
+
+EVENT_STATUS_MESSAGES = {
+    'upcoming': 'L\'événement n\'a pas encore commencé',
+    'completed': 'L\'événement est déjà terminé',
+    'cancelled': 'L\'événement a été annulé',
+    'deleted': 'L\'événement a été supprimé'
+}
+
+
+def check_in(ticket):
+    """
+    Passe le billet de confirmed à used par un UPDATE conditionnel.
+    Retourne True si cet appel a admis le billet, False si une autre porte l'a déjà fait.
+    """
+    now = timezone.now()
+    won = Ticket.objects.filter(pk=ticket.pk, status='confirmed').update(
+        status='used', used_at=now, updated_at=now
+    ) == 1
+    if won:
+        ticket.status = 'used'
+        ticket.used_at = now
+    return won
+
+
+def record_scan(ticket, user, gate, result, started=None, event_id=None):
+    """Journalise une tentative de scan en ligne (started : time.perf_counter() au début)"""
+    latency_ms = int((time.perf_counter() - started) * 1000) if started is not None else None
+    return TicketScan.objects.create(
+        ticket=ticket,
+        event_id=ticket.event_id if ticket else event_id,
+        scanned_by=user if user and user.is_authenticated else None,
+        gate=gate,
+        result=result,
+        latency_ms=latency_ms
+    )
+
+
+def _batch_item(index, code, result, message, ticket=None):
+    item = {'index': index, 'code': code, 'valid': result == 'admitted', 'result': result, 'message': message}
+    if ticket is not None and result == 'admitted':
+        item['ticket'] = {
+            'id': ticket.id,
+            'holder_name': ticket.holder_name,
+            'ticket_category': ticket.ticket_category.name,
+            'seat': ticket.seat,
+        }
+    return item
+
+
+def validate_batch(payloads, user, gate=''):
+    """
+    Valide une liste de contenus QR avec les mêmes règles que validate_qr
+    (signature, statut du billet, organisateur, événement en cours).
+
+    Les billets sont chargés en une requête et les billets admis passent à
+    `used` en un seul UPDATE conditionnel. Retourne un résultat par contenu,
+    dans l'ordre reçu ; un billet présent deux fois n'est admis qu'une fois.
+    """
+    started = time.perf_counter()
+    parsed = [Ticket.parse_qr_data(payload) for payload in payloads]
+    codes = {code for code, _, error in parsed if not error}
+
+    with transaction.atomic():
+        tickets = {
+            ticket.code: ticket
+            for ticket in Ticket.objects.select_for_update(of=('self',))
+            .select_related('event', 'ticket_category')
+            .filter(code__in=codes)
+        } if codes else {}
+
+        items = []
+        candidates = {}
+        for index, (code, event_id, error) in enumerate(parsed):
+            ticket = tickets.get(code)
+            if error:
+                items.append(_batch_item(index, code, 'rejected', error))
+            elif ticket is None:
+                items.append(_batch_item(index, code, 'not_found', "Billet non trouvé"))
+            elif event_id is not None and ticket.event_id != event_id:
+                items.append(_batch_item(index, code, 'rejected', "QR code invalide"))
+            elif ticket.event.organizer_id != user.id:
+                items.append(_batch_item(index, code, 'forbidden', 'Vous n\'êtes pas autorisé à valider ce billet'))
+            elif ticket.event.status != 'ongoing':
+                items.append(_batch_item(
+                    index, code, 'event_closed',
+                    EVENT_STATUS_MESSAGES.get(ticket.event.status, 'L\'événement n\'est pas en cours')
+                ))
+            elif code in candidates:
+                items.append(_batch_item(index, code, 'duplicate', "Ce billet a déjà été utilisé"))
+            elif ticket.status != 'confirmed':
+                result = 'already_used' if ticket.status == 'used' else ticket.status
+                items.append(_batch_item(index, code, result, ticket.get_status_error()))
+            else:
+                candidates[code] = ticket
+                items.append(_batch_item(index, code, 'admitted', "Billet valide", ticket))
+
+        if candidates:
+            now = timezone.now()
+            candidate_ids = [ticket.pk for ticket in candidates.values()]
+            admitted = Ticket.objects.filter(
+                pk__in=candidate_ids, status='confirmed'
+            ).update(status='used', used_at=now, updated_at=now)
+            if admitted != len(candidates):
+                # Course perdue (select_for_update sans effet sur ce backend) : seuls
+                # les billets passés à `used` par cet UPDATE sont admis
+                lost = {
+                    pk: status
+                    for pk, status, used_at in Ticket.objects.filter(pk__in=candidate_ids)
+                    .values_list('pk', 'status', 'used_at')
+                    if status != 'used' or used_at != now
+                }
+                for position, item in enumerate(items):
+                    ticket = tickets.get(item['code'])
+                    if item['result'] == 'admitted' and ticket.pk in lost:
+                        ticket.status = lost[ticket.pk]
+                        result = 'already_used' if ticket.status == 'used' else ticket.status
+                        items[position] = _batch_item(item['index'], item['code'], result, ticket.get_status_error())
+
+        latency_ms = int((time.perf_counter() - started) * 1000)
+        TicketScan.objects.bulk_create([
+            TicketScan(
+                ticket=tickets.get(item['code']),
+                event=tickets[item['code']].event if item['code'] in tickets else None,
+                scanned_by=user,
+                gate=gate,
+                result=item['result'],
+                latency_ms=latency_ms
+            )
+            for item in items
+        ])
+
+    return items
+
+
+def gate_throughput(event, minutes=30):
+    """
+    Débit des portes sur les `minutes` dernières minutes : scans par minute,
+    admissions et latence moyenne, pour répartir le personnel pendant l'affluence
+    """
+    since = timezone.now() - timedelta(minutes=minutes)
+    rows = (
+        TicketScan.objects.filter(event=event, created_at__gte=since)
+        .annotate(minute=TruncMinute('created_at'))
+        .values('gate', 'minute')
+        .annotate(
+            scans=Count('id'),
+            admitted=Count('id', filter=Q(result='admitted')),
+            avg_latency_ms=Avg('latency_ms')
+        )
+        .order_by('gate', 'minute')
+    )
+
+    gates = {}
+    for row in rows:
+        gate = gates.setdefault(row['gate'], {
+            'gate': row['gate'], 'scans': 0, 'admitted': 0, 'timeline': []
+        })
+        gate['scans'] += row['scans']
+        gate['admitted'] += row['admitted']
+        gate['timeline'].append({
+            'minute': row['minute'],
+            'scans': row['scans'],
+            'admitted': row['admitted'],
+            'avg_latency_ms': round(row['avg_latency_ms'], 1) if row['avg_latency_ms'] is not None else None
+        })
+
+    for gate in gates.values():
+        gate['scans_per_minute'] = round(gate['scans'] / minutes, 2)
+        gate['last_minute_scans'] = gate['timeline'][-1]['scans'] if gate['timeline'] else 0
+
+    return {
+        'event_id': event.id,
+        'window_minutes': minutes,
+        'gates': sorted(gates.values(), key=lambda gate: gate['gate'])
+    }
+
+
+def _to_version(value):
+    return int(value.timestamp() * 1_000_000) if value else 0
+
+
+def _from_version(version):
+    return datetime.fromtimestamp(version / 1_000_000, tz=dt_timezone.utc)
+
+
+def _parse_scanned_at(value):
+    try:
+        scanned_at = parse_datetime(value) if isinstance(value, str) else None
+    except ValueError:
+        return None
+    if scanned_at and timezone.is_naive(scanned_at):
+        scanned_at = timezone.make_aware(scanned_at)
+    return scanned_at
+
+
+def build_scanner_manifest(event, since=None):
+    """
+    Manifeste des billets d'un événement pour les scanners hors ligne.
+
+    Sans `since`, renvoie tous les billets valides triés par code. Avec la
+    version d'un manifeste précédent, renvoie seulement les billets modifiés
+    depuis : `tickets` à ajouter et `revoked` (annulés, utilisés, expirés) à retirer.
+    """
+    # Version lue avant les billets : une modification faite entre les deux
+    # lectures sera renvoyée au prochain `since` (updated_at >= version) au
+    # lieu d'être masquée par une version plus récente que les lignes.
+    latest = Ticket.objects.filter(event=event).aggregate(latest=Max('updated_at'))['latest']
+
+    tickets = Ticket.objects.filter(event=event)
+    if since:
+        tickets = tickets.filter(updated_at__gte=_from_version(since))
+    else:
+        tickets = tickets.filter(status='confirmed')
+
+    rows = list(tickets.order_by('code').values_list('code', 'ticket_category_id', 'status', 'updated_at'))
+
+    return {
+        'event_id': event.id,
+        'version': _to_version(latest),
+        'since': since or None,
+        'categories': {
+            category.id: category.name
+            for category in event.ticket_categories.all()
+        },
+        'tickets': [[code, category_id] for code, category_id, status, _ in rows if status == 'confirmed'],
+        'revoked': [code for code, _, status, _ in rows if status != 'confirmed'],
+    }
+
+
+def apply_offline_scans(event, scans, user=None):
+    """
+    Marque `used` les billets scannés hors ligne, en une seule transaction.
+
+    `scans` est une liste de dicts {code, scanned_at?, gate?}. Retourne un
+    résultat par scan : admitted, already_used, duplicate, cancelled, expired
+    ou not_found.
+    """
+    now = timezone.now()
+    codes = [scan.get('code') for scan in scans]
+
+    with transaction.atomic():
+        tickets = {
+            ticket.code: ticket
+            for ticket in Ticket.objects.select_for_update().filter(event=event, code__in=set(codes) - {None})
+        }
+
+        results = []
+        admitted = []
+        seen = set()
+        for scan in scans:
+            code = scan.get('code')
+            ticket = tickets.get(code)
+            result = {'code': code, 'gate': scan.get('gate')}
+
+            if ticket is None:
+                result['status'] = 'not_found'
+            elif code in seen:
+                result['status'] = 'duplicate'
+            elif ticket.status == 'confirmed':
+                ticket.status = 'used'
+                ticket.used_at = min(_parse_scanned_at(scan.get('scanned_at')) or now, now)
+                ticket.updated_at = now
+                admitted.append(ticket)
+                result['status'] = 'admitted'
+            elif ticket.status == 'used':
+                result['status'] = 'already_used'
+                result['used_at'] = ticket.used_at
+            else:
+                result['status'] = ticket.status
+
+            seen.add(code)
+            results.append(result)
+
+        Ticket.objects.bulk_update(admitted, ['status', 'used_at', 'updated_at'])
+        TicketScan.objects.bulk_create([
+            TicketScan(
+                ticket=tickets.get(result['code']),
+                event=event,
+                scanned_by=user,
+                gate=str(result['gate'] or '')[:50],
+                result=result['status'],
+                source='offline'
+            )
+            for result in results
+        ])
+
+    return results
@@ -0,0 +1,177 @@
+"""
+GET conditionnels (ETag / Last-Modified) pour les ressources que les
+applications mobiles interrogent en boucle.
+
+Chaque vue déclare un état de validation peu coûteux : horodatages et
+compteurs lus en une requête agrégée, sans charger ni sérialiser les objets.
+L'ETag (faible) condense cet état, la représentation demandée (paramètres,
+format) et l'utilisateur. Si le client possède déjà cette version, la vue
+répond 304 avant toute sérialisation.
+
+If-None-Match a priorité sur If-Modified-Since : seul l'ETag voit les
+suppressions (compteurs), Last-Modified ne porte que l'horodatage le plus
+récent, à la seconde.
+"""
+import hashlib
+
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .models import Attendee, EventImage, Ticket, TicketCategory
+
+# Relations rendues dans le détail d'un événement : (nom, modèle, horodatage, compter les lignes).
+# Les billets ne sont jamais supprimés : leur date de modification suffit.
+EVENT_CHILDREN = [
+    ('ticket_categories', TicketCategory, 'updated_at', True),
+    ('attendees', Attendee, 'joined_at', True),
+    ('images', EventImage, 'created_at', True),
+    ('tickets', Ticket, 'updated_at', False),
+]
+
+
+def aggregate_state(queryset, field='updated_at'):
+    """Validateur d'une liste : (date de modification la plus récente, nombre de lignes), en une requête"""
+    state = queryset.order_by().aggregate(latest=Max(field), total=Count('pk'))
+    return state['latest'], state['total']
+
+
+async def aaggregate_state(queryset, field='updated_at'):
+    state = await queryset.order_by().aaggregate(latest=Max(field), total=Count('pk'))
+    return state['latest'], state['total']
+
+
+def _event_state_query(queryset):
+    annotations = {}
+    for name, model, field, count in EVENT_CHILDREN:
+        rows = model.objects.filter(event=OuterRef('pk')).order_by().values('event')
+        annotations[f'{name}_latest'] = Subquery(rows.annotate(value=Max(field)).values('value'))
+        if count:
+            annotations[f'{name}_total'] = Subquery(rows.annotate(value=Count('pk')).values('value'))
+
+    return queryset.prefetch_related(None).annotate(**annotations).values(
+        'updated_at', 'organizer__updated_at', 'category__updated_at', 'favorited', *annotations
+    )
+
+
+def _event_state(row):
+    if row is None:
+        return None
+    latest = max(value for key, value in row.items() if key.endswith(('updated_at', '_latest')) and value)
+    return tuple(row.values()), latest
+
+
+def event_state(queryset):
+    """
+    Validateur du détail d'un événement, en une requête : l'événement, son
+    organisateur, sa catégorie, le favori de l'utilisateur (annotation
+    `favorited` de with_event_plan) et les relations de EVENT_CHILDREN.
+    None si l'événement n'est pas visible.
+    """
+    return _event_state(_event_state_query(queryset).first())
+
+
+async def aevent_state(queryset):
+    return _event_state(await _event_state_query(queryset).afirst())
+
+
+def make_etag(request, state):
+    parts = [
+        request.get_full_path(),
+        getattr(request, 'accepted_media_type', ''),
+        request.user.pk if request.user.is_authenticated else '',
+        *state,
+    ]
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+class ConditionalGetMixin:
+    """
+    Ajoute ETag et Last-Modified aux actions `list` et `retrieve` d'un viewset.
+
+    `get_validator_state()` renvoie un tuple de valeurs qui changent avec la
+    représentation et la date de dernière modification, ou None pour servir
+    la réponse sans validation. L'état est conservé dans `validator_state`,
+    que ResponseCacheMixin ajoute à sa clé : un corps mis en cache n'est
+    servi qu'avec l'ETag de l'état dont il est issu.
+    """
+
+    validator_field = None  # Horodatage de modification du modèle, ex. 'updated_at'
+    validator_state = None  # État validé pour la requête en cours (clé du cache des réponses)
+
+    def validator_queryset(self):
+        """La liste ou l'objet demandé, None si l'identifiant est invalide"""
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.action == 'retrieve':
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            try:
+                queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+            except (TypeError, ValueError):
+                return None
+        return queryset
+
+    def get_validator_state(self):
+        """Par défaut : (max(validator_field), nombre de lignes) de la liste ou de l'objet demandé"""
+        queryset = self.validator_queryset() if self.validator_field else None
+        if queryset is None:
+            return None
+        latest, total = aggregate_state(queryset, self.validator_field)
+        return (latest, total), latest
+
+    async def aget_validator_state(self):
+        queryset = self.validator_queryset() if self.validator_field else None
+        if queryset is None:
+            return None
+        latest, total = await aaggregate_state(queryset, self.validator_field)
+        return (latest, total), latest
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(super().retrieve, request, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        return await self._aconditional(super().alist, request, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self._aconditional(super().aretrieve, request, *args, **kwargs)
+
+    def _conditional(self, handler, request, *args, **kwargs):
+        validator = self.get_validator_state()
+        if validator is None:
+            return handler(request, *args, **kwargs)
+
+        self.validator_state = validator[0]
+        etag, timestamp = self._validators(request, validator)
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        return self._add_validators(response, etag, timestamp)
+
+    async def _aconditional(self, handler, request, *args, **kwargs):
+        validator = await self.aget_validator_state()
+        if validator is None:
+            return await handler(request, *args, **kwargs)
+
+        self.validator_state = validator[0]
+        etag, timestamp = self._validators(request, validator)
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = await handler(request, *args, **kwargs)
+        return self._add_validators(response, etag, timestamp)
+
+    def _validators(self, request, validator):
+        state, last_modified = validator
+        return make_etag(request, state), int(last_modified.timestamp()) if last_modified else None
+
+    def _add_validators(self, response, etag, timestamp):
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+            # Le client garde la réponse mais la revalide à chaque lecture
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ['Authorization'])
+        return response
@@ -0,0 +1,84 @@
+"""
+Recherche géographique des événements (« autour de moi »).
+
+Chaque événement localisé porte `geo_cell`, le numéro de sa bande de latitude
+de CELL_DEGREES degrés, calculé à l'enregistrement. L'index (geo_cell,
+longitude) permet de lire directement le rectangle englobant le cercle de
+recherche : une plage de longitudes par bande, sans parcourir la table.
+Les candidats sont ensuite filtrés et triés sur la distance exacte
+(haversine), annotée `distance` (km).
+"""
+import math
+
+from django.conf import settings
+from django.db.models import FloatField, Q, Value
+from django.db.models.functions import ASin, Cast, Cos, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Hauteur d'une bande de latitude (0,1° ≈ 11 km). La modifier impose de
+# recalculer geo_cell (Event.save ou migration).
+CELL_DEGREES = 0.1
+
+
+def max_radius_km():
+    return getattr(settings, 'NEARBY_MAX_RADIUS_KM', 100)
+
+
+def geo_cell(latitude):
+    """Bande de latitude d'un point, None si l'événement n'est pas localisé"""
+    if latitude is None:
+        return None
+    return math.floor((float(latitude) + 90) / CELL_DEGREES)
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """
+    Rectangle (lat_min, lat_max, lng_min, lng_max) contenant le cercle de
+    rayon `radius_km`. Les longitudes peuvent dépasser ±180 près de
+    l'antiméridien, voir `_longitude_filter`.
+    """
+    angular = radius_km / EARTH_RADIUS_KM
+    delta_lat = math.degrees(angular)
+    lat_min, lat_max = latitude - delta_lat, latitude + delta_lat
+    if lat_min <= -90 or lat_max >= 90:
+        # Le cercle contient un pôle : toutes les longitudes
+        return max(lat_min, -90), min(lat_max, 90), -180, 180
+
+    delta_lng = math.degrees(math.asin(math.sin(angular) / math.cos(math.radians(latitude))))
+    return lat_min, lat_max, longitude - delta_lng, longitude + delta_lng
+
+
+def _longitude_filter(lng_min, lng_max):
+    if lng_min < -180:
+        return Q(longitude__gte=lng_min + 360) | Q(longitude__lte=lng_max)
+    if lng_max > 180:
+        return Q(longitude__gte=lng_min) | Q(longitude__lte=lng_max - 360)
+    return Q(longitude__range=(lng_min, lng_max))
+
+
+def haversine(latitude, longitude):
+    """Distance en km entre le point donné et la position de l'événement"""
+    lat1, lng1 = math.radians(latitude), math.radians(longitude)
+    lat2 = Radians(Cast('latitude', FloatField()))
+    lng2 = Radians(Cast('longitude', FloatField()))
+    a = (
+        Power(Sin((lat2 - Value(lat1)) / 2), 2)
+        + Value(math.cos(lat1)) * Cos(lat2) * Power(Sin((lng2 - Value(lng1)) / 2), 2)
+    )
+    return Value(2 * EARTH_RADIUS_KM) * ASin(Sqrt(a))
+
+
+def nearby_events(queryset, latitude, longitude, radius_km):
+    """Événements à moins de `radius_km` du point, annotés de `distance` et triés du plus proche"""
+    lat_min, lat_max, lng_min, lng_max = bounding_box(latitude, longitude, radius_km)
+    queryset = queryset.filter(
+        # IN plutôt que BETWEEN : une recherche d'index par bande, bornée en longitude
+        geo_cell__in=range(geo_cell(lat_min), geo_cell(lat_max) + 1),
+        latitude__range=(lat_min, lat_max),
+    )
+    if (lng_min, lng_max) != (-180, 180):
+        queryset = queryset.filter(_longitude_filter(lng_min, lng_max))
+    return queryset.annotate(
+        distance=haversine(latitude, longitude)
+    ).filter(distance__lte=radius_km).order_by('distance')
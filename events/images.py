@@ -0,0 +1,170 @@
+"""
+Variantes responsives des images téléversées (événements, galerie, photos de
+profil).
+
+Chaque image est déclinée en plusieurs largeurs (IMAGE_VARIANT_WIDTHS :
+vignette, carte, plein écran), en WebP et en JPEG de repli, sans métadonnées
+EXIF (l'orientation de l'appareil photo est appliquée aux pixels avant). Le
+rendu se fait en arrière-plan (events.tasks) après l'enregistrement ; les
+noms des fichiers produits sont stockés dans le champ JSON associé à l'image
+(IMAGE_FIELDS), que les serializers exposent sous forme de `srcset`.
+
+Tant que les variantes ne sont pas prêtes, les clients reçoivent l'original.
+Les images déjà en ligne se rattrapent avec `rebuild_image_variants`.
+"""
+import logging
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+from .models import Event, EventImage, User
+from .response_cache import invalidate_on_commit
+from .tasks import run_in_background
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VARIANT_WIDTHS = {'thumb': 160, 'card': 640, 'full': 1280}
+VARIANTS_DIR = 'variants'
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+
+# (modèle, champ image) -> champ JSON des variantes
+IMAGE_FIELDS = {
+    (Event, 'image_url'): 'image_variants',
+    (EventImage, 'image'): 'image_variants',
+    (User, 'profile_image'): 'profile_image_variants',
+}
+
+
+def variant_widths():
+    return getattr(settings, 'IMAGE_VARIANT_WIDTHS', DEFAULT_VARIANT_WIDTHS)
+
+
+def _variant_base(name):
+    """events/gallery/photo.jpg -> variants/events/gallery/photo"""
+    return posixpath.join(VARIANTS_DIR, posixpath.splitext(name)[0])
+
+
+def _encode(image, format, **options):
+    buffer = BytesIO()
+    image.save(buffer, format=format, **options)
+    return buffer.getvalue()
+
+
+def _flatten(image):
+    """RGB pour le JPEG ; la transparence est posée sur fond blanc"""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def render_variants(file):
+    """
+    Écrit les variantes de `file` dans son stockage et retourne leur
+    description : {'source': nom, 'thumb': {'width', 'height', 'webp', 'jpeg'}, ...}.
+    Une image plus petite qu'une largeur n'est pas agrandie.
+    """
+    storage = file.storage
+    with file.open('rb'):
+        source = Image.open(file)
+        source = ImageOps.exif_transpose(source)
+        source.load()
+    keep_alpha = source.mode in ('RGBA', 'LA') or 'transparency' in source.info
+    webp = features.check('webp')
+    base = _variant_base(file.name)
+
+    variants = {'source': file.name}
+    for label, width in sorted(variant_widths().items(), key=lambda item: item[1]):
+        image = source.copy()
+        if image.width > width:
+            image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        variant = {'width': image.width, 'height': image.height}
+        if webp:
+            # Ni exif ni icc_profile : les métadonnées de l'original ne sont pas recopiées
+            data = _encode(image.convert('RGBA' if keep_alpha else 'RGB'), 'WEBP', quality=WEBP_QUALITY, method=4)
+            variant['webp'] = storage.save(f'{base}/{label}.webp', ContentFile(data))
+        data = _encode(_flatten(image), 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+        variant['jpeg'] = storage.save(f'{base}/{label}.jpg', ContentFile(data))
+        variants[label] = variant
+    return variants
+
+
+def delete_variants(variants, storage):
+    for label, variant in variants.items():
+        if label == 'source':
+            continue
+        for name in (variant.get('webp'), variant.get('jpeg')):
+            if name:
+                storage.delete(name)
+
+
+def generate_variants(model, pk, field_name):
+    """Tâche : variantes de l'image courante de l'objet, ignorée si l'image a changé entre-temps"""
+    variants_field = IMAGE_FIELDS[(model, field_name)]
+    instance = model._default_manager.filter(pk=pk).only('pk', field_name, variants_field).first()
+    if instance is None:
+        return
+    file = getattr(instance, field_name)
+    if not file:
+        return
+    try:
+        variants = render_variants(file)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        logger.warning("Variantes impossibles pour %s", file.name, exc_info=True)
+        return
+
+    changes = {variants_field: variants}
+    # updated_at change l'ETag des réponses qui embarquent l'image (events.conditional)
+    if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+        changes['updated_at'] = timezone.now()
+    with transaction.atomic():
+        updated = model._default_manager.filter(pk=pk, **{field_name: file.name}).update(**changes)
+        if updated and model is EventImage:
+            Event.objects.filter(images__pk=pk).update(updated_at=timezone.now())
+    if not updated:
+        delete_variants(variants, file.storage)
+        return
+    delete_variants(getattr(instance, variants_field) or {}, file.storage)
+    invalidate_on_commit('events')
+
+
+def image_fields(model):
+    """[(champ image, champ des variantes)] du modèle"""
+    return [(field_name, variants_field) for (owner, field_name), variants_field in IMAGE_FIELDS.items()
+            if owner is model]
+
+
+def schedule_variants(instance, field_name):
+    run_in_background(generate_variants, type(instance), instance.pk, field_name)
+
+
+def srcset(variants, file, request=None):
+    """
+    Variantes prêtes d'une image pour le client :
+    {'thumb': {'width': 160, 'height': 120, 'webp': url, 'jpeg': url}, ...}.
+    None si elles ne correspondent pas (ou plus) à l'image courante.
+    """
+    if not file or not variants or variants.get('source') != file.name:
+        return None
+
+    def url(name):
+        location = file.storage.url(name)
+        return request.build_absolute_uri(location) if request is not None else location
+
+    return {
+        label: {
+            'width': variant['width'],
+            'height': variant['height'],
+            **{format: url(variant[format]) for format in ('webp', 'jpeg') if variant.get(format)},
+        }
+        for label, variant in variants.items()
+        if label != 'source'
+    }
@@ -0,0 +1,124 @@
+"""
+Grand livre des wallets : toute écriture d'argent passe par post_entry.
+
+Une écriture est une liste de jambes (Leg) dont la somme est nulle :
+
+- jambe wallet (account = utilisateur) : crédit ou débit du solde, tracé par
+  une WalletTransaction ;
+- jambe PLATFORM : TVA collectée ou remboursée, inscrite au journal
+  plateforme (PlatformLedgerEntry, rapproché ensuite vers gcash) ;
+- jambe EXTERNAL : argent entrant ou sortant du système (dépôt, retrait).
+
+Les soldes matérialisés (User.wallet_balance) sont mis à jour par des UPDATE
+F() : un débit n'est appliqué que si `wallet_balance >= montant`, sans lecture
+préalable du solde en Python. Les transactions wallet sont ajoutées en un seul
+INSERT, avec balance_before/balance_after relus dans la même transaction.
+Les lignes des comptes touchés sont verrouillées d'abord, par pk croissant.
+"""
+from collections import defaultdict, namedtuple
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Value, When
+
+from .models import PlatformLedgerEntry, User, WalletTransaction
+
+PLATFORM = 'platform'
+EXTERNAL = 'external'
+
+CENT = Decimal('0.01')
+
+Leg = namedtuple('Leg', ['account', 'amount', 'transaction_type', 'description'])
+
+
+class InsufficientFunds(ValueError):
+    """Débit refusé : solde insuffisant au moment de l'écriture"""
+
+    def __init__(self, user_id, amount):
+        self.user_id = user_id
+        self.amount = amount
+        super().__init__(f"Solde insuffisant pour un débit de {amount} BIF")
+
+
+def _amount(value):
+    return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def _account_id(account):
+    return account.pk if isinstance(account, User) else account
+
+
+@transaction.atomic
+def post_entry(legs, order=None, ticket=None):
+    """
+    Enregistre une écriture équilibrée et retourne ses WalletTransaction.
+
+    Lève ValueError si l'écriture n'est pas équilibrée et InsufficientFunds si
+    un débit dépasse le solde : rien n'est alors écrit.
+    """
+    legs = [leg._replace(account=_account_id(leg.account), amount=_amount(leg.amount)) for leg in legs]
+    if sum((leg.amount for leg in legs), Decimal('0')) != 0:
+        raise ValueError("Écriture déséquilibrée")
+
+    net = defaultdict(Decimal)
+    for leg in legs:
+        if leg.account not in (PLATFORM, EXTERNAL):
+            net[leg.account] += leg.amount
+
+    # Verrous pris dans l'ordre des pk avant tout UPDATE : deux écritures
+    # croisées (A paie B pendant que B paie A) ne peuvent pas s'interbloquer
+    list(User.objects.select_for_update().filter(pk__in=net).order_by('pk').values_list('pk', flat=True))
+
+    # Débits conditionnels : un UPDATE par compte débité
+    for user_id, amount in net.items():
+        if amount < 0:
+            debited = User.objects.filter(pk=user_id, wallet_balance__gte=-amount).update(
+                wallet_balance=F('wallet_balance') + amount
+            )
+            if not debited:
+                raise InsufficientFunds(user_id, -amount)
+
+    # Crédits : un seul UPDATE pour tous les comptes crédités
+    credits = {user_id: amount for user_id, amount in net.items() if amount > 0}
+    if credits:
+        User.objects.filter(pk__in=credits).update(wallet_balance=F('wallet_balance') + Case(
+            *[When(pk=user_id, then=Value(amount)) for user_id, amount in credits.items()],
+            output_field=DecimalField(max_digits=10, decimal_places=2)
+        ))
+
+    # Soldes relus sous verrou : balance_before/after exacts même en concurrence
+    balances = dict(User.objects.filter(pk__in=net).values_list('id', 'wallet_balance')) if net else {}
+    running = {user_id: balances[user_id] - amount for user_id, amount in net.items()}
+
+    transactions = []
+    platform_entries = []
+    for leg in legs:
+        if leg.account == PLATFORM:
+            platform_entries.append(PlatformLedgerEntry(
+                entry_type=leg.transaction_type,
+                amount=leg.amount,
+                description=leg.description,
+                order=order,
+                ticket=ticket
+            ))
+        elif leg.account != EXTERNAL:
+            balance_before = running[leg.account]
+            running[leg.account] += leg.amount
+            transactions.append(WalletTransaction(
+                user_id=leg.account,
+                transaction_type=leg.transaction_type,
+                amount=leg.amount,
+                balance_before=balance_before,
+                balance_after=running[leg.account],
+                description=leg.description,
+                order=order,
+                ticket=ticket
+            ))
+
+    PlatformLedgerEntry.objects.bulk_create(platform_entries)
+    return WalletTransaction.objects.bulk_create(transactions)
+
+
+def balance_of(user):
+    """Solde matérialisé relu en base (l'instance en mémoire peut être périmée)"""
+    return User.objects.filter(pk=_account_id(user)).values_list('wallet_balance', flat=True).get()
@@ -0,0 +1,196 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import suppress
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from events.models import Category, Event, Order, TicketCategory, User
+from rest_framework.authtoken.models import Token
+
+SERVERS = [
+    # (libellé, commande, GEVENT_ASYNC_READS)
+    ('WSGI (gunicorn gthread)', ['gunicorn', 'Gevent.wsgi:application', '--workers', '1', '--threads', '{threads}',
+                                 '--bind', '127.0.0.1:{port}', '--log-level', 'warning'], '0'),
+    ('ASGI (uvicorn)', ['uvicorn', 'Gevent.asgi:application', '--workers', '1', '--host', '127.0.0.1',
+                        '--port', '{port}', '--log-level', 'warning', '--no-access-log'], '1'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare les lectures les plus sollicitées (liste, détail, à venir, catégories, billets) '
+        'servies sous WSGI (vues DRF) et sous ASGI (vues asynchrones) : requêtes par seconde et p99 '
+        'à forte concurrence, sur une base SQLite temporaire'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=200, help='Connexions keep-alive simultanées')
+        parser.add_argument('--duration', type=float, default=15.0, help='Durée de chaque mesure, en secondes')
+        parser.add_argument('--events', type=int, default=500)
+        parser.add_argument('--wsgi-threads', type=int, default=16)
+        parser.add_argument('--port', type=int, default=8765)
+
+    def _use_database(self, settings_dict):
+        connections.close_all()
+        connections.settings['default'].clear()
+        connections.settings['default'].update(settings_dict)
+        with suppress(AttributeError):
+            del connections['default']
+
+    def _seed(self, count):
+        now = timezone.now()
+        organizer = User.objects.create_user(username='benchmark-organizer', password=None)
+        reader = User.objects.create_user(
+            username='benchmark-reader', password=None, wallet_balance=Decimal('1000000')
+        )
+        categories = [Category.objects.create(name=f'Benchmark {i}') for i in range(5)]
+        events = [
+            Event.objects.create(
+                title=f'Concert {i}', description='Benchmark des lectures', location='Bujumbura',
+                category=categories[i % len(categories)], organizer=organizer, price=Decimal('1000'),
+                date=now + timedelta(hours=i + 1), total_capacity=100, is_approved=True,
+            )
+            for i in range(count)
+        ]
+        for event in events[:5]:
+            ticket_category = TicketCategory.objects.create(
+                event=event, name='Basique', price=Decimal('1000'), capacity=100
+            )
+            Order.objects.create(
+                user=reader, event=event, ticket_category=ticket_category, quantity=2, payment_method='wallet'
+            ).create_tickets()
+        return Token.objects.create(user=reader).key, events[0].pk
+
+    async def _read_response(self, reader):
+        head = await reader.readuntil(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        status = int(lines[0].split()[1])
+        headers = dict(
+            (name.strip().lower(), value.strip())
+            for name, value in (line.split(':', 1) for line in lines[1:] if ':' in line)
+        )
+        if 'content-length' in headers:
+            await reader.readexactly(int(headers['content-length']))
+        elif headers.get('transfer-encoding') == 'chunked':
+            while True:
+                size = int((await reader.readline()).strip(), 16)
+                await reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        return status, headers.get('connection', '').lower() != 'close'
+
+    async def _client(self, port, requests, offset, deadline, latencies, errors):
+        writer = None
+        index = offset
+        while time.perf_counter() < deadline:
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                started = time.perf_counter()
+                writer.write(requests[index % len(requests)])
+                index += 1
+                await writer.drain()
+                status, keep_alive = await self._read_response(reader)
+                latencies.append(time.perf_counter() - started)
+                if status != 200:
+                    errors.append(status)
+                if not keep_alive:
+                    writer.close()
+                    writer = None
+            except (OSError, asyncio.IncompleteReadError, ValueError) as exc:
+                errors.append(type(exc).__name__)
+                writer = None
+        if writer is not None:
+            writer.close()
+
+    async def _load(self, port, requests, concurrency, duration):
+        latencies, errors = [], []
+        # Préchauffage : imports, connexions, cache des réponses
+        await asyncio.gather(*[
+            self._client(port, requests, i, time.perf_counter() + 1, [], []) for i in range(len(requests))
+        ])
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*[
+            self._client(port, requests, i, deadline, latencies, errors) for i in range(concurrency)
+        ])
+        return latencies, errors
+
+    def _wait_for_port(self, port, process, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError('Le serveur s\'est arrêté au démarrage')
+            with suppress(OSError), socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+            time.sleep(0.2)
+        raise CommandError(f'Le serveur ne répond pas sur le port {port}')
+
+    def handle(self, *args, **options):
+        original = dict(connections.settings['default'])
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'benchmark.sqlite3'
+            try:
+                self._use_database({**original, 'ENGINE': 'django.db.backends.sqlite3', 'NAME': path})
+                call_command('migrate', verbosity=0)
+                token, event_id = self._seed(options['events'])
+            finally:
+                self._use_database(original)
+
+            paths = [
+                '/api/events/', f'/api/events/{event_id}/', '/api/events/upcoming/',
+                '/api/categories/', '/api/tickets/',
+            ]
+            requests = [
+                (f'GET {url} HTTP/1.1\r\nHost: 127.0.0.1\r\nAccept: application/json\r\n'
+                 f'Authorization: Token {token}\r\n\r\n').encode()
+                for url in paths
+            ]
+            self.stdout.write(
+                f'{options["concurrency"]} connexions, {options["duration"]:g} s par serveur, '
+                f'{options["events"]} événements, chemins : {", ".join(paths)}'
+            )
+            self.stdout.write(
+                f'{"Serveur":<26} {"req/s":>9} {"p50 (ms)":>10} {"p99 (ms)":>10} {"erreurs":>8}'
+            )
+            for label, command, async_reads in SERVERS:
+                self._benchmark(label, command, async_reads, path, requests, options)
+
+    def _benchmark(self, label, command, async_reads, path, requests, options):
+        port = options['port']
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'Gevent.settings'),
+            'DATABASE_URL': f'sqlite:///{path}',
+            'GEVENT_ASYNC_READS': async_reads,
+        }
+        env.pop('DATABASE_REPLICA_URL', None)
+        argv = [sys.executable, '-m'] + [
+            part.format(port=port, threads=options['wsgi_threads']) for part in command
+        ]
+        process = subprocess.Popen(argv, cwd=settings.BASE_DIR, env=env)
+        try:
+            self._wait_for_port(port, process)
+            latencies, errors = asyncio.run(
+                self._load(port, requests, options['concurrency'], options['duration'])
+            )
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+        self.stdout.write(
+            f'{label:<26} {len(latencies) / options["duration"]:>9.1f} {p50:>10.1f} {p99:>10.1f} {len(errors):>8}'
+        )
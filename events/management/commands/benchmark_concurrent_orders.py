@@ -0,0 +1,135 @@
+import multiprocessing
+import tempfile
+import time
+from contextlib import suppress
+from decimal import Decimal
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+from django.utils import timezone
+from events.models import Category, Event, Order, TicketCategory, User
+
+PROFILES = [
+    ('SQLite par défaut', {'ENGINE': 'django.db.backends.sqlite3', 'OPTIONS': {}}),
+    ('Profil durci', {'ENGINE': 'Gevent.sqlite', 'OPTIONS': {'timeout': 5, 'lock_retries': 3}}),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Mesure les commandes payées par wallet par seconde sous concurrence, SQLite par défaut '
+        'puis profil durci (bases temporaires : la base configurée n\'est pas modifiée)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=16, help='Processus acheteurs')
+        parser.add_argument('--readers', type=int, default=4, help='Processus qui lisent le catalogue en parallèle')
+        parser.add_argument('--duration', type=float, default=10.0, help='Durée de chaque mesure, en secondes')
+
+    def _use_database(self, settings_dict):
+        """Repointe l'alias `default` ; chaque processus ouvre ensuite sa propre connexion"""
+        connections.close_all()
+        connections.settings['default'].clear()
+        connections.settings['default'].update(settings_dict)
+        with suppress(AttributeError):
+            del connections['default']
+
+    def _seed(self, buyers_count):
+        organizer = User.objects.create_user(username='benchmark-organizer', password=None)
+        event = Event.objects.create(
+            title='Benchmark commandes', description='', location='Bujumbura',
+            category=Category.objects.create(name='Benchmark commandes'),
+            date=timezone.now(), organizer=organizer, price=Decimal('1000'),
+            total_capacity=10 ** 6, is_approved=True,
+        )
+        ticket_category = TicketCategory.objects.create(
+            event=event, name='Basique', price=Decimal('1000'), capacity=10 ** 6
+        )
+        buyers = [
+            User.objects.create_user(
+                username=f'benchmark-buyer{i}', password=None, wallet_balance=Decimal('10000000')
+            ).pk
+            for i in range(buyers_count)
+        ]
+        return ticket_category.pk, buyers
+
+    def _buy(self, buyer_id, ticket_category_id, deadline, results):
+        buyer = User.objects.get(pk=buyer_id)
+        ticket_category = TicketCategory.objects.select_related('event').get(pk=ticket_category_id)
+        latencies, failures = [], 0
+        while time.time() < deadline:
+            started = time.perf_counter()
+            try:
+                Order.objects.create(
+                    user=buyer, event=ticket_category.event, ticket_category=ticket_category,
+                    quantity=1, payment_method='wallet',
+                ).create_tickets()
+                latencies.append(time.perf_counter() - started)
+            except OperationalError:
+                failures += 1
+        results.put(('orders', latencies, failures))
+
+    def _read(self, deadline, results):
+        reads, failures = 0, 0
+        while time.time() < deadline:
+            try:
+                list(Event.objects.select_related('category').prefetch_related('ticket_categories')[:50])
+                reads += 1
+            except OperationalError:
+                failures += 1
+        results.put(('reads', reads, failures))
+
+    def _run(self, ticket_category_id, buyers, readers, duration):
+        """Un processus par acheteur et par lecteur, comme des workers gunicorn"""
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        connections.close_all()
+        deadline = time.time() + duration + 1
+        processes = [
+            context.Process(target=self._buy, args=(buyer_id, ticket_category_id, deadline, results))
+            for buyer_id in buyers
+        ] + [context.Process(target=self._read, args=(deadline, results)) for _ in range(readers)]
+        for process in processes:
+            process.start()
+
+        latencies, reads, failures = [], 0, 0
+        for _ in processes:
+            kind, value, failed = results.get()
+            if kind == 'orders':
+                latencies += value
+            else:
+                reads += value
+            failures += failed
+        for process in processes:
+            process.join()
+        return len(latencies) / duration, reads / duration, sorted(latencies), failures
+
+    def handle(self, *args, **options):
+        original = dict(connections.settings['default'])
+        self.stdout.write(
+            f'{options["workers"]} acheteurs et {options["readers"]} lecteurs concurrents, '
+            f'{options["duration"]:g} s par profil'
+        )
+        self.stdout.write(
+            f'{"Profil":<20} {"commandes/s":>12} {"p50 (ms)":>10} {"p95 (ms)":>10} '
+            f'{"lectures/s":>11} {"échecs verrou":>14}'
+        )
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                for index, (label, profile) in enumerate(PROFILES):
+                    self._use_database({**original, **profile, 'NAME': Path(directory) / f'{index}.sqlite3'})
+                    call_command('migrate', verbosity=0)
+                    ticket_category_id, buyers = self._seed(options['workers'])
+                    rate, read_rate, latencies, failures = self._run(
+                        ticket_category_id, buyers, options['readers'], options['duration']
+                    )
+                    p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+                    p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0
+                    self.stdout.write(
+                        f'{label:<20} {rate:>12.1f} {p50:>10.1f} {p95:>10.1f} '
+                        f'{read_rate:>11.1f} {failures:>14}'
+                    )
+        finally:
+            self._use_database(original)
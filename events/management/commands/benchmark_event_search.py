@@ -0,0 +1,113 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from events.models import Category, Event, User
+from events.search import rebuild_index, search_events
+
+WORDS = (
+    'concert festival théâtre soirée gala conférence atelier salon exposition marché '
+    'musique danse rumba afrobeat jazz gospel comédie cinéma littérature peinture '
+    'fête célébration tambours découverte rencontre entrepreneurs étudiants famille '
+    'bujumbura gitega ngozi rumonge kayanza muyinga plage stade cathédrale université '
+    'été hiver nocturne gratuit exclusif première édition spéciale internationale'
+).split()
+
+SYLLABLES = 'ba be bi bo bu ka ke ki ko ku ma me mi mo mu na ne ni no nu ra re ri ro ru ta te ti to tu ga gi go'.split()
+
+QUERIES = ['fete', 'théâtre gitega', 'conf', 'rumba plage nocturne', 'inexistant']
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare la recherche plein texte aux filtres icontains sur des événements synthétiques '
+        '(insérés dans une transaction annulée à la fin)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=500000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def _sentence(self, rng, length, filler):
+        # Vocabulaire de Zipf : surtout des mots de remplissage, quelques mots thématiques
+        words = [
+            rng.choice(WORDS) if rng.random() < 0.05 else filler[int(rng.paretovariate(1.0)) % len(filler)]
+            for _ in range(length)
+        ]
+        return ' '.join(words).capitalize()
+
+    def _insert_events(self, rng, filler, count, category, organizer, now):
+        """INSERT groupés sans instancier de modèles : 500k lignes en quelques dizaines de secondes"""
+        template = Event(
+            title='', description='', location='', category=category, organizer=organizer,
+            date=now, is_approved=True, available_seats=100, created_at=now, updated_at=now
+        )
+        fields = [field for field in Event._meta.concrete_fields if not field.primary_key]
+        base = [field.get_db_prep_save(getattr(template, field.attname), connection) for field in fields]
+        positions = {field.attname: index for index, field in enumerate(fields)}
+        date_field = Event._meta.get_field('date')
+        dates = [date_field.get_db_prep_save(now + timedelta(days=day), connection) for day in range(365)]
+
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            connection.ops.quote_name(Event._meta.db_table),
+            ', '.join(connection.ops.quote_name(field.column) for field in fields),
+            ', '.join(['%s'] * len(fields)),
+        )
+        with connection.cursor() as cursor:
+            for offset in range(0, count, 10000):
+                rows = []
+                for i in range(offset, min(offset + 10000, count)):
+                    row = list(base)
+                    row[positions['title']] = self._sentence(rng, 4, filler)
+                    row[positions['description']] = self._sentence(rng, 60, filler)
+                    row[positions['location']] = self._sentence(rng, 2, filler)
+                    row[positions['date']] = dates[i % 365]
+                    rows.append(row)
+                cursor.executemany(sql, rows)
+
+    def _time(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings) * 1000
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        filler = [''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(20000)]
+        count = options['events']
+        repeat = options['repeat']
+
+        with transaction.atomic():
+            organizer = User.objects.create_user(username='benchmark-search', password=None)
+            category = Category.objects.create(name='Benchmark recherche')
+            now = timezone.now()
+
+            start = time.perf_counter()
+            self._insert_events(rng, filler, count, category, organizer, now)
+            self.stdout.write(f'{count:,} événements insérés en {time.perf_counter() - start:.1f} s')
+
+            start = time.perf_counter()
+            rebuild_index()
+            self.stdout.write(f'Index plein texte construit en {time.perf_counter() - start:.1f} s')
+
+            events = Event.objects.filter(category=category)
+            self.stdout.write(f'{"Recherche":<25} {"icontains (ms)":>15} {"plein texte (ms)":>17} {"résultats":>10}')
+            for terms in QUERIES:
+                like = Q()
+                for word in terms.split():
+                    like &= Q(title__icontains=word) | Q(description__icontains=word) | Q(location__icontains=word)
+
+                like_ms = self._time(lambda: list(events.filter(like).order_by('-date')[:20]), repeat)
+                fts_ms = self._time(
+                    lambda: list(search_events(events, terms).order_by('-search_rank', '-id')[:20]), repeat
+                )
+                matches = search_events(events, terms).count()
+                self.stdout.write(f'{terms:<25} {like_ms:>15.1f} {fts_ms:>17.1f} {matches:>10,}')
+
+            transaction.set_rollback(True)
@@ -0,0 +1,86 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from events.geo import geo_cell, nearby_events
+from events.models import Category, Event, User
+
+# Zone des événements synthétiques : Afrique de l'Est (lat_min, lat_max, lng_min, lng_max)
+REGION = (-12.0, 5.0, 28.0, 42.0)
+
+# Points recherchés : Bujumbura, Gitega, Kigali, Nairobi, Dar es Salaam
+POINTS = [(-3.3822, 29.3644), (-3.4271, 29.9246), (-1.9441, 30.0619), (-1.2921, 36.8219), (-6.7924, 39.2083)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Mesure /api/events/nearby/ sur des événements synthétiques localisés '
+        '(insérés dans une transaction annulée à la fin)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=1000000)
+        parser.add_argument('--radius-km', type=float, nargs='+', default=[5, 10, 25])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def _insert_events(self, rng, count, category, organizer, now):
+        """INSERT groupés sans instancier de modèles"""
+        template = Event(
+            title='Benchmark', description='', location='', category=category, organizer=organizer,
+            date=now, is_approved=True, available_seats=100, created_at=now, updated_at=now
+        )
+        fields = [field for field in Event._meta.concrete_fields if not field.primary_key]
+        base = [field.get_db_prep_save(getattr(template, field.attname), connection) for field in fields]
+        positions = {field.attname: index for index, field in enumerate(fields)}
+
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            connection.ops.quote_name(Event._meta.db_table),
+            ', '.join(connection.ops.quote_name(field.column) for field in fields),
+            ', '.join(['%s'] * len(fields)),
+        )
+        lat_min, lat_max, lng_min, lng_max = REGION
+        with connection.cursor() as cursor:
+            for offset in range(0, count, 10000):
+                rows = []
+                for _ in range(min(10000, count - offset)):
+                    latitude = round(rng.uniform(lat_min, lat_max), 6)
+                    row = list(base)
+                    row[positions['latitude']] = str(latitude)
+                    row[positions['longitude']] = str(round(rng.uniform(lng_min, lng_max), 6))
+                    row[positions['geo_cell']] = geo_cell(latitude)
+                    rows.append(row)
+                cursor.executemany(sql, rows)
+            cursor.execute('ANALYZE events')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        count = options['events']
+        repeat = options['repeat']
+
+        with transaction.atomic():
+            organizer = User.objects.create_user(username='benchmark-nearby', password=None)
+            category = Category.objects.create(name='Benchmark géolocalisation')
+
+            start = time.perf_counter()
+            self._insert_events(rng, count, category, organizer, timezone.now())
+            self.stdout.write(f'{count:,} événements insérés en {time.perf_counter() - start:.1f} s')
+
+            events = Event.objects.filter(category=category)
+            self.stdout.write(f'{"Rayon (km)":>10} {"1re page, médiane (ms)":>24} {"résultats":>10}')
+            for radius_km in options['radius_km']:
+                timings, matches = [], 0
+                for latitude, longitude in POINTS:
+                    queryset = nearby_events(events, latitude, longitude, radius_km)
+                    for _ in range(repeat):
+                        start = time.perf_counter()
+                        list(queryset[:20])
+                        timings.append(time.perf_counter() - start)
+                    matches += queryset.count()
+                timings.sort()
+                self.stdout.write(
+                    f'{radius_km:>10g} {timings[len(timings) // 2] * 1000:>24.1f} {matches // len(POINTS):>10,}'
+                )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,89 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from events.checkin import check_in, record_scan, validate_batch
+from events.models import Ticket
+from events.qr import sign_ticket_token
+
+
+class Command(BaseCommand):
+    help = 'Mesure le nombre de validations de QR codes par seconde (jetons signés vs ancien JSON)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000)
+        parser.add_argument('--db-iterations', type=int, default=500)
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def _rate(self, func, iterations):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        elapsed = time.perf_counter() - start
+        return iterations / elapsed if elapsed else float('inf')
+
+    def _report(self, label, rate, queries=None):
+        line = f'{label:<45} {rate:>12,.0f} validations/s'
+        if queries is not None:
+            line += f'  ({queries} requête(s) SQL par validation)'
+        self.stdout.write(line)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        db_iterations = options['db_iterations']
+
+        token = sign_ticket_token('TKT-000000000000', 1)
+        forged = token[:-4] + 'AAAA'
+
+        self._report('Vérification signature (mémoire)', self._rate(lambda: Ticket.parse_qr_data(token), iterations))
+        self._report('Rejet jeton falsifié (mémoire)', self._rate(lambda: Ticket.parse_qr_data(forged), iterations))
+
+        with CaptureQueriesContext(connection) as ctx:
+            Ticket.validate_qr_code(forged)
+        self._report('Rejet jeton falsifié (validate_qr_code)',
+                     self._rate(lambda: Ticket.validate_qr_code(forged), iterations), len(ctx.captured_queries))
+
+        ticket = Ticket.objects.select_related('event', 'ticket_category').first()
+        if ticket is None:
+            self.stdout.write(self.style.WARNING('Aucun billet en base : mesures avec accès base ignorées'))
+            return
+
+        signed = ticket.build_qr_payload()
+        legacy = ticket.build_legacy_qr_payload()
+        self.stdout.write(f'Taille du contenu QR : jeton {len(signed)} caractères, JSON {len(legacy)} caractères')
+
+        for label, payload in [('Jeton signé (validate_qr_code)', signed), ('Ancien JSON (validate_qr_code)', legacy)]:
+            with CaptureQueriesContext(connection) as ctx:
+                Ticket.validate_qr_code(payload)
+            self._report(label, self._rate(lambda: Ticket.validate_qr_code(payload), db_iterations),
+                         len(ctx.captured_queries))
+
+        self._benchmark_check_in(ticket.event, options['batch_size'])
+
+    def _benchmark_check_in(self, event, batch_size):
+        """Check-in billet par billet vs par lot, dans une transaction annulée"""
+        tickets = list(Ticket.objects.filter(event=event, status='confirmed')[:batch_size])
+        if not tickets:
+            self.stdout.write(self.style.WARNING('Aucun billet confirmé : mesure du check-in ignorée'))
+            return
+        payloads = [ticket.build_qr_payload() for ticket in tickets]
+        organizer = event.organizer
+
+        def one_by_one():
+            for payload in payloads:
+                started = time.perf_counter()
+                ticket, _ = Ticket.validate_qr_code(payload)
+                result = 'admitted' if ticket and check_in(ticket) else 'rejected'
+                record_scan(ticket, organizer, 'bench', result, started)
+
+        for label, func in [('Check-in billet par billet', one_by_one),
+                            ('Check-in par lot (validate_batch)', lambda: validate_batch(payloads, organizer, 'bench'))]:
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as ctx:
+                    start = time.perf_counter()
+                    func()
+                    elapsed = time.perf_counter() - start
+                transaction.set_rollback(True)
+            rate = len(payloads) / elapsed if elapsed else float('inf')
+            self._report(f'{label} ({len(payloads)})', rate, round(len(ctx.captured_queries) / len(payloads), 2))
@@ -0,0 +1,44 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from events.images import delete_variants
+from events.models import Attendee, User
+
+DEFAULT_AVATAR_PREFIX = 'profiles/default_avatar_'
+
+
+class Command(BaseCommand):
+    help = (
+        'Remplace les avatars par défaut générés par utilisateur (profiles/default_avatar_*.png) '
+        'par l\'avatar partagé /api/avatars/ et supprime les fichiers, par lots'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        total = 0
+
+        while True:
+            with transaction.atomic():
+                users = list(
+                    User.objects.filter(profile_image__startswith=DEFAULT_AVATAR_PREFIX)
+                    .order_by('id').values_list('id', 'profile_image', 'profile_image_variants')[:chunk_size]
+                )
+                if not users:
+                    break
+                names = [name for _, name, _ in users]
+                User.objects.filter(id__in=[user_id for user_id, _, _ in users]).update(
+                    profile_image='', profile_image_variants={}
+                )
+                # Copie de la photo prise à l'inscription à un événement
+                Attendee.objects.filter(profile_image__in=names).update(profile_image='')
+
+            for _, name, variants in users:
+                default_storage.delete(name)
+                delete_variants(variants or {}, default_storage)
+            total += len(users)
+            self.stdout.write(f'{total} avatar(s) traité(s)...')
+
+        self.stdout.write(self.style.SUCCESS(f'{total} avatar(s) par défaut remplacé(s) par l\'avatar partagé'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from events.recommendations import rebuild_affinities
+
+
+class Command(BaseCommand):
+    help = 'Recalcule les affinités utilisateur/catégorie des recommandations à partir des favoris, billets et avis'
+
+    def handle(self, *args, **options):
+        count = rebuild_affinities()
+        self.stdout.write(self.style.SUCCESS(f'{count} affinité(s) recalculée(s)'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from events.images import IMAGE_FIELDS, generate_variants
+
+
+class Command(BaseCommand):
+    help = (
+        'Génère les variantes responsives (vignette, carte, plein écran ; WebP et JPEG) '
+        'des images téléversées qui n\'en ont pas encore'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Régénère aussi les variantes existantes')
+
+    def handle(self, *args, **options):
+        total = 0
+        for (model, field_name), variants_field in IMAGE_FIELDS.items():
+            queryset = model._default_manager.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+            if not options['force']:
+                queryset = queryset.filter(**{variants_field: {}})
+            for pk in queryset.values_list('pk', flat=True).iterator():
+                generate_variants(model, pk, field_name)
+                total += 1
+        self.stdout.write(self.style.SUCCESS(f'Variantes générées pour {total} image(s)'))
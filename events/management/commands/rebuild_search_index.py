@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from events.models import EventSearchIndex
+from events.search import is_supported, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Reconstruit l\'index plein texte des événements'
+
+    def handle(self, *args, **options):
+        if not is_supported():
+            self.stdout.write(self.style.WARNING('Base non supportée : la recherche utilise des filtres icontains'))
+            return
+        with transaction.atomic():
+            rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'{EventSearchIndex.objects.count()} événement(s) indexé(s)'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from events.models import PlatformLedgerEntry, User
+
+
+class Command(BaseCommand):
+    help = 'Reporte les écritures du journal plateforme (TVA) sur le solde du compte gcash'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        try:
+            User.get_system_account()
+        except User.DoesNotExist:
+            self.stdout.write(self.style.ERROR('Compte système introuvable. Lancez create_gcash_account.'))
+            return
+
+        total_entries = 0
+        while True:
+            count, amount = PlatformLedgerEntry.reconcile(batch_size=options['batch_size'])
+            if not count:
+                break
+            total_entries += count
+            self.stdout.write(f'{count} écriture(s) rapprochée(s) : {amount} BIF')
+
+        self.stdout.write(self.style.SUCCESS(f'{total_entries} écriture(s) rapprochée(s) au total'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from events.trending import rollup
+
+
+class Command(BaseCommand):
+    help = 'Met à jour les scores de tendance des événements et le drapeau is_popular'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recalcule les scores depuis tout l\'historique')
+
+    def handle(self, *args, **options):
+        count = rollup(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(f'{count} événement(s) mis à jour'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from events.cancellation import run_cancellation
+from events.models import EventCancellationJob
+
+
+class Command(BaseCommand):
+    help = 'Reprend les annulations d\'événements interrompues (tâches en attente, en cours ou échouées)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=None)
+        parser.add_argument('--include-failed', action='store_true')
+
+    def handle(self, *args, **options):
+        statuses = ['pending', 'running'] + (['failed'] if options['include_failed'] else [])
+        job_ids = list(EventCancellationJob.objects.filter(status__in=statuses).values_list('id', flat=True))
+
+        for job_id in job_ids:
+            job = run_cancellation(job_id, chunk_size=options['chunk_size'])
+            line = f'{job.event.title} : {job.processed_tickets}/{job.total_tickets} billet(s) - {job.status}'
+            if job.status == 'completed':
+                self.stdout.write(self.style.SUCCESS(line))
+            else:
+                self.stdout.write(self.style.ERROR(f'{line} ({job.error})'))
+
+        self.stdout.write(f'{len(job_ids)} annulation(s) traitée(s)')
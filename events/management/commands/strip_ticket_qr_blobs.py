@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from events.models import Ticket
+
+
+class Command(BaseCommand):
+    help = 'Remplace les QR codes base64 stockés dans les billets par leur contenu (qr_payload), par lots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+
+        # Contenu déjà connu : le blob est effacé sans relire les billets
+        total = (
+            Ticket.objects.filter(qr_code__isnull=False, qr_payload__isnull=False)
+            .exclude(qr_payload='')
+            .update(qr_code=None)
+        )
+        self.stdout.write(f'{total} billet(s) traité(s)...')
+
+        # Sans contenu : seuls code et event_id sont lus pour le calculer, jamais le blob
+        last_id = 0
+        while True:
+            with transaction.atomic():
+                tickets = list(
+                    Ticket.objects.filter(id__gt=last_id, qr_code__isnull=False)
+                    .only('id', 'code', 'event_id', 'qr_payload')
+                    .order_by('id')[:chunk_size]
+                )
+                if not tickets:
+                    break
+
+                for ticket in tickets:
+                    ticket.qr_payload = ticket.build_qr_payload()
+                    ticket.qr_code = None
+                Ticket.objects.bulk_update(tickets, ['qr_payload', 'qr_code'])
+
+            last_id = tickets[-1].id
+            total += len(tickets)
+            self.stdout.write(f'{total} billet(s) traité(s)...')
+
+        self.stdout.write(self.style.SUCCESS(f'{total} QR code(s) base64 supprimé(s)'))
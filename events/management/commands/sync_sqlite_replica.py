@@ -0,0 +1,31 @@
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from events.replicas import replica_alias
+
+
+class Command(BaseCommand):
+    help = (
+        'Copie la base SQLite principale dans le réplica SQLite (DATABASE_REPLICA_URL) : '
+        'simule la réplication pour tester le routage des lectures en local'
+    )
+
+    def handle(self, *args, **options):
+        alias = replica_alias()
+        if alias is None:
+            raise CommandError('Aucun réplica configuré (DATABASE_REPLICA_URL)')
+
+        primary, replica = connections['default'].settings_dict, connections[alias].settings_dict
+        if primary['ENGINE'] != replica['ENGINE'] or not primary['ENGINE'].endswith('sqlite3'):
+            raise CommandError('La copie ne concerne que deux bases SQLite')
+
+        connections[alias].close()
+        source = sqlite3.connect(primary['NAME'])
+        target = sqlite3.connect(replica['NAME'])
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        self.stdout.write(self.style.SUCCESS(f"{primary['NAME']} copiée vers {replica['NAME']}"))
@@ -0,0 +1,32 @@
+# Generated by Django 5.0 on 2026-10-16 20:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0003_ticket_event_status_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlatformLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_type', models.CharField(choices=[('vat', 'TVA collectée'), ('vat_refund', 'TVA remboursée')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('description', models.TextField()),
+                ('reconciled_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='platform_entries', to='events.order')),
+                ('ticket', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='platform_entries', to='events.ticket')),
+            ],
+            options={
+                'db_table': 'platform_ledger',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['reconciled_at', 'id'], name='platform_le_reconci_e7e6d7_idx')],
+            },
+        ),
+    ]
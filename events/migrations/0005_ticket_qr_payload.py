@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-16 20:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0004_platform_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='qr_payload',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0 on 2026-10-16 20:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0005_ticket_qr_payload'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['event', 'updated_at'], name='tickets_event_i_fda1b6_idx'),
+        ),
+    ]
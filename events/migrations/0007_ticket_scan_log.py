@@ -0,0 +1,34 @@
+# Generated by Django 5.0 on 2026-10-16 20:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0006_ticket_event_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketScan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gate', models.CharField(blank=True, default='', max_length=50)),
+                ('result', models.CharField(choices=[('admitted', 'Admis'), ('already_used', 'Déjà utilisé'), ('duplicate', 'Doublon'), ('rejected', 'Refusé'), ('forbidden', 'Non autorisé'), ('event_closed', 'Événement non ouvert'), ('cancelled', 'Annulé'), ('expired', 'Expiré'), ('not_found', 'Introuvable')], max_length=20)),
+                ('source', models.CharField(choices=[('online', 'En ligne'), ('offline', 'Hors ligne')], default='online', max_length=10)),
+                ('latency_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('event', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ticket_scans', to='events.event')),
+                ('scanned_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ticket_scans', to=settings.AUTH_USER_MODEL)),
+                ('ticket', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='scans', to='events.ticket')),
+            ],
+            options={
+                'db_table': 'ticket_scans',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['event', 'created_at'], name='ticket_scan_event_i_2c4eb4_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0 on 2026-10-16 20:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0007_ticket_scan_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventCancellationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('running', 'En cours'), ('completed', 'Terminée'), ('failed', 'Échouée')], default='pending', max_length=20)),
+                ('total_tickets', models.PositiveIntegerField(default=0)),
+                ('processed_tickets', models.PositiveIntegerField(default=0)),
+                ('refunded_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cancellation_jobs', to='events.event')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cancellation_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'event_cancellation_jobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
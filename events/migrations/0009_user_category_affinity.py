@@ -0,0 +1,30 @@
+# Generated by Django 5.0 on 2026-10-16 20:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0008_event_cancellation_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCategoryAffinity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='affinities', to='events.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='category_affinities', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'user_category_affinity',
+                'indexes': [models.Index(fields=['category', 'user'], name='user_catego_categor_787f3e_idx')],
+                'unique_together': {('user', 'category')},
+            },
+        ),
+    ]
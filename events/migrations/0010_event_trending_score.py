@@ -0,0 +1,33 @@
+# Generated by Django 5.0 on 2026-10-16 20:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0009_user_category_affinity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('epoch', models.DateTimeField()),
+                ('last_run_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'trending_rollup',
+            },
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='trending_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['-trending_score'], name='events_trendin_902120_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0 on 2026-10-16 20:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_search_index(apps, schema_editor):
+    from events.search import install
+    install(schema_editor)
+
+
+def drop_search_index(apps, schema_editor):
+    from events.search import uninstall
+    uninstall(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0010_event_trending_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventSearchIndex',
+            fields=[
+                ('event', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='events.event')),
+                ('title', models.TextField()),
+                ('description', models.TextField()),
+                ('location', models.TextField()),
+                ('document', models.TextField(db_column='events_fts')),
+            ],
+            options={
+                'db_table': 'events_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0 on 2026-10-16 22:37
+
+from django.db import migrations, models
+
+
+def fill_geo_cells(apps, schema_editor):
+    from events.geo import geo_cell
+    Event = apps.get_model('events', 'Event')
+    located = Event.objects.filter(latitude__isnull=False, longitude__isnull=False).only('latitude')
+    batch = []
+    for event in located.iterator(chunk_size=2000):
+        event.geo_cell = geo_cell(event.latitude)
+        batch.append(event)
+        if len(batch) == 2000:
+            Event.objects.bulk_update(batch, ['geo_cell'])
+            batch = []
+    Event.objects.bulk_update(batch, ['geo_cell'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0011_event_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='geo_cell',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['geo_cell', 'longitude'], name='events_geo_cel_1dbc72_idx'),
+        ),
+        migrations.RunPython(fill_geo_cells, migrations.RunPython.noop),
+    ]
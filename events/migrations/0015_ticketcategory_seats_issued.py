@@ -0,0 +1,35 @@
+# Generated by Django 5.0 on 2026-10-16 23:40
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_seats_issued(apps, schema_editor):
+    # Chaque billet émis, même annulé, a consommé un numéro de place
+    TicketCategory = apps.get_model('events', 'TicketCategory')
+    Ticket = apps.get_model('events', 'Ticket')
+    issued = (
+        Ticket.objects.filter(ticket_category=OuterRef('pk'))
+        .order_by()
+        .values('ticket_category')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    TicketCategory.objects.update(seats_issued=Coalesce(Subquery(issued), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0014_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticketcategory',
+            name='seats_issued',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_seats_issued, migrations.RunPython.noop),
+    ]
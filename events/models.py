@@ -1,8 +1,5 @@
-import qrcode
-import base64
-from io import BytesIO
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
 
 class User(AbstractUser):
     """
@@ -10,6 +7,7 @@ class User(AbstractUser):
     """
     phone_number = models.CharField(max_length=20, blank=True, null=True)
     profile_image = models.ImageField(upload_to='profiles/', blank=True, null=True)
+    profile_image_variants = models.JSONField(default=dict, blank=True, editable=False)  # Voir events.images
     bio = models.TextField(blank=True, null=True)
     date_of_birth = models.DateField(blank=True, null=True)
     wallet_balance = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
@@ -20,53 +18,34 @@ class User(AbstractUser):
         db_table = 'users'
         ordering = ['-created_at']
 
-    def save(self, *args, **kwargs):
-        # Générer une image par défaut si aucune image n'est fournie
-        if not self.profile_image and self.first_name and self.last_name:
-            self.profile_image = self.generate_default_avatar()
-        super().save(*args, **kwargs)
-    
-    def generate_default_avatar(self):
-        """Génère un avatar par défaut basé sur les initiales"""
-        from PIL import Image, ImageDraw, ImageFont
-        import os
-        from django.core.files.base import ContentFile
-        from io import BytesIO
-        
-        # Créer les initiales
-        initials = f"{self.first_name[0]}{self.last_name[0]}".upper()
-        
-        # Créer une image 200x200
-        img = Image.new('RGB', (200, 200), color='#007bff')
-        draw = ImageDraw.Draw(img)
-        
-        # Dessiner les initiales au centre
-        try:
-            font = ImageFont.truetype('arial.ttf', 80)
-        except:
-            font = ImageFont.load_default()
-        
-        bbox = draw.textbbox((0, 0), initials, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        
-        x = (200 - text_width) // 2
-        y = (200 - text_height) // 2
-        
-        draw.text((x, y), initials, fill='white', font=font)
-        
-        # Sauvegarder en mémoire
-        buffer = BytesIO()
-        img.save(buffer, format='PNG')
-        buffer.seek(0)
-        
-        # Retourner le fichier
-        filename = f"default_avatar_{self.username}.png"
-        return ContentFile(buffer.getvalue(), name=filename)
-
     def __str__(self):
         return self.username
     
+    @classmethod
+    def system_account_filter(cls):
+        """
+        Filtre du compte système (gcash) qui reçoit la TVA. Son pk est résolu
+        une fois par processus ; le nom d'utilisateur reste dans le filtre pour
+        qu'un pk périmé (compte recréé) ne désigne jamais un autre compte.
+        """
+        from django.conf import settings
+        username = getattr(settings, 'SYSTEM_ACCOUNT_USERNAME', 'gcash')
+        if 'id' not in _system_account_cache:
+            _system_account_cache['id'] = cls.objects.values_list('pk', flat=True).get(username=username)
+        return models.Q(pk=_system_account_cache['id'], username=username)
+    
+    @classmethod
+    def get_system_account(cls):
+        try:
+            return cls.objects.get(cls.system_account_filter())
+        except cls.DoesNotExist:
+            # pk périmé : nouvelle résolution par nom d'utilisateur
+            _system_account_cache.clear()
+            return cls.objects.get(cls.system_account_filter())
+
+
+_system_account_cache = {}
+
 class Category(models.Model):
     """
     Catégories d'événements (Musique, Sport, Théâtre, etc.)
@@ -75,6 +54,7 @@ class Category(models.Model):
     description = models.TextField(blank=True, null=True)
     icon = models.CharField(max_length=50, blank=True, null=True)  # Nom de l'icône
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'categories'
@@ -95,10 +75,12 @@ class TicketCategory(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     capacity = models.IntegerField(default=50)  # Nombre de places pour cette catégorie
     available_seats = models.IntegerField(blank=True, null=True)
+    seats_issued = models.PositiveIntegerField(default=0, editable=False)  # Compteur des numéros de place attribués, jamais décrémenté
     color = models.CharField(max_length=7, default='#007bff')  # Couleur hex pour l'UI
     benefits = models.TextField(blank=True, null=True)  # Avantages de cette catégorie
     order = models.IntegerField(default=0)  # Ordre d'affichage
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'ticket_categories'
@@ -146,11 +128,13 @@ class Event(models.Model):
     description = models.TextField()
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='events')
     image_url = models.ImageField(upload_to='events/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)  # Voir events.images
 
     # Informations de localisation
     location = models.CharField(max_length=255)
     latitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
+    geo_cell = models.IntegerField(blank=True, null=True, editable=False)  # Bande de latitude, voir events.geo
 
     # Informations temporelles
     date = models.DateTimeField()
@@ -178,6 +162,7 @@ class Event(models.Model):
     is_popular = models.BooleanField(default=False)
     rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
     total_reviews = models.IntegerField(default=0)
+    trending_score = models.FloatField(default=0)  # Décroissance temporelle, voir events.trending
 
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -189,12 +174,20 @@ class Event(models.Model):
         indexes = [
             models.Index(fields=['date', 'status']),
             models.Index(fields=['category', 'is_popular']),
+            models.Index(fields=['-trending_score']),
+            models.Index(fields=['geo_cell', 'longitude']),
         ]
 
     def save(self, *args, **kwargs):
+        from .geo import geo_cell
+
         # Initialiser available_seats à total_capacity si non défini
         if self.available_seats is None:
             self.available_seats = self.total_capacity
+        self.geo_cell = geo_cell(self.latitude) if self.longitude is not None else None
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geo_cell'}
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -220,6 +213,23 @@ class Event(models.Model):
             return 0
         return Decimal(str(self.price)) + Decimal(str(self.tva_amount))
 
+
+class EventSearchIndex(models.Model):
+    """
+    Index plein texte des événements (table créée par migration selon la base :
+    FTS5 sous SQLite, tsvector + GIN sous PostgreSQL) - voir events.search
+    """
+    event = models.OneToOneField(Event, on_delete=models.DO_NOTHING, primary_key=True,
+                                 db_column='rowid', related_name='search_index')
+    title = models.TextField()
+    description = models.TextField()
+    location = models.TextField()
+    document = models.TextField(db_column='events_fts')
+    
+    class Meta:
+        managed = False
+        db_table = 'events_fts'
+
     
 class EventImage(models.Model):
     """
@@ -227,6 +237,7 @@ class EventImage(models.Model):
     """
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='events/gallery/')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)  # Voir events.images
     caption = models.CharField(max_length=255, blank=True, null=True)
     order = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -255,22 +266,65 @@ class Attendee(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.event.title}"
     
+    @classmethod
+    def attach_ticket_summaries(cls, attendees):
+        """
+        Calcule tickets_info et total_paid pour une liste d'attendees avec une
+        seule requête groupée par (événement, utilisateur, catégorie, prix)
+        """
+        attendees = list(attendees)
+        if not attendees:
+            return attendees
+        return cls._apply_ticket_summaries(attendees, cls._ticket_summary_rows(attendees))
+    
+    @classmethod
+    async def aattach_ticket_summaries(cls, attendees):
+        attendees = list(attendees)
+        if not attendees:
+            return attendees
+        rows = [row async for row in cls._ticket_summary_rows(attendees)]
+        return cls._apply_ticket_summaries(attendees, rows)
+    
+    @staticmethod
+    def _ticket_summary_rows(attendees):
+        from django.db.models import Count
+        return Ticket.objects.filter(
+            event_id__in={attendee.event_id for attendee in attendees},
+            user_id__in={attendee.user_id for attendee in attendees},
+            status='confirmed'
+        ).values(
+            'event_id', 'user_id', 'ticket_category__name', 'price_ttc'
+        ).annotate(quantity=Count('id')).order_by('event_id', 'user_id', 'ticket_category__name', 'price_ttc')
+    
+    @staticmethod
+    def _apply_ticket_summaries(attendees, rows):
+        summaries = {}
+        for row in rows:
+            summaries.setdefault((row['event_id'], row['user_id']), []).append(row)
+        
+        for attendee in attendees:
+            user_rows = summaries.get((attendee.event_id, attendee.user_id), [])
+            attendee._tickets_info = [{
+                'category': row['ticket_category__name'],
+                'price_paid': str(row['price_ttc']),
+                'quantity': row['quantity']
+            } for row in user_rows]
+            attendee._total_paid = sum(row['price_ttc'] * row['quantity'] for row in user_rows)
+        return attendees
+    
     @property
     def tickets_info(self):
         """Retourne les informations des tickets achetés par cet attendee"""
-        tickets = self.user.tickets.filter(event=self.event, status='confirmed')
-        return [{
-            'category': ticket.ticket_category.name,
-            'price_paid': str(ticket.price_ttc),
-            'quantity': 1
-        } for ticket in tickets]
+        if not hasattr(self, '_tickets_info'):
+            Attendee.attach_ticket_summaries([self])
+        return self._tickets_info
     
     @property
     def total_paid(self):
         """Montant total payé par cet attendee pour cet événement"""
-        from decimal import Decimal
-        tickets = self.user.tickets.filter(event=self.event, status='confirmed')
-        return sum(Decimal(str(ticket.price_ttc)) for ticket in tickets)
+        if not hasattr(self, '_total_paid'):
+            Attendee.attach_ticket_summaries([self])
+        return self._total_paid
     
 class Ticket(models.Model):
     """
@@ -301,8 +355,9 @@ class Ticket(models.Model):
     price_ttc = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)  # Prix TTC
     currency = models.CharField(max_length=3, default='BIF')
 
-    # QR Code pour validation (stocké en base64)
-    qr_code = models.TextField(blank=True, null=True)  # Base64 encoded QR code
+    # QR Code pour validation : seul le contenu est stocké, l'image est servie par /api/tickets/{id}/qr.png
+    qr_payload = models.TextField(blank=True, null=True)
+    qr_code = models.TextField(blank=True, null=True)  # Ancien stockage base64, vidé par strip_ticket_qr_blobs
 
     # Statut et dates
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='confirmed')
@@ -320,16 +375,25 @@ class Ticket(models.Model):
         indexes = [
             models.Index(fields=['code']),
             models.Index(fields=['user', 'status']),
+            models.Index(fields=['user', '-purchase_date']),
+            models.Index(fields=['event', 'status']),
+            models.Index(fields=['event', 'updated_at']),
+            models.Index(fields=['purchase_date']),  # Fenêtres de events.trending
         ]
 
     def __str__(self):
         return f"Ticket {self.code} - {self.event.title}"
 
+    @staticmethod
+    def generate_code():
+        """Génère un code de billet unique"""
+        import uuid
+        return f"TKT-{uuid.uuid4().hex[:12].upper()}"
+    
     def save(self, *args, **kwargs):
         if not self.code:
             # Générer un code unique
-            import uuid
-            self.code = f"TKT-{uuid.uuid4().hex[:12].upper()}"
+            self.code = self.generate_code()
         
         # Calculer automatiquement la TVA et le prix TTC
         if self.price:
@@ -337,17 +401,24 @@ class Ticket(models.Model):
             self.tva_amount = (Decimal(str(self.price)) * Decimal(str(self.tva_rate))) / Decimal('100')
             self.price_ttc = Decimal(str(self.price)) + self.tva_amount
         
-        # Générer le QR code en base64 si pas déjà présent
-        if not self.qr_code:
-            self.qr_code = self.generate_qr_code()
+        # Le contenu du QR est stocké, l'image est rendue à la demande (events.qr)
+        if not self.qr_payload:
+            self.qr_payload = self.build_qr_payload()
         
         super().save(*args, **kwargs)
     
-    def generate_qr_code(self):
+    def build_qr_payload(self):
         """
-        Génère un QR code en base64 contenant les informations du billet
+        Contenu du QR code du billet : jeton signé compact (code + événement),
+        stocké dans qr_payload
+        """
+        from .qr import sign_ticket_token
+        return sign_ticket_token(self.code, self.event_id)
+    
+    def build_legacy_qr_payload(self):
+        """
+        Ancien contenu JSON du QR code, encore accepté à la validation
         """
-        # Créer les données du QR code
         qr_data = {
             'ticket_code': self.code,
             'event_title': self.event.title,
@@ -361,63 +432,88 @@ class Ticket(models.Model):
             'price_ttc': str(self.price_ttc)
         }
         
-        # Convertir en chaîne JSON
         import json
-        qr_string = json.dumps(qr_data, ensure_ascii=False)
-        
-        # Créer le QR code
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(qr_string)
-        qr.make(fit=True)
+        return json.dumps(qr_data, ensure_ascii=False)
+    
+    @classmethod
+    def parse_qr_data(cls, qr_data_string):
+        """
+        Extrait le code du billet du contenu scanné, sans accès à la base.
         
-        # Créer l'image
-        img = qr.make_image(fill_color="black", back_color="white")
+        - Jeton signé (format actuel) : signature HMAC vérifiée en mémoire
+        - JSON (ancien format) : accepté pour les billets déjà imprimés
         
-        # Convertir en base64
-        buffer = BytesIO()
-        img.save(buffer, format='PNG')
-        img_str = base64.b64encode(buffer.getvalue()).decode('utf-8')
+        Retourne (ticket_code, event_id, erreur) ; event_id vaut None pour l'ancien format.
+        """
+        from .qr import is_ticket_token, parse_ticket_token
+        
+        if is_ticket_token(qr_data_string):
+            parsed = parse_ticket_token(qr_data_string)
+            if parsed is None:
+                return None, None, "QR code invalide"
+            ticket_code, event_id = parsed
+            return ticket_code, event_id, None
         
-        return f"data:image/png;base64,{img_str}"
+        import json
+        try:
+            qr_data = json.loads(qr_data_string)
+        except (TypeError, ValueError):
+            return None, None, "QR code invalide"
+        if not isinstance(qr_data, dict):
+            return None, None, "QR code invalide"
+        
+        ticket_code = qr_data.get('ticket_code')
+        if not ticket_code:
+            return None, None, "Code de billet manquant"
+        return ticket_code, None, None
+    
+    def get_status_error(self):
+        """Message d'erreur si le billet ne peut pas être présenté à l'entrée"""
+        if self.status == 'cancelled':
+            return "Ce billet a été annulé"
+        elif self.status == 'used':
+            return "Ce billet a déjà été utilisé"
+        elif self.status == 'expired':
+            return "Ce billet a expiré"
+        return None
     
     @classmethod
-    def validate_qr_code(cls, qr_data_string):
+    def resolve_qr_code(cls, qr_data_string):
         """
-        Valide un QR code et retourne le ticket correspondant
+        Retourne (ticket, None) pour le billet désigné par un QR code, quel que
+        soit son statut, ou (None, (résultat de scan, message)) si le QR code
+        est invalide ou le billet introuvable
         """
+        ticket_code, event_id, error = cls.parse_qr_data(qr_data_string)
+        if error:
+            return None, ('rejected', error)
+        
         try:
-            import json
-            qr_data = json.loads(qr_data_string)
-            ticket_code = qr_data.get('ticket_code')
-            
-            if not ticket_code:
-                return None, "Code de billet manquant"
-            
-            try:
-                ticket = cls.objects.get(code=ticket_code)
-                
-                # Vérifier le statut du billet
-                if ticket.status == 'cancelled':
-                    return None, "Ce billet a été annulé"
-                elif ticket.status == 'used':
-                    return None, "Ce billet a déjà été utilisé"
-                elif ticket.status == 'expired':
-                    return None, "Ce billet a expiré"
-                
-                return ticket, "Billet valide"
-                
-            except cls.DoesNotExist:
-                return None, "Billet non trouvé"
-                
-        except json.JSONDecodeError:
-            return None, "QR code invalide"
+            ticket = cls.objects.select_related('event').get(code=ticket_code)
+        except cls.DoesNotExist:
+            return None, ('not_found', "Billet non trouvé")
         except Exception as e:
-            return None, f"Erreur de validation: {str(e)}"
+            return None, ('rejected', f"Erreur de validation: {str(e)}")
+        
+        if event_id is not None and ticket.event_id != event_id:
+            return None, ('rejected', "QR code invalide")
+        return ticket, None
+    
+    @classmethod
+    def validate_qr_code(cls, qr_data_string):
+        """
+        Valide un QR code et retourne le ticket correspondant
+        """
+        ticket, error = cls.resolve_qr_code(qr_data_string)
+        if error:
+            return None, error[1]
+        
+        # Vérifier le statut du billet
+        error = ticket.get_status_error()
+        if error:
+            return None, error
+        
+        return ticket, "Billet valide"
 
 class Order(models.Model):
     """
@@ -459,6 +555,7 @@ class Order(models.Model):
         indexes = [
             models.Index(fields=['order_number']),
             models.Index(fields=['user', 'payment_status']),
+            models.Index(fields=['user', '-created_at']),
         ]
 
     def __str__(self):
@@ -482,106 +579,107 @@ class Order(models.Model):
         
         super().save(*args, **kwargs)
     
+    def reserve_seats(self):
+        """
+        Réserve atomiquement `quantity` places dans la catégorie et l'événement
+        par des UPDATE conditionnels (available_seats >= quantity).
+        
+        Doit être appelé dans une transaction : si l'une des deux réservations
+        échoue, ValueError est levée et rien n'est décompté.
+        Retourne le numéro de la première place réservée dans la catégorie,
+        tiré du compteur seats_issued incrémenté par le même UPDATE.
+        """
+        from django.db.models import F
+        from django.utils import timezone
+        
+        if self.quantity < 1:
+            raise ValueError("La quantité doit être au moins 1")
+        if self.event.status in ['cancelled', 'deleted']:
+            raise ValueError(f"L'événement {self.event.title} n'est plus en vente")
+        
+        reserved = TicketCategory.objects.filter(
+            pk=self.ticket_category_id,
+            available_seats__gte=self.quantity
+        ).update(
+            available_seats=F('available_seats') - self.quantity,
+            seats_issued=F('seats_issued') + self.quantity,
+            updated_at=timezone.now()
+        )
+        if not reserved:
+            raise ValueError(f"Plus assez de places disponibles en catégorie {self.ticket_category.name}")
+        
+        reserved = Event.objects.filter(
+            pk=self.event_id,
+            available_seats__gte=self.quantity
+        ).exclude(status__in=['cancelled', 'deleted']).update(available_seats=F('available_seats') - self.quantity, updated_at=timezone.now())
+        if not reserved:
+            raise ValueError(f"Plus assez de places disponibles pour {self.event.title}")
+        
+        self.ticket_category.refresh_from_db(fields=['available_seats', 'seats_issued'])
+        self.event.refresh_from_db(fields=['available_seats', 'updated_at'])
+        # seats_issued ne redescend pas à l'annulation : une place libérée n'est pas réattribuée
+        return self.ticket_category.seats_issued - self.quantity + 1
+    
+    @transaction.atomic
     def create_tickets(self):
-        """Créer les billets pour cette commande basé sur la quantité"""
+        """
+        Créer les billets pour cette commande basé sur la quantité.
+        
+        Réservation des places, mouvements de wallet et billets sont écrits
+        dans une seule transaction : une erreur annule l'ensemble.
+        """
         if self.payment_status != 'completed':
             return []
         
         from decimal import Decimal
         
-        # Vérifier le solde suffisant (même pour événements gratuits avec montant 0)
-        if self.user.wallet_balance < self.total_ttc:
-            raise ValueError(f"Solde insuffisant. Solde actuel: {self.user.wallet_balance} BIF, Montant requis: {self.total_ttc} BIF")
-        
-        # Déduire du wallet de l'acheteur
-        buyer_balance_before = self.user.wallet_balance
-        self.user.wallet_balance -= Decimal(str(self.total_ttc))
-        self.user.save()
-        
-        # Créer transaction d'achat pour l'acheteur
-        WalletTransaction.objects.create(
-            user=self.user,
-            transaction_type='purchase',
-            amount=-Decimal(str(self.total_ttc)),
-            balance_before=buyer_balance_before,
-            balance_after=self.user.wallet_balance,
-            description=f"Achat de {self.quantity} billet(s) {self.ticket_category.name} pour {self.event.title}",
-            order=self
-        )
+        # Réserver les places avant tout mouvement d'argent
+        first_seat = self.reserve_seats()
         
-        # Pour chaque ticket: prix HT va à l'organisateur, TVA va à gcash
-        total_ht_for_organizer = Decimal(str(self.total_ht))
-        total_tva_for_gcash = Decimal(str(self.total_tva))
-        
-        # Transférer la TVA à l'app (compte gcash)
+        # Débit conditionnel de l'acheteur, prix HT à l'organisateur, TVA au journal plateforme (rapproché vers gcash)
+        from .ledger import PLATFORM, InsufficientFunds, Leg, balance_of, post_entry
         try:
-            gcash_user = User.objects.get(username='gcash')
-            gcash_balance_before = gcash_user.wallet_balance
-            gcash_user.wallet_balance += total_tva_for_gcash
-            gcash_user.save()
-            
-            WalletTransaction.objects.create(
-                user=gcash_user,
-                transaction_type='deposit',
-                amount=total_tva_for_gcash,
-                balance_before=gcash_balance_before,
-                balance_after=gcash_user.wallet_balance,
-                description=f"TVA collectée - {self.event.title} ({self.quantity} billets)",
-                order=self
-            )
-        except User.DoesNotExist:
-            pass
-        
-        # Transférer le prix HT à l'organisateur
-        organizer = self.event.organizer
-        organizer_balance_before = organizer.wallet_balance
-        organizer.wallet_balance += total_ht_for_organizer
-        organizer.save()
-        
-        # Créer transaction de vente pour l'organisateur
-        WalletTransaction.objects.create(
-            user=organizer,
-            transaction_type='deposit',
-            amount=total_ht_for_organizer,
-            balance_before=organizer_balance_before,
-            balance_after=organizer.wallet_balance,
-            description=f"Vente de {self.quantity} billet(s) {self.ticket_category.name} pour {self.event.title} à {self.user.username}",
-            order=self
-        )
-        
-        # Calculer le nombre de tickets déjà vendus pour cette catégorie
-        existing_tickets_count = Ticket.objects.filter(
-            event=self.event,
-            ticket_category=self.ticket_category,
-            status='confirmed'
-        ).count()
+            post_entry([
+                Leg(self.user, -Decimal(str(self.total_ttc)), 'purchase',
+                    f"Achat de {self.quantity} billet(s) {self.ticket_category.name} pour {self.event.title}"),
+                Leg(self.event.organizer_id, Decimal(str(self.total_ht)), 'deposit',
+                    f"Vente de {self.quantity} billet(s) {self.ticket_category.name} pour {self.event.title} à {self.user.username}"),
+                Leg(PLATFORM, Decimal(str(self.total_tva)), 'vat',
+                    f"TVA collectée - {self.event.title} ({self.quantity} billets)"),
+            ], order=self)
+        except InsufficientFunds:
+            raise ValueError(f"Solde insuffisant. Solde actuel: {balance_of(self.user)} BIF, Montant requis: {self.total_ttc} BIF")
+        self.user.refresh_from_db(fields=['wallet_balance'])
+        
+        # Émission groupée : prix calculés une fois, un seul INSERT, images QR rendues à la demande
+        unit_price = Decimal(str(self.unit_price))
+        tva_rate = Decimal(str(self.tva_rate))
+        unit_tva = ((unit_price * tva_rate) / Decimal('100')).quantize(Decimal('0.01'))
+        holder_name = f"{self.user.first_name} {self.user.last_name}"
         
         tickets = []
         for i in range(self.quantity):
-            seat_number = f"{self.ticket_category.name[0]}{existing_tickets_count + i + 1}" if self.ticket_category.capacity > 0 else "General"
-            
-            ticket = Ticket.objects.create(
+            seat_number = f"{self.ticket_category.name[0]}{first_seat + i}" if self.ticket_category.capacity > 0 else "General"
+            ticket = Ticket(
+                code=Ticket.generate_code(),
                 event=self.event,
                 ticket_category=self.ticket_category,
                 user=self.user,
-                holder_name=f"{self.user.first_name} {self.user.last_name}",
+                holder_name=holder_name,
                 holder_email=self.user.email,
                 holder_phone=self.user.phone_number,
                 seat=seat_number,
-                price=self.unit_price,
-                tva_rate=self.tva_rate
+                price=unit_price,
+                tva_rate=tva_rate,
+                tva_amount=unit_tva,
+                price_ttc=unit_price + unit_tva
             )
+            ticket.qr_payload = ticket.build_qr_payload()
             tickets.append(ticket)
+        tickets = Ticket.objects.bulk_create(tickets, batch_size=500)
         
-        # Mettre à jour les sièges disponibles de la catégorie ET de l'événement
-        if self.ticket_category.available_seats >= self.quantity:
-            self.ticket_category.available_seats -= self.quantity
-            self.ticket_category.save()
-        
-        # Mettre à jour les sièges disponibles de l'événement
-        if self.event.available_seats >= self.quantity:
-            self.event.available_seats -= self.quantity
-            self.event.save()
+        from .signals import tickets_issued
+        tickets_issued.send(sender=Ticket, order=self, tickets=tickets)
         
         # Créer automatiquement un attendee
         Attendee.objects.get_or_create(
@@ -609,6 +707,10 @@ class Review(models.Model):
         db_table = 'reviews'
         unique_together = ['event', 'user']
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['event', '-created_at']),
+            models.Index(fields=['created_at']),  # Fenêtres de events.trending
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.event.title} ({self.rating}★)"
@@ -627,6 +729,10 @@ class Favorite(models.Model):
         db_table = 'favorites'
         unique_together = ['user', 'event']
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['created_at']),  # Fenêtres de events.trending
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.event.title}"
@@ -655,6 +761,191 @@ class WalletTransaction(models.Model):
     class Meta:
         db_table = 'wallet_transactions'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.transaction_type} - {self.amount} BIF"
+
+class PlatformLedgerEntry(models.Model):
+    """
+    Journal append-only des mouvements de la plateforme (TVA collectée ou
+    remboursée). Les écritures sont insérées sans toucher la ligne du compte
+    gcash, puis rapprochées par lots sur son solde (voir reconcile).
+    """
+    ENTRY_TYPES = [
+        ('vat', 'TVA collectée'),
+        ('vat_refund', 'TVA remboursée'),
+    ]
+    
+    entry_type = models.CharField(max_length=20, choices=ENTRY_TYPES)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)  # Négatif pour un remboursement
+    description = models.TextField()
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='platform_entries')
+    ticket = models.ForeignKey(Ticket, on_delete=models.SET_NULL, null=True, blank=True, related_name='platform_entries')
+    reconciled_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'platform_ledger'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['reconciled_at', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.entry_type} - {self.amount} BIF"
+    
+    @classmethod
+    def reconcile(cls, batch_size=5000):
+        """
+        Reporte sur le solde du compte système les écritures non rapprochées,
+        par lots, avec une seule mise à jour et une transaction wallet par lot.
+        Retourne (nombre d'écritures, montant net).
+        """
+        from decimal import Decimal
+        from django.db.models import F
+        from django.utils import timezone
+        
+        account_filter = User.system_account_filter()
+        
+        with transaction.atomic():
+            entries = list(
+                cls.objects.select_for_update()
+                .filter(reconciled_at__isnull=True)
+                .order_by('id')
+                .values_list('id', 'amount')[:batch_size]
+            )
+            if not entries:
+                return 0, Decimal('0')
+            
+            entry_ids = [entry_id for entry_id, _ in entries]
+            total = sum((amount for _, amount in entries), Decimal('0'))
+            
+            if not User.objects.filter(account_filter).update(wallet_balance=F('wallet_balance') + total):
+                _system_account_cache.clear()
+                raise User.DoesNotExist("Compte système introuvable")
+            account_id, balance = User.objects.filter(account_filter).values_list('pk', 'wallet_balance').get()
+            
+            WalletTransaction.objects.create(
+                user_id=account_id,
+                transaction_type='deposit' if total >= 0 else 'refund',
+                amount=total,
+                balance_before=balance - total,
+                balance_after=balance,
+                description=f"Rapprochement du journal plateforme - {len(entry_ids)} écriture(s)"
+            )
+            cls.objects.filter(id__in=entry_ids).update(reconciled_at=timezone.now())
+        
+        return len(entry_ids), total
+
+class TrendingRollup(models.Model):
+    """
+    État du calcul des scores de tendance (une seule ligne) : origine des
+    poids décroissants et fin de la fenêtre comptée au dernier passage
+    """
+    epoch = models.DateTimeField()
+    last_run_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        db_table = 'trending_rollup'
+    
+    def __str__(self):
+        return f"Tendances - {self.last_run_at}"
+
+class UserCategoryAffinity(models.Model):
+    """
+    Intérêt d'un utilisateur pour une catégorie, tenu à jour de façon
+    incrémentale par les signaux (favoris, achats, avis) - voir events.recommendations
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='category_affinities')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='affinities')
+    score = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'user_category_affinity'
+        unique_together = ['user', 'category']
+        indexes = [
+            models.Index(fields=['category', 'user']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.category.name}: {self.score}"
+
+class EventCancellationJob(models.Model):
+    """
+    Annulation d'un événement exécutée en arrière-plan, par lots de billets.
+    Chaque lot est remboursé dans sa propre transaction : une tâche interrompue
+    reprend aux billets encore confirmés (voir events.cancellation).
+    """
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('running', 'En cours'),
+        ('completed', 'Terminée'),
+        ('failed', 'Échouée'),
+    ]
+    
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='cancellation_jobs')
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='cancellation_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    total_tickets = models.PositiveIntegerField(default=0)
+    processed_tickets = models.PositiveIntegerField(default=0)
+    refunded_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        db_table = 'event_cancellation_jobs'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.event.title} - {self.status} ({self.processed_tickets}/{self.total_tickets})"
+    
+    @property
+    def progress(self):
+        if not self.total_tickets:
+            return 100 if self.status == 'completed' else 0
+        return round(self.processed_tickets * 100 / self.total_tickets, 1)
+
+class TicketScan(models.Model):
+    """
+    Journal append-only des tentatives de contrôle d'accès (une ligne par scan)
+    """
+    RESULT_CHOICES = [
+        ('admitted', 'Admis'),
+        ('already_used', 'Déjà utilisé'),
+        ('duplicate', 'Doublon'),
+        ('rejected', 'Refusé'),
+        ('forbidden', 'Non autorisé'),
+        ('event_closed', 'Événement non ouvert'),
+        ('cancelled', 'Annulé'),
+        ('expired', 'Expiré'),
+        ('not_found', 'Introuvable'),
+    ]
+    SOURCE_CHOICES = [
+        ('online', 'En ligne'),
+        ('offline', 'Hors ligne'),
+    ]
+    
+    ticket = models.ForeignKey(Ticket, on_delete=models.SET_NULL, null=True, blank=True, related_name='scans')
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, null=True, blank=True, related_name='ticket_scans')
+    scanned_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='ticket_scans')
+    gate = models.CharField(max_length=50, blank=True, default='')
+    result = models.CharField(max_length=20, choices=RESULT_CHOICES)
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES, default='online')
+    latency_ms = models.PositiveIntegerField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'ticket_scans'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['event', 'created_at']),
+        ]
     
     def __str__(self):
-        return f"{self.user.username} - {self.transaction_type} - {self.amount} BIF"
\ No newline at end of file
+        return f"{self.gate or '-'} - {self.result}"
@@ -0,0 +1,85 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Pagination par curseur (keyset) basée sur l'ordre déjà appliqué au queryset.
+
+    Contrairement à une pagination OFFSET, le coût d'une page ne dépend pas
+    de sa profondeur : chaque page filtre sur la position du dernier élément.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'PAGINATION_MAX_PAGE_SIZE', 100)
+    ordering = '-id'
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Reprend l'ordre du queryset (OrderingFilter, order_by() de l'action ou
+        Meta.ordering du modèle) et ajoute `id` comme départage stable.
+        """
+        ordering = [
+            field for field in (queryset.query.order_by or queryset.model._meta.ordering)
+            if isinstance(field, str)
+            and '__' not in field
+            and field != '?'
+            and field.lstrip('-') not in ('id', 'pk')
+        ]
+        if not ordering:
+            return (self.ordering,)
+
+        tiebreaker = '-id' if ordering[0].startswith('-') else 'id'
+        return tuple(ordering) + (tiebreaker,)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset de DRF pour les vues asynchrones (events.async_views) :
+        la page et ses prefetch sont lus dans le thread des requêtes synchrones
+        """
+        return await sync_to_async(self.paginate_queryset)(queryset, request, view)
+
+
+class PaginatedActionMixin:
+    """
+    Pagine les réponses des actions personnalisées (@action) comme `list`.
+    """
+
+    def _page_serializer(self, serializer_class):
+        if serializer_class is None:
+            return self.get_serializer
+
+        def get_serializer(*args, **kwargs):
+            kwargs.setdefault('context', self.get_serializer_context())
+            return serializer_class(*args, **kwargs)
+        return get_serializer
+
+    def paginated_response(self, queryset, serializer_class=None):
+        get_serializer = self._page_serializer(serializer_class)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    async def aprepare_objects(self, objects):
+        """Charge ce que la sérialisation lirait en base (vues asynchrones : aucune requête synchrone)"""
+
+    async def apaginated_response(self, queryset, serializer_class=None):
+        """Version asynchrone de paginated_response"""
+        get_serializer = self._page_serializer(serializer_class)
+
+        page = None
+        if self.paginator is not None:
+            page = await self.paginator.apaginate_queryset(queryset, self.request, view=self)
+        if page is not None:
+            await self.aprepare_objects(page)
+            return self.get_paginated_response(get_serializer(page, many=True).data)
+
+        objects = [obj async for obj in queryset.aiterator()]
+        await self.aprepare_objects(objects)
+        return Response(get_serializer(objects, many=True).data)
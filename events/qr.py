@@ -0,0 +1,122 @@
+"""
+QR codes des billets : jetons signés et rendu des images à la demande.
+
+Le QR d'un billet contient un jeton compact `G1.<code>.<event_id>.<signature>`
+dont la signature HMAC est vérifiée en mémoire avant tout accès à la base.
+
+Les billets ne stockent que ce contenu (qr_payload). L'image est
+générée au premier affichage puis servie depuis un cache LRU en mémoire et,
+si QR_CACHE_DIR est défini, depuis un cache disque partagé entre processus.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import tempfile
+from functools import lru_cache
+from io import BytesIO
+
+import qrcode
+import qrcode.image.svg
+from django.conf import settings
+
+QR_CONTENT_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+TOKEN_VERSION = 'G1'
+TOKEN_SIGNATURE_BYTES = 12
+
+
+@lru_cache(maxsize=1)
+def _signing_key():
+    secret = getattr(settings, 'QR_SIGNING_KEY', None) or settings.SECRET_KEY
+    return hashlib.sha256(f"gevent.ticket-token:{secret}".encode('utf-8')).digest()
+
+
+def _token_signature(body):
+    digest = hmac.new(_signing_key(), body.encode('utf-8'), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:TOKEN_SIGNATURE_BYTES]).decode('ascii')
+
+
+def sign_ticket_token(ticket_code, event_id):
+    """Jeton signé encodé dans le QR code d'un billet"""
+    body = f"{TOKEN_VERSION}.{ticket_code}.{event_id}"
+    return f"{body}.{_token_signature(body)}"
+
+
+def is_ticket_token(qr_data_string):
+    return isinstance(qr_data_string, str) and qr_data_string.startswith(f"{TOKEN_VERSION}.")
+
+
+def parse_ticket_token(token):
+    """
+    Vérifie la signature d'un jeton et retourne (ticket_code, event_id),
+    ou None si le jeton est mal formé ou falsifié
+    """
+    parts = token.split('.')
+    if len(parts) != 4 or parts[0] != TOKEN_VERSION or not parts[2].isdigit():
+        return None
+    body, signature = token.rsplit('.', 1)
+    if not hmac.compare_digest(signature, _token_signature(body)):
+        return None
+    return parts[1], int(parts[2])
+
+
+def qr_etag(payload, fmt):
+    """ETag fort : l'image dépend uniquement du contenu et du format"""
+    digest = hashlib.sha256(f"{fmt}:{payload}".encode('utf-8')).hexdigest()
+    return f'"{digest[:40]}"'
+
+
+def _render(payload, fmt):
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(payload)
+    qr.make(fit=True)
+
+    buffer = BytesIO()
+    if fmt == 'svg':
+        qr.make_image(image_factory=qrcode.image.svg.SvgPathImage).save(buffer)
+    else:
+        qr.make_image(fill_color="black", back_color="white").save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _disk_cache_path(payload, fmt):
+    cache_dir = getattr(settings, 'QR_CACHE_DIR', None)
+    if not cache_dir:
+        return None
+    digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, digest[:2], f"{digest}.{fmt}")
+
+
+@lru_cache(maxsize=getattr(settings, 'QR_MEMORY_CACHE_SIZE', 1024))
+def render_qr(payload, fmt='png'):
+    """Retourne l'image du QR code (bytes) au format png ou svg"""
+    if fmt not in QR_CONTENT_TYPES:
+        raise ValueError(f"Format de QR code non supporté: {fmt}")
+
+    path = _disk_cache_path(payload, fmt)
+    if path:
+        try:
+            with open(path, 'rb') as cached:
+                return cached.read()
+        except FileNotFoundError:
+            pass
+
+    image = _render(payload, fmt)
+
+    if path:
+        # Écriture atomique pour les lecteurs concurrents
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(image)
+        os.replace(tmp_path, path)
+    return image
@@ -0,0 +1,100 @@
+"""
+Plans de requêtes pour la sérialisation des événements.
+
+Chaque liste d'événements est chargée en un nombre constant de requêtes :
+organisateur et catégorie en JOIN, compteur de participants et favori en
+annotations, relations imbriquées en prefetch uniquement si elles sont rendues.
+"""
+from django.db.models import BooleanField, Count, Exists, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Attendee, Event, Favorite
+
+EVENT_RELATIONS = ('ticket_categories', 'images', 'attendees')
+
+
+def expanded_relations(request):
+    """Relations lourdes demandées via `?expand=` sur une représentation compacte"""
+    expand = request.query_params.get('expand', '') if request is not None else ''
+    requested = {name.strip() for name in expand.split(',')}
+    return tuple(name for name in EVENT_RELATIONS if name in requested)
+
+
+def event_prefetches(relations=EVENT_RELATIONS):
+    prefetches = []
+    if 'ticket_categories' in relations:
+        prefetches.append('ticket_categories')
+    if 'images' in relations:
+        prefetches.append('images')
+    if 'attendees' in relations:
+        prefetches.append(Prefetch('attendees', queryset=Attendee.objects.select_related('user')))
+    return prefetches
+
+
+def with_event_plan(queryset, user=None, relations=EVENT_RELATIONS):
+    """
+    Ajoute au queryset d'événements tout ce que lit EventSerializer :
+    `attendee_total` et `favorited` sont consommés par get_attendee_count et
+    get_is_favorited à la place d'une requête par ligne.
+    """
+    attendee_total = (
+        Attendee.objects.filter(event=OuterRef('pk'))
+        .order_by()
+        .values('event')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    queryset = queryset.select_related('organizer', 'category').annotate(
+        attendee_total=Coalesce(Subquery(attendee_total), 0)
+    )
+
+    if user is not None and user.is_authenticated:
+        queryset = queryset.annotate(
+            favorited=Exists(Favorite.objects.filter(event=OuterRef('pk'), user=user))
+        )
+    else:
+        queryset = queryset.annotate(favorited=Value(False, output_field=BooleanField()))
+
+    return queryset.prefetch_related(*event_prefetches(relations))
+
+
+def _pending_attendees(events):
+    """Participants préchargés (relation `attendees`) dont le résumé de billets n'est pas encore calculé"""
+    return [
+        attendee
+        for event in events
+        if 'attendees' in getattr(event, '_prefetched_objects_cache', {})
+        for attendee in event.attendees.all()
+        if not hasattr(attendee, '_tickets_info')
+    ]
+
+
+def attach_attendee_summaries(events):
+    """
+    Résumés de billets des participants de tous les événements en une requête,
+    au lieu d'une par événement dans AttendeeListSerializer
+    """
+    Attendee.attach_ticket_summaries(_pending_attendees(events))
+
+
+async def aattach_attendee_summaries(events):
+    """
+    Résumés de billets des participants préchargés (relation `attendees`),
+    calculés avant la sérialisation par les vues asynchrones
+    """
+    await Attendee.aattach_ticket_summaries(_pending_attendees(events))
+
+
+def nested_event_prefetch(user, lookup='event'):
+    """Prefetch d'un événement imbriqué (billets, commandes, favoris) avec son plan complet"""
+    return Prefetch(lookup, queryset=with_event_plan(Event.objects.all(), user))
+
+
+def with_ticket_plan(queryset, user):
+    """Billets sérialisés par TicketSerializer (événement complet + catégorie)"""
+    return queryset.select_related('ticket_category').prefetch_related(nested_event_prefetch(user))
+
+
+def with_order_plan(queryset, user):
+    """Commandes sérialisées par OrderSerializer (événement complet + catégorie)"""
+    return queryset.select_related('ticket_category').prefetch_related(nested_event_prefetch(user))
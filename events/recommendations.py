@@ -0,0 +1,117 @@
+"""
+Recommandations d'événements par affinité de catégorie.
+
+Chaque interaction d'un utilisateur ajuste son score pour la catégorie de
+l'événement (UserCategoryAffinity) au moment où elle se produit :
+
+- favori ajouté / retiré : +/- FAVORITE_WEIGHT
+- billet acheté : + TICKET_WEIGHT par billet
+- avis : (note - 3) * REVIEW_WEIGHT, négatif pour une mauvaise note
+
+La liste des événements est ensuite classée en base par une seule jointure
+sur cette table, combinée à la nouveauté et à la popularité. Un utilisateur
+sans historique (ou anonyme) obtient le classement nouveauté + popularité.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, FilteredRelation, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Greatest, Ln
+from django.utils import timezone
+
+from .models import Favorite, Review, Ticket, UserCategoryAffinity
+
+FAVORITE_WEIGHT = 3.0
+TICKET_WEIGHT = 2.0
+REVIEW_WEIGHT = 1.5
+
+# Pondération des composantes du classement
+AFFINITY_RANK_WEIGHT = 3.0
+RECENCY_RANK_WEIGHTS = ((7, 2.0), (30, 1.0))  # (âge max en jours, bonus)
+POPULAR_RANK_BONUS = 1.5
+RATING_RANK_WEIGHT = 0.5
+ATTENDEES_RANK_WEIGHT = 1.0
+
+
+def review_weight(rating):
+    return (rating - 3) * REVIEW_WEIGHT
+
+
+def bump_affinity(user_id, category_id, delta):
+    """Ajoute `delta` au score (user, catégorie) par un UPDATE F(), en créant la ligne si besoin"""
+    if not delta or user_id is None or category_id is None:
+        return
+    affinities = UserCategoryAffinity.objects.filter(user_id=user_id, category_id=category_id)
+    if affinities.update(score=F('score') + delta, updated_at=timezone.now()):
+        return
+    try:
+        with transaction.atomic():
+            UserCategoryAffinity.objects.create(user_id=user_id, category_id=category_id, score=delta)
+    except IntegrityError:
+        # Ligne créée entre-temps par une requête concurrente
+        affinities.update(score=F('score') + delta, updated_at=timezone.now())
+
+
+def rank_events(queryset, user):
+    """
+    Annote `recommendation_score` : affinité de l'utilisateur pour la catégorie
+    (jointure LEFT sur UserCategoryAffinity), nouveauté et popularité.
+    Attend l'annotation `attendee_total` posée par with_event_plan.
+    """
+    # Arrondi à l'heure : le classement reste stable d'une page à l'autre
+    now = timezone.now().replace(minute=0, second=0, microsecond=0)
+
+    recency = Case(
+        *[
+            When(created_at__gte=now - timedelta(days=days), then=Value(bonus))
+            for days, bonus in RECENCY_RANK_WEIGHTS
+        ],
+        default=Value(0.0),
+        output_field=FloatField()
+    )
+    popularity = (
+        Case(When(is_popular=True, then=Value(POPULAR_RANK_BONUS)), default=Value(0.0), output_field=FloatField())
+        + Cast('rating', FloatField()) * RATING_RANK_WEIGHT
+        + Ln(Cast('attendee_total', FloatField()) + 1) * ATTENDEES_RANK_WEIGHT
+    )
+
+    if user is None or not user.is_authenticated:
+        return queryset.annotate(recommendation_score=recency + popularity)
+
+    affinity = Ln(Greatest(Coalesce(F('user_affinity__score'), Value(0.0)), Value(0.0)) + 1)
+    return queryset.annotate(
+        user_affinity=FilteredRelation('category__affinities', condition=Q(category__affinities__user=user)),
+    ).annotate(
+        recommendation_score=affinity * AFFINITY_RANK_WEIGHT + recency + popularity
+    )
+
+
+@transaction.atomic
+def rebuild_affinities():
+    """Recalcule toute la table à partir de l'historique (initialisation, correction)"""
+    scores = {}
+
+    def add(rows, weight):
+        for user_id, category_id, value in rows:
+            key = (user_id, category_id)
+            scores[key] = scores.get(key, 0.0) + float(value) * weight
+
+    add(
+        Favorite.objects.values_list('user_id', 'event__category_id').annotate(n=Count('id')),
+        FAVORITE_WEIGHT
+    )
+    add(
+        Ticket.objects.values_list('user_id', 'event__category_id').annotate(n=Count('id')),
+        TICKET_WEIGHT
+    )
+    add(
+        Review.objects.values_list('user_id', 'event__category_id').annotate(n=Sum(F('rating') - 3)),
+        REVIEW_WEIGHT
+    )
+
+    UserCategoryAffinity.objects.all().delete()
+    UserCategoryAffinity.objects.bulk_create([
+        UserCategoryAffinity(user_id=user_id, category_id=category_id, score=score)
+        for (user_id, category_id), score in scores.items()
+    ], batch_size=1000)
+    return len(scores)
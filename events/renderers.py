@@ -0,0 +1,25 @@
+from rest_framework.renderers import BaseRenderer
+
+
+class BinaryRenderer(BaseRenderer):
+    """
+    Laisse passer tel quel un contenu binaire déjà rendu (images).
+    Les réponses d'erreur n'ont pas de corps : seul le code HTTP compte.
+    """
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        return b''
+
+
+class PNGRenderer(BinaryRenderer):
+    media_type = 'image/png'
+    format = 'png'
+
+
+class SVGRenderer(BinaryRenderer):
+    media_type = 'image/svg+xml'
+    format = 'svg'
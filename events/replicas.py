@@ -0,0 +1,146 @@
+"""
+Lectures sur le réplica de base de données (alias `replica`, voir
+DATABASE_REPLICA_URL).
+
+Seules les actions en lecture déclarées par les viewsets (`replica_actions`
+de ReplicaReadMixin) lisent sur le réplica ; tout le reste, et toutes les
+écritures, passent par la base principale.
+
+Lire ses propres écritures : après une requête d'écriture réussie (commande,
+dépôt...), l'utilisateur lit sur la base principale pendant
+REPLICA_STICKY_SECONDS, le temps que le réplica rattrape son retard
+(PrimaryAfterWriteMiddleware). Le marqueur est conservé dans le cache,
+partagé entre workers.
+"""
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+_use_replica = ContextVar('gevent_use_replica', default=False)
+
+
+def replica_alias():
+    """Alias du réplica, None s'il n'est pas configuré"""
+    alias = getattr(settings, 'REPLICA_DATABASE_ALIAS', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+def _pin_key(user_id):
+    return f'gevent:replica:primary-pin:{user_id}'
+
+
+def pin_to_primary(user):
+    cache.set(_pin_key(user.pk), True, getattr(settings, 'REPLICA_STICKY_SECONDS', 10))
+
+
+async def apin_to_primary(user):
+    await cache.aset(_pin_key(user.pk), True, getattr(settings, 'REPLICA_STICKY_SECONDS', 10))
+
+
+def is_pinned(user):
+    return user.is_authenticated and cache.get(_pin_key(user.pk)) is not None
+
+
+async def ais_pinned(user):
+    return user.is_authenticated and await cache.aget(_pin_key(user.pk)) is not None
+
+
+def _replica_candidate(view, request):
+    return (
+        view.action in getattr(view, 'replica_actions', ())
+        and request.method in SAFE_METHODS
+        and replica_alias() is not None
+    )
+
+
+@asynccontextmanager
+async def replica_reads(view, request):
+    """Routage de ReplicaReadMixin pour une vue asynchrone (events.async_views)"""
+    token = None
+    if _replica_candidate(view, request) and not await ais_pinned(request.user):
+        token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        if token is not None:
+            _use_replica.reset(token)
+
+
+class ReplicaRouter:
+    """Routeur de bases (DATABASE_ROUTERS)"""
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get():
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Le réplica contient les mêmes données que la base principale
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != replica_alias()
+
+
+class ReplicaReadMixin:
+    """
+    Lit sur le réplica pendant les actions `replica_actions` (GET/HEAD), sauf
+    pour un utilisateur qui vient d'écrire. L'authentification (jeton) est
+    toujours vérifiée sur la base principale.
+    """
+    replica_actions = ()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if _replica_candidate(self, request) and not is_pinned(request.user):
+            self._replica_token = _use_replica.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _use_replica.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class PrimaryAfterWriteMiddleware:
+    """Après une écriture réussie, l'utilisateur relit sur la base principale (MIDDLEWARE)"""
+    # Sous ASGI, un middleware uniquement synchrone ferait exécuter les vues asynchrones dans un thread
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if self._should_pin(request, response):
+            pin_to_primary(request.user)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self._should_pin(request, response):
+            await apin_to_primary(request.user)
+        return response
+
+    def _should_pin(self, request, response):
+        # request.user est renseigné par l'authentification DRF de la vue
+        user = getattr(request, 'user', None)
+        return (
+            request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and user is not None and user.is_authenticated
+            and replica_alias() is not None
+        )
@@ -0,0 +1,241 @@
+"""
+Cache partagé des réponses en lecture (catégories, événements à venir,
+populaires, détail d'un événement).
+
+- Clés : espace de noms, génération, action et variante de la requête
+  (chemin et paramètres : catégorie, recherche, curseur, champs...,
+  hôte, staff ou non). Le favori de l'utilisateur n'est pas mis en cache :
+  `is_favorited` est recalculé pour la page servie, en une requête.
+- Invalidation : chaque espace de noms a un numéro de génération,
+  incrémenté par les signaux (events.signals). Les anciennes entrées ne sont
+  plus jamais lues et expirent d'elles-mêmes. Pour les vues à ETag
+  (ConditionalGetMixin), l'état validé fait aussi partie de la clé : les
+  écritures qui contournent les signaux (UPDATE des places, validations de
+  billets) changent l'entrée lue en même temps que l'ETag.
+- Anti-emballement : une entrée est rafraîchie avant son expiration par une
+  seule requête (verrou `cache.add`), les autres servent l'ancienne valeur.
+  Sans valeur, les autres attendent brièvement celle du premier.
+
+Fonctionne avec LocMemCache (un processus) comme avec un cache partagé entre
+workers (Redis, Memcached), voir CACHES dans les settings.
+"""
+import asyncio
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+from .models import Favorite
+
+KEY_PREFIX = 'gevent:response'
+POLL_INTERVAL = 0.05
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _cache():
+    return caches[_setting('RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def _generation_key(namespace):
+    return f'{KEY_PREFIX}:generation:{namespace}'
+
+
+def generation(namespace):
+    cache = _cache()
+    value = cache.get(_generation_key(namespace))
+    if value is None:
+        # Origine horodatée : si la clé est évincée, la génération ne revient
+        # jamais à une valeur déjà utilisée
+        cache.add(_generation_key(namespace), time.time_ns() // 1000, timeout=None)
+        value = cache.get(_generation_key(namespace))
+    return value
+
+
+async def ageneration(namespace):
+    cache = _cache()
+    value = await cache.aget(_generation_key(namespace))
+    if value is None:
+        await cache.aadd(_generation_key(namespace), time.time_ns() // 1000, timeout=None)
+        value = await cache.aget(_generation_key(namespace))
+    return value
+
+
+def invalidate(*namespaces):
+    cache = _cache()
+    for namespace in namespaces:
+        try:
+            cache.incr(_generation_key(namespace))
+        except ValueError:
+            generation(namespace)
+            cache.incr(_generation_key(namespace))
+
+
+def invalidate_on_commit(*namespaces):
+    """
+    Invalide tout de suite, puis de nouveau à la validation de la transaction :
+    une réponse recalculée entre-temps sur les anciennes données serait sinon
+    mise en cache sous la nouvelle génération.
+    """
+    invalidate(*namespaces)
+    transaction.on_commit(lambda: invalidate(*namespaces))
+
+
+def _favorite_rows(data):
+    rows = data.get('results', data) if isinstance(data, dict) else data
+    if isinstance(rows, dict):
+        rows = [rows]
+    return [row for row in rows if isinstance(row, dict) and 'is_favorited' in row]
+
+
+def _favorites_query(user, rows):
+    return Favorite.objects.filter(user=user, event_id__in=[row['id'] for row in rows]).values_list('event_id', flat=True)
+
+
+def apply_favorites(data, user):
+    """Renseigne `is_favorited` pour l'utilisateur courant sur une réponse issue du cache"""
+    rows = _favorite_rows(data)
+    if not rows:
+        return data
+
+    favorites = set(_favorites_query(user, rows)) if user.is_authenticated else set()
+    for row in rows:
+        row['is_favorited'] = row['id'] in favorites
+    return data
+
+
+async def aapply_favorites(data, user):
+    rows = _favorite_rows(data)
+    if not rows:
+        return data
+
+    favorites = {event_id async for event_id in _favorites_query(user, rows)} if user.is_authenticated else set()
+    for row in rows:
+        row['is_favorited'] = row['id'] in favorites
+    return data
+
+
+class ResponseCacheMixin:
+    """
+    Met en cache les réponses 200 des actions listées dans `cached_actions`
+    (`list` et `retrieve` directement, les actions personnalisées via
+    `cached_response`). À placer après ConditionalGetMixin dans les bases :
+    les 304 sont décidés avant toute lecture du cache.
+    """
+    cache_namespace = None
+    cached_actions = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        return await self.acached_response(super().alist, request, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self.acached_response(super().aretrieve, request, *args, **kwargs)
+
+    def _variant_digest(self, request):
+        variant = '|'.join([
+            self.action,
+            request.get_host(),
+            request.get_full_path(),
+            'staff' if request.user.is_staff else 'public',
+            # État de ConditionalGetMixin : l'ETag renvoyé décrit toujours le corps servi
+            str(getattr(self, 'validator_state', None)),
+        ])
+        return hashlib.sha1(variant.encode()).hexdigest()
+
+    def response_cache_key(self, request):
+        return f'{KEY_PREFIX}:{self.cache_namespace}:{generation(self.cache_namespace)}:{self._variant_digest(request)}'
+
+    async def aresponse_cache_key(self, request):
+        return (
+            f'{KEY_PREFIX}:{self.cache_namespace}:{await ageneration(self.cache_namespace)}:'
+            f'{self._variant_digest(request)}'
+        )
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if self.action not in self.cached_actions or request.method != 'GET':
+            return handler(request, *args, **kwargs)
+
+        cache = _cache()
+        timeout = _setting('RESPONSE_CACHE_TIMEOUT', 30)
+        lock_timeout = _setting('RESPONSE_CACHE_LOCK_TIMEOUT', 5)
+        key = self.response_cache_key(request)
+        lock_key = f'{key}:lock'
+
+        entry = cache.get(key)
+        if entry is not None:
+            data, refresh_at = entry
+            if time.time() < refresh_at:
+                return Response(apply_favorites(data, request.user))
+            # Rafraîchissement anticipé : une seule requête recalcule, les autres servent l'entrée
+            locked = cache.add(lock_key, 1, lock_timeout)
+            if not locked:
+                return Response(apply_favorites(data, request.user))
+        else:
+            locked = cache.add(lock_key, 1, lock_timeout)
+            if not locked:
+                # Un autre worker calcule déjà cette réponse : l'attendre, puis la calculer soi-même
+                deadline = time.monotonic() + lock_timeout
+                while time.monotonic() < deadline:
+                    time.sleep(POLL_INTERVAL)
+                    entry = cache.get(key)
+                    if entry is not None:
+                        return Response(apply_favorites(entry[0], request.user))
+
+        try:
+            response = handler(request, *args, **kwargs)
+            if response.status_code == 200:
+                # Conservée deux fois la durée de fraîcheur pour servir pendant le recalcul
+                cache.set(key, (response.data, time.time() + timeout), timeout * 2)
+        finally:
+            if locked:
+                cache.delete(lock_key)
+        return response
+
+    async def acached_response(self, handler, request, *args, **kwargs):
+        """cached_response pour les vues asynchrones : cache lu et écrit avec son API asynchrone"""
+        if self.action not in self.cached_actions or request.method != 'GET':
+            return await handler(request, *args, **kwargs)
+
+        cache = _cache()
+        timeout = _setting('RESPONSE_CACHE_TIMEOUT', 30)
+        lock_timeout = _setting('RESPONSE_CACHE_LOCK_TIMEOUT', 5)
+        key = await self.aresponse_cache_key(request)
+        lock_key = f'{key}:lock'
+
+        entry = await cache.aget(key)
+        if entry is not None:
+            data, refresh_at = entry
+            if time.time() < refresh_at:
+                return Response(await aapply_favorites(data, request.user))
+            locked = await cache.aadd(lock_key, 1, lock_timeout)
+            if not locked:
+                return Response(await aapply_favorites(data, request.user))
+        else:
+            locked = await cache.aadd(lock_key, 1, lock_timeout)
+            if not locked:
+                deadline = time.monotonic() + lock_timeout
+                while time.monotonic() < deadline:
+                    await asyncio.sleep(POLL_INTERVAL)
+                    entry = await cache.aget(key)
+                    if entry is not None:
+                        return Response(await aapply_favorites(entry[0], request.user))
+
+        try:
+            response = await handler(request, *args, **kwargs)
+            if response.status_code == 200:
+                await cache.aset(key, (response.data, time.time() + timeout), timeout * 2)
+        finally:
+            if locked:
+                await cache.adelete(lock_key)
+        return response
@@ -0,0 +1,205 @@
+"""
+Recherche plein texte des événements (titre, description, lieu).
+
+Une seule API, `search_events(queryset, terms)`, quelle que soit la base :
+
+- SQLite : table virtuelle FTS5 `events_fts`, tokenizer unicode61 avec
+  suppression des accents, pertinence bm25 ;
+- PostgreSQL : table `events_fts` avec une colonne tsvector indexée en GIN,
+  configuration `gevent_fr` (français + unaccent), pertinence ts_rank_cd ;
+- autres bases : repli sur des `icontains`.
+
+Dans les deux cas, la recherche est une jointure sur l'index et la pertinence
+une annotation `search_rank` (plus grande = plus pertinent), utilisable pour
+trier et paginer. L'index est mis à jour à l'enregistrement d'un événement
+(voir events.signals) et reconstruit par la commande rebuild_search_index.
+Chaque mot recherché doit apparaître, le dernier peut être un préfixe.
+"""
+import re
+
+from django.db import connection
+from django.db.models import F, FloatField, Func, Lookup, Q, Value
+from rest_framework import filters
+
+from .models import EventSearchIndex
+
+TABLE = 'events_fts'
+PG_CONFIG = 'gevent_fr'
+
+# Poids des colonnes : titre > lieu > description
+SQLITE_WEIGHTS = (10.0, 1.0, 3.0)  # ordre des colonnes : title, description, location
+PG_VECTOR = (
+    f"setweight(to_tsvector('{PG_CONFIG}', coalesce(%s, '')), 'A') || "
+    f"setweight(to_tsvector('{PG_CONFIG}', coalesce(%s, '')), 'B') || "
+    f"setweight(to_tsvector('{PG_CONFIG}', coalesce(%s, '')), 'C')"
+)  # title, location, description
+
+MAX_TERMS = 10
+
+
+def search_terms(terms):
+    return re.findall(r'[^\W_]+', terms or '')[:MAX_TERMS]
+
+
+def fts5_query(terms):
+    words = search_terms(terms)
+    return ' '.join(f'"{word}"' for word in words[:-1]) + (f' "{words[-1]}"*' if words else '')
+
+
+def tsquery(terms):
+    words = search_terms(terms)
+    return ' & '.join(words[:-1] + [f'{words[-1]}:*'] if words else [])
+
+
+def is_supported(using=connection):
+    return using.vendor in ('sqlite', 'postgresql')
+
+
+class Match(Lookup):
+    """`search_index__document__match=terms` : mots recherchés présents dans l'index"""
+    lookup_name = 'match'
+
+    def as_sqlite(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        return f'{lhs} MATCH %s', [*lhs_params, fts5_query(self.rhs)]
+
+    def as_postgresql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        return f"{lhs} @@ to_tsquery('{PG_CONFIG}', %s)", [*lhs_params, tsquery(self.rhs)]
+
+
+EventSearchIndex._meta.get_field('document').register_lookup(Match)
+
+
+class SearchRank(Func):
+    """Pertinence d'un événement pour la recherche (plus grande = plus pertinente)"""
+    output_field = FloatField()
+
+    def __init__(self, document, terms):
+        self.terms = terms
+        super().__init__(document)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        document, params = compiler.compile(self.source_expressions[0])
+        weights = ', '.join(str(weight) for weight in SQLITE_WEIGHTS)
+        return f'-bm25({document}, {weights})', params
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        document, params = compiler.compile(self.source_expressions[0])
+        return f"ts_rank_cd({document}, to_tsquery('{PG_CONFIG}', %s))", [*params, tsquery(self.terms)]
+
+
+def search_events(queryset, terms):
+    """Événements correspondant à `terms`, annotés de `search_rank`"""
+    if not search_terms(terms):
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField())).none()
+
+    if not is_supported():
+        condition = Q()
+        for word in search_terms(terms):
+            condition &= Q(title__icontains=word) | Q(description__icontains=word) | Q(location__icontains=word)
+        return queryset.filter(condition).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    return queryset.filter(search_index__document__match=terms).annotate(
+        search_rank=SearchRank(F('search_index__document'), terms)
+    )
+
+
+class EventSearchFilter(filters.SearchFilter):
+    """SearchFilter de DRF adossé à l'index plein texte (paramètre ?search=)"""
+
+    def filter_queryset(self, request, queryset, view):
+        terms = request.query_params.get(self.search_param, '').strip()
+        if not terms:
+            return queryset
+        return search_events(queryset, terms)
+
+
+# Maintenance de l'index
+
+def index_events(events, using=connection):
+    """Ajoute ou remplace les événements dans l'index"""
+    if not is_supported(using):
+        return
+    rows = [(event.pk, event.title or '', event.description or '', event.location or '') for event in events]
+    if not rows:
+        return
+    with using.cursor() as cursor:
+        if using.vendor == 'sqlite':
+            cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {TABLE} (rowid, title, description, location) VALUES (%s, %s, %s, %s)', rows
+            )
+        else:
+            cursor.executemany(
+                f'INSERT INTO {TABLE} (rowid, title, description, location, {TABLE}) '
+                f'VALUES (%s, %s, %s, %s, {PG_VECTOR}) '
+                f'ON CONFLICT (rowid) DO UPDATE SET title = EXCLUDED.title, description = EXCLUDED.description, '
+                f'location = EXCLUDED.location, {TABLE} = EXCLUDED.{TABLE}',
+                [(pk, title, description, location, title, location, description)
+                 for pk, title, description, location in rows]
+            )
+
+
+def unindex_events(event_ids, using=connection):
+    if not is_supported(using) or not event_ids:
+        return
+    with using.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s', [(pk,) for pk in event_ids])
+
+
+def rebuild_index(using=connection):
+    """Reconstruit l'index depuis la table des événements, en une requête"""
+    if not is_supported(using):
+        return
+    with using.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        if using.vendor == 'sqlite':
+            cursor.execute(
+                f'INSERT INTO {TABLE} (rowid, title, description, location) '
+                f'SELECT id, title, description, location FROM events'
+            )
+            cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+            # Sans statistiques, SQLite préfère un index de `events` (catégorie, date,
+            # tendance) et réévalue le MATCH pour chaque ligne au lieu de partir de l'index
+            cursor.execute('ANALYZE events')
+        else:
+            cursor.execute(
+                f'INSERT INTO {TABLE} (rowid, title, description, location, {TABLE}) '
+                f'SELECT id, title, description, location, '
+                + PG_VECTOR % ('title', 'location', 'description') + ' FROM events'
+            )
+
+
+# Création de la table (migration 0011)
+
+def install(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5('
+            f'title, description, location, tokenize="unicode61 remove_diacritics 2")'
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS unaccent')
+        schema_editor.execute(
+            f"DO $$ BEGIN "
+            f"CREATE TEXT SEARCH CONFIGURATION {PG_CONFIG} (COPY = french); "
+            f"ALTER TEXT SEARCH CONFIGURATION {PG_CONFIG} "
+            f"ALTER MAPPING FOR hword, hword_part, word WITH unaccent, french_stem; "
+            f"EXCEPTION WHEN duplicate_object THEN NULL; END $$"
+        )
+        schema_editor.execute(
+            f'CREATE TABLE IF NOT EXISTS {TABLE} ('
+            f'rowid integer PRIMARY KEY REFERENCES events (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+            f'title text NOT NULL, description text NOT NULL, location text NOT NULL, {TABLE} tsvector NOT NULL)'
+        )
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {TABLE}_gin ON {TABLE} USING GIN ({TABLE})')
+    else:
+        return
+    rebuild_index(schema_editor.connection)
+
+
+def uninstall(schema_editor):
+    if is_supported(schema_editor.connection):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {TABLE}')
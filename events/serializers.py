@@ -1,25 +1,77 @@
-from rest_framework import serializers
+from rest_framework import permissions, serializers
 from django.contrib.auth import get_user_model
-from .models import Event, Category, Attendee, Ticket, Order, Review, Favorite, EventImage, WalletTransaction, TicketCategory
+from .avatars import default_avatar_url
+from .images import srcset
+from .query_plans import attach_attendee_summaries
+from .models import Event, Category, Attendee, Ticket, Order, Review, Favorite, EventImage, WalletTransaction, TicketCategory, EventCancellationJob
 
 User = get_user_model()
 
+
+def profile_image_url(image, user, request):
+    """URL de la photo de profil, ou de l'avatar par défaut partagé de l'utilisateur"""
+    if image:
+        return request.build_absolute_uri(image.url) if request else image.url
+    return default_avatar_url(user, request)
+
+
+class SparseFieldsetMixin:
+    """
+    Permet au client de choisir les champs renvoyés :
+    - `?fields=id,title,date` ne garde que les champs listés
+    - `?expand=description,images` ajoute des champs lourds parmi `expandable_fields`
+
+    Seul le serializer racine de la réponse lit ces paramètres, les
+    serializers imbriqués gardent leur représentation complète. Ils ne
+    s'appliquent qu'aux lectures : une écriture est toujours validée avec
+    tous les champs déclarés.
+    """
+    expandable_fields = ()
+
+    def _requested_names(self, param):
+        request = self.context.get('request')
+        if request is None or request.method not in permissions.SAFE_METHODS or not self._is_response_root():
+            return set()
+        value = request.query_params.get(param, '')
+        return {name.strip() for name in value.split(',') if name.strip()}
+
+    def _is_response_root(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def get_field_names(self, declared_fields, info):
+        field_names = list(super().get_field_names(declared_fields, info))
+
+        expand = self._requested_names('expand')
+        field_names += [
+            name for name in self.expandable_fields
+            if name in expand and name not in field_names
+        ]
+
+        only = self._requested_names('fields')
+        if only:
+            field_names = [name for name in field_names if name in only]
+        return field_names
+
+
 class UserSerializer(serializers.ModelSerializer):
     profile_image = serializers.SerializerMethodField()
+    profile_image_srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 
-                 'phone_number', 'profile_image', 'bio', 'date_of_birth', 'wallet_balance', 'created_at']
+                 'phone_number', 'profile_image', 'profile_image_srcset', 'bio', 'date_of_birth',
+                 'wallet_balance', 'created_at']
         extra_kwargs = {'password': {'write_only': True}}
     
     def get_profile_image(self, obj):
-        if obj.profile_image:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.profile_image.url)
-            return obj.profile_image.url
-        return None
+        return profile_image_url(obj.profile_image, obj, self.context.get('request'))
+
+    def get_profile_image_srcset(self, obj):
+        return srcset(obj.profile_image_variants, obj.profile_image, self.context.get('request'))
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -27,9 +79,14 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'icon', 'created_at']
 
 class EventImageSerializer(serializers.ModelSerializer):
+    srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = EventImage
-        fields = ['id', 'image', 'caption', 'order']
+        fields = ['id', 'image', 'srcset', 'caption', 'order']
+
+    def get_srcset(self, obj):
+        return srcset(obj.image_variants, obj.image, self.context.get('request'))
 
 class TicketCategorySerializer(serializers.ModelSerializer):
     tva_amount = serializers.ReadOnlyField()
@@ -41,20 +98,53 @@ class TicketCategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'price', 'tva_amount', 'price_with_tva', 
                  'capacity', 'available_seats', 'color', 'benefits', 'order', 'is_sold_out']
 
+class AttendeeListSerializer(serializers.ListSerializer):
+    """Calcule les résumés de paiement de toute la liste en une requête"""
+
+    def to_representation(self, data):
+        attendees = list(data.all() if hasattr(data, 'all') else data)
+        # Résumés déjà chargés par les vues asynchrones (aattach_ticket_summaries)
+        if not all(hasattr(attendee, '_tickets_info') for attendee in attendees):
+            attendees = Attendee.attach_ticket_summaries(attendees)
+        return super().to_representation(attendees)
+
+class EventListSerializer(serializers.ListSerializer):
+    """Résumés de paiement des participants de toute la page en une requête"""
+
+    def to_representation(self, data):
+        events = list(data.all() if hasattr(data, 'all') else data)
+        if 'attendees' in self.child.fields:
+            attach_attendee_summaries(events)
+        return super().to_representation(events)
+
+class NestedEventListSerializer(serializers.ListSerializer):
+    """Idem pour les listes de billets, commandes et favoris (événement imbriqué dans `event`)"""
+
+    def to_representation(self, data):
+        items = list(data.all() if hasattr(data, 'all') else data)
+        if 'attendees' in self.child.fields['event'].fields:
+            attach_attendee_summaries([item.event for item in items])
+        return super().to_representation(items)
+
 class AttendeeSerializer(serializers.ModelSerializer):
     username = serializers.CharField(source='user.username', read_only=True)
     user_name = serializers.SerializerMethodField()
+    profile_image = serializers.SerializerMethodField()
     tickets_info = serializers.ReadOnlyField()
     total_paid = serializers.ReadOnlyField()
     
     class Meta:
         model = Attendee
         fields = ['id', 'username', 'user_name', 'profile_image', 'joined_at', 'tickets_info', 'total_paid']
+        list_serializer_class = AttendeeListSerializer
     
     def get_user_name(self, obj):
         return f"{obj.user.first_name} {obj.user.last_name}" if obj.user.first_name else obj.user.username
 
-class EventSerializer(serializers.ModelSerializer):
+    def get_profile_image(self, obj):
+        return profile_image_url(obj.profile_image, obj.user, self.context.get('request'))
+
+class EventSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     category_id = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(),
@@ -71,27 +161,35 @@ class EventSerializer(serializers.ModelSerializer):
     price_with_tva = serializers.ReadOnlyField()
     organizer_name = serializers.SerializerMethodField()
     organizer_image = serializers.SerializerMethodField()
+    organizer_image_srcset = serializers.SerializerMethodField()
     organizer_phone = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = Event
         fields = [
             'id', 'title', 'description', 'category', 'category_id',
-            'image_url', 'location', 'latitude', 'longitude',
+            'image_url', 'image_srcset', 'location', 'latitude', 'longitude',
             'date', 'end_date', 'duration',
             'is_free', 'price', 'tva_rate', 'tva_amount', 'price_with_tva', 'currency',
             'total_capacity', 'available_seats', 'ticket_categories',
-            'organizer_name', 'organizer_image', 'organizer_phone',
+            'organizer_name', 'organizer_image', 'organizer_image_srcset', 'organizer_phone',
             'status', 'is_approved', 'is_popular', 'rating', 'total_reviews',
             'attendees', 'attendee_count', 'images', 'is_favorited',
             'created_at', 'updated_at'
         ]
         read_only_fields = ['rating', 'total_reviews', 'tva_amount', 'price_with_tva', 'created_at', 'updated_at']
+        list_serializer_class = EventListSerializer
 
     def get_attendee_count(self, obj):
+        # Annoté par query_plans.with_event_plan
+        if hasattr(obj, 'attendee_total'):
+            return obj.attendee_total
         return obj.attendees.count()
     
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'favorited'):
+            return obj.favorited
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return obj.favorited_by.filter(user=request.user).exists()
@@ -101,12 +199,14 @@ class EventSerializer(serializers.ModelSerializer):
         return f"{obj.organizer.first_name} {obj.organizer.last_name}" if obj.organizer.first_name else obj.organizer.username
     
     def get_organizer_image(self, obj):
-        if obj.organizer.profile_image:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.organizer.profile_image.url)
-            return obj.organizer.profile_image.url
-        return None
+        return profile_image_url(obj.organizer.profile_image, obj.organizer, self.context.get('request'))
+
+    def get_organizer_image_srcset(self, obj):
+        organizer = obj.organizer
+        return srcset(organizer.profile_image_variants, organizer.profile_image, self.context.get('request'))
+
+    def get_image_srcset(self, obj):
+        return srcset(obj.image_variants, obj.image_url, self.context.get('request'))
     
     def get_organizer_phone(self, obj):
         phone = obj.organizer.phone_number
@@ -140,6 +240,34 @@ class EventSerializer(serializers.ModelSerializer):
         
         return event
 
+class EventSummarySerializer(EventSerializer):
+    """
+    Représentation compacte d'un événement pour les listes (accueil, à venir,
+    populaires...). Les champs lourds restent disponibles via `?expand=`.
+    """
+    expandable_fields = (
+        'description', 'ticket_categories', 'attendees', 'images',
+        'organizer_phone', 'tva_rate', 'tva_amount', 'duration',
+        'created_at', 'updated_at',
+    )
+
+    class Meta(EventSerializer.Meta):
+        fields = [
+            'id', 'title', 'category', 'image_url', 'image_srcset', 'location', 'latitude', 'longitude',
+            'date', 'end_date', 'is_free', 'price', 'price_with_tva', 'currency',
+            'total_capacity', 'available_seats', 'organizer_name', 'organizer_image', 'organizer_image_srcset',
+            'status', 'is_approved', 'is_popular', 'rating', 'total_reviews',
+            'attendee_count', 'is_favorited',
+        ]
+
+
+class NearbyEventSerializer(EventSummarySerializer):
+    """Représentation compacte avec la distance au point recherché (annotée par events.geo)"""
+    distance = serializers.FloatField(read_only=True)
+
+    class Meta(EventSummarySerializer.Meta):
+        fields = EventSummarySerializer.Meta.fields + ['distance']
+
 class TicketSerializer(serializers.ModelSerializer):
     event = EventSerializer(read_only=True)
     ticket_category = TicketCategorySerializer(read_only=True)
@@ -153,6 +281,7 @@ class TicketSerializer(serializers.ModelSerializer):
         source='ticket_category',
         write_only=True
     )
+    qr_code_url = serializers.SerializerMethodField()
     
     class Meta:
         model = Ticket
@@ -160,11 +289,20 @@ class TicketSerializer(serializers.ModelSerializer):
             'id', 'code', 'event', 'event_id', 'ticket_category', 'ticket_category_id',
             'holder_name', 'holder_email', 'holder_phone',
             'seat', 'price', 'tva_rate', 'tva_amount', 'price_ttc', 'currency', 
-            'qr_code', 'status',
+            'qr_payload', 'qr_code_url', 'status',
             'purchase_date', 'used_at', 'cancelled_at'
         ]
-        read_only_fields = ['code', 'qr_code', 'tva_amount', 'price_ttc', 'purchase_date']
+        read_only_fields = ['code', 'qr_payload', 'tva_amount', 'price_ttc', 'purchase_date']
+        list_serializer_class = NestedEventListSerializer
     
+    def get_qr_code_url(self, obj):
+        from django.urls import reverse
+        url = reverse('ticket-qr-png', kwargs={'pk': obj.pk})
+        request = self.context.get('request')
+        if request:
+            return request.build_absolute_uri(url)
+        return url
+
  
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -190,6 +328,7 @@ class OrderSerializer(serializers.ModelSerializer):
             'payment_date', 'transaction_id', 'tickets', 'created_at'
         ]
         read_only_fields = ['order_number', 'created_at']
+        list_serializer_class = NestedEventListSerializer
 
 class ReviewSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
@@ -206,9 +345,20 @@ class FavoriteSerializer(serializers.ModelSerializer):
         model = Favorite
         fields = ['id', 'event', 'created_at']
         read_only_fields = ['created_at']
+        list_serializer_class = NestedEventListSerializer
 
 class WalletTransactionSerializer(serializers.ModelSerializer):
     class Meta:
         model = WalletTransaction
         fields = ['id', 'transaction_type', 'amount', 'balance_before', 'balance_after', 'description', 'created_at']
-        read_only_fields = ['balance_before', 'balance_after', 'created_at']
\ No newline at end of file
+        read_only_fields = ['balance_before', 'balance_after', 'created_at']
+
+class EventCancellationJobSerializer(serializers.ModelSerializer):
+    progress = serializers.ReadOnlyField()
+    
+    class Meta:
+        model = EventCancellationJob
+        fields = [
+            'id', 'event', 'status', 'total_tickets', 'processed_tickets', 'progress',
+            'refunded_amount', 'error', 'created_at', 'updated_at', 'finished_at'
+        ]
@@ -0,0 +1,127 @@
+"""
+Signaux de l'application :
+
+- mise à jour incrémentale des affinités de catégorie utilisées par les
+  recommandations (events.recommendations) ;
+- synchronisation de l'index plein texte des événements (events.search) ;
+- invalidation du cache des réponses (events.response_cache) ;
+- variantes responsives des images téléversées (events.images).
+"""
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import Signal, receiver
+
+from .images import delete_variants, image_fields, schedule_variants
+from .models import Category, Event, EventImage, Favorite, Review, Ticket, TicketCategory, User
+from .recommendations import FAVORITE_WEIGHT, TICKET_WEIGHT, bump_affinity, review_weight
+from .response_cache import invalidate_on_commit
+from .search import index_events, unindex_events
+from .tasks import run_in_background
+
+SEARCH_FIELDS = {'title', 'description', 'location'}
+
+# Envoyé par Order.create_tickets : les billets sont insérés par bulk_create,
+# qui ne déclenche pas post_save
+tickets_issued = Signal()
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_added(sender, instance, created, **kwargs):
+    if created:
+        bump_affinity(instance.user_id, instance.event.category_id, FAVORITE_WEIGHT)
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_removed(sender, instance, **kwargs):
+    bump_affinity(instance.user_id, instance.event.category_id, -FAVORITE_WEIGHT)
+
+
+@receiver(tickets_issued, sender=Ticket)
+def tickets_purchased(sender, order, tickets, **kwargs):
+    bump_affinity(order.user_id, order.event.category_id, TICKET_WEIGHT * len(tickets))
+
+
+@receiver(post_save, sender=Ticket)
+def ticket_created(sender, instance, created, **kwargs):
+    # Billets créés un par un (admin, scripts) ; l'achat passe par tickets_issued
+    if created:
+        bump_affinity(instance.user_id, instance.event.category_id, TICKET_WEIGHT)
+
+
+@receiver(post_init, sender=Review)
+def review_loaded(sender, instance, **kwargs):
+    # Note enregistrée, pour n'appliquer que l'écart si l'avis est modifié
+    instance._affinity_rating = instance.rating if instance.pk else None
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, **kwargs):
+    previous = None if created else instance._affinity_rating
+    delta = review_weight(instance.rating) - (review_weight(previous) if previous is not None else 0)
+    bump_affinity(instance.user_id, instance.event.category_id, delta)
+    instance._affinity_rating = instance.rating
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    bump_affinity(instance.user_id, instance.event.category_id, -review_weight(instance.rating))
+
+
+@receiver(post_save, sender=Event)
+def event_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or SEARCH_FIELDS & set(update_fields):
+        index_events([instance])
+
+
+@receiver(post_delete, sender=Event)
+def event_deleted(sender, instance, **kwargs):
+    unindex_events([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Event)
+@receiver([post_save, post_delete], sender=TicketCategory)
+@receiver([post_save, post_delete], sender=EventImage)
+@receiver([post_save, post_delete], sender=Review)
+def event_content_changed(sender, **kwargs):
+    invalidate_on_commit('events')
+
+
+@receiver([post_save, post_delete], sender=Category)
+def category_changed(sender, **kwargs):
+    # Les événements embarquent leur catégorie
+    invalidate_on_commit('categories', 'events')
+
+
+@receiver(post_init, sender=Event)
+@receiver(post_init, sender=EventImage)
+@receiver(post_init, sender=User)
+def image_loaded(sender, instance, **kwargs):
+    # Image enregistrée, pour ne générer les variantes que si elle change ;
+    # lue dans __dict__ pour ne pas charger un champ différé
+    instance._image_names = {}
+    for field_name, _ in image_fields(sender):
+        if field_name in instance.__dict__:
+            value = instance.__dict__[field_name]
+            instance._image_names[field_name] = getattr(value, 'name', value) or ''
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=EventImage)
+@receiver(post_save, sender=User)
+def image_saved(sender, instance, update_fields=None, **kwargs):
+    for field_name, _ in image_fields(sender):
+        if update_fields is not None and field_name not in update_fields:
+            continue
+        name = getattr(instance, field_name).name or ''
+        if name and name != instance._image_names.get(field_name):
+            schedule_variants(instance, field_name)
+        instance._image_names[field_name] = name
+
+
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=EventImage)
+@receiver(post_delete, sender=User)
+def image_owner_deleted(sender, instance, **kwargs):
+    for field_name, variants_field in image_fields(sender):
+        variants = instance.__dict__.get(variants_field)
+        if variants:
+            run_in_background(delete_variants, variants, getattr(instance, field_name).storage)
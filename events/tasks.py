@@ -0,0 +1,45 @@
+"""
+Exécution de tâches en arrière-plan, hors du cycle requête/réponse.
+
+Les tâches sont lancées dans un pool de threads du processus, après le commit
+de la transaction courante (elles voient donc les données écrites par la
+requête). Avec BACKGROUND_TASKS_EAGER = True elles s'exécutent immédiatement,
+ce qui est pratique pour les tests et les commandes de gestion.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'BACKGROUND_TASK_WORKERS', 2),
+            thread_name_prefix='gevent-task',
+        )
+    return _executor
+
+
+def _run(func, args, kwargs):
+    close_old_connections()
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception("Échec de la tâche d'arrière-plan %s", func.__name__)
+    finally:
+        close_old_connections()
+
+
+def run_in_background(func, *args, **kwargs):
+    """Planifie func(*args, **kwargs) après le commit de la transaction courante"""
+    if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+        func(*args, **kwargs)
+        return
+    transaction.on_commit(lambda: _get_executor().submit(_run, func, args, kwargs))
@@ -1,3 +1,1459 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models import QuerySet
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.throttling import UserRateThrottle
+
+from Gevent.sqlite.base import DatabaseWrapper as HardenedSQLiteWrapper
+
+from .async_views import async_read_urls
+from .cancellation import run_cancellation, start_cancellation
+from .checkin import build_scanner_manifest, check_in, gate_throughput
+from .geo import nearby_events
+from .ledger import EXTERNAL, InsufficientFunds, Leg, post_entry
+from .models import (
+    Attendee, Category, Event, EventCancellationJob, Favorite, Order, PlatformLedgerEntry, Review, Ticket,
+    TicketCategory, TicketScan, User, UserCategoryAffinity, WalletTransaction, _system_account_cache,
+)
+from .replicas import ReplicaRouter, _use_replica, is_pinned
+from .response_cache import ResponseCacheMixin
+from .search import search_events
+from .serializers import UserSerializer
+from .trending import rollup
+from .urls import router
+from .views import EventViewSet
+
+
+class KeysetPaginationTest(TestCase):
+    """Pages par curseur : ordre stable, sans doublon ni trou, taille bornée"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='buyer', password='password123')
+        category = Category.objects.create(name='Musique')
+        # Plusieurs événements à la même date : `id` départage
+        self.events = [
+            Event.objects.create(
+                title=f'Concert {i}', description='', category=category, location='Bujumbura',
+                date=timezone.now() + timedelta(days=i % 3 + 1), organizer=self.user, is_approved=True,
+            )
+            for i in range(11)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url):
+        rows = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            rows += response.data['results']
+            url = response.data['next']
+        return rows
+
+    def test_pages_follow_queryset_order(self):
+        rows = self.walk('/api/events/upcoming/?page_size=4')
+        expected = sorted(self.events, key=lambda event: (event.date, event.pk))
+        self.assertEqual([row['id'] for row in rows], [event.pk for event in expected])
+
+        response = self.client.get('/api/events/upcoming/?page_size=4')
+        previous = self.client.get(self.client.get(response.data['next']).data['previous'])
+        self.assertEqual(previous.data['results'], response.data['results'])
+
+    def test_deep_page_costs_the_same_queries(self):
+        url = '/api/events/upcoming/?page_size=2'
+        with CaptureQueriesContext(connection) as first_page:
+            url = self.client.get(url).data['next']
+        # Compté tout de suite : chaque requête du client vide connection.queries
+        first_page_queries = len(first_page)
+        for _ in range(3):
+            url = self.client.get(url).data['next']
+        with self.assertNumQueries(first_page_queries):
+            self.assertEqual(len(self.client.get(url).data['results']), 2)
+
+    def test_page_size_is_capped(self):
+        WalletTransaction.objects.bulk_create([
+            WalletTransaction(
+                user=self.user, transaction_type='deposit', amount=1, balance_before=0, balance_after=1,
+                description='Dépôt',
+            )
+            for _ in range(105)
+        ])
+        self.assertEqual(len(self.client.get('/api/wallet/').data['results']), 20)
+        self.assertEqual(len(self.client.get('/api/wallet/?page_size=500').data['results']), 100)
+
+
+class SparseFieldsetTest(TestCase):
+    """Listes compactes, `?expand=` et `?fields=`"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='buyer', password='password123')
+        self.category = Category.objects.create(name='Musique')
+        self.event = self.add_event()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_event(self):
+        event = Event.objects.create(
+            title='Concert', description='Grand concert', category=self.category, location='Bujumbura',
+            date=timezone.now() + timedelta(days=7), organizer=self.user, is_approved=True,
+        )
+        TicketCategory.objects.create(event=event, name='VIP', price=Decimal('1000'))
+        return event
+
+    def test_list_is_compact_and_detail_complete(self):
+        row = self.client.get('/api/events/').data['results'][0]
+        self.assertIn('attendee_count', row)
+        self.assertNotIn('description', row)
+        self.assertNotIn('attendees', row)
+
+        response = self.client.get('/api/events/?expand=description,attendees&fields=id,description,attendees')
+        self.assertEqual(
+            response.data['results'][0],
+            {'id': self.event.pk, 'description': 'Grand concert', 'attendees': []},
+        )
+
+        url = f'/api/events/{self.event.pk}/'
+        self.assertEqual(set(self.client.get(url + '?fields=id,title').data), {'id', 'title'})
+        self.assertIn('ticket_categories', self.client.get(url).data)
+
+    def test_fields_do_not_restrict_writes(self):
+        url = f'/api/events/{self.event.pk}/?fields=id'
+        response = self.client.patch(url, {'title': 'Nouveau titre'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Event.objects.get(pk=self.event.pk).title, 'Nouveau titre')
+        self.assertIn('title', response.data)
+        self.assertEqual(self.client.post('/api/events/?fields=id', {}, format='json').status_code, 400)
+
+    def test_list_query_count_does_not_grow_with_rows(self):
+        url = '/api/events/?expand=ticket_categories,images'
+        with CaptureQueriesContext(connection) as single:
+            self.client.get(url)
+        single_queries = len(single)
+        for _ in range(4):
+            self.add_event()
+        cache.clear()
+        with self.assertNumQueries(single_queries):
+            self.assertEqual(len(self.client.get(url).data['results']), 5)
+
+
+class AttendeeSummaryTest(TestCase):
+    """Résumés de paiement des participants : une requête groupée pour toute la page"""
+
+    def setUp(self):
+        cache.clear()
+        self.organizer = User.objects.create_user(username='organizer', password='password123')
+        self.event = Event.objects.create(
+            title='Concert', description='', category=Category.objects.create(name='Musique'),
+            location='Bujumbura', date=timezone.now() + timedelta(days=7), organizer=self.organizer,
+            is_approved=True,
+        )
+        self.vip = TicketCategory.objects.create(event=self.event, name='VIP', price=Decimal('1000'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.organizer)
+        self.url = f'/api/events/{self.event.pk}/attendees/?page_size=100'
+
+    def add_attendee(self, index):
+        user = User.objects.create_user(
+            username=f'buyer{index}', password='password123', wallet_balance=Decimal('100000')
+        )
+        Order.objects.create(
+            user=user, event=self.event, ticket_category=self.vip, quantity=2, payment_method='wallet',
+        ).create_tickets()
+        Attendee.objects.get_or_create(event=self.event, user=user)
+        return user
+
+    def test_summaries_and_constant_query_count(self):
+        self.add_attendee(0)
+        with CaptureQueriesContext(connection) as single:
+            self.client.get(self.url)
+        single_queries = len(single)
+        users = [self.add_attendee(index) for index in range(1, 6)]
+        # Un billet annulé ne compte pas
+        Ticket.objects.filter(pk=Ticket.objects.filter(user=users[0]).order_by('pk')[0].pk).update(status='cancelled')
+
+        with self.assertNumQueries(single_queries):
+            rows = self.client.get(self.url).data['results']
+        self.assertEqual(len(rows), 6)
+        summaries = {row['username']: (row['tickets_info'], row['total_paid']) for row in rows}
+        self.assertEqual(
+            summaries['buyer2'],
+            ([{'category': 'VIP', 'price_paid': '1100.00', 'quantity': 2}], 2200),
+        )
+        self.assertEqual(summaries['buyer1'][1], 1100)
+        self.assertEqual(Attendee.objects.get(user=users[1]).total_paid, 2200)
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class BulkTicketIssueTest(TestCase):
+    """Les billets d'une commande sont insérés ensemble : coût indépendant de la quantité"""
+
+    def setUp(self):
+        organizer = User.objects.create_user(username='organizer', password='password123')
+        self.buyer = User.objects.create_user(
+            username='buyer', password='password123', wallet_balance=Decimal('1000000')
+        )
+        self.event = Event.objects.create(
+            title='Concert', description='', category=Category.objects.create(name='Musique'),
+            location='Bujumbura', date=timezone.now() + timedelta(days=7), organizer=organizer,
+            total_capacity=100,
+        )
+        self.ticket_category = TicketCategory.objects.create(
+            event=self.event, name='VIP', price=Decimal('1000'), capacity=100
+        )
+
+    def order(self, quantity):
+        return Order.objects.create(
+            user=self.buyer, event=self.event, ticket_category=self.ticket_category,
+            quantity=quantity, payment_method='wallet',
+        )
+
+    def test_query_count_does_not_depend_on_quantity(self):
+        # Première commande : participant créé en plus
+        self.order(1).create_tickets()
+        order = self.order(1)
+        with CaptureQueriesContext(connection) as single:
+            order.create_tickets()
+        single_queries = len(single)
+
+        order = self.order(40)
+        with self.assertNumQueries(single_queries):
+            tickets = order.create_tickets()
+        self.assertEqual(len(tickets), 40)
+        self.assertTrue(all(ticket.pk for ticket in tickets))
+        self.assertEqual(len({ticket.code for ticket in tickets}), 40)
+        self.assertEqual([ticket.seat for ticket in tickets], [f'V{seat}' for seat in range(3, 43)])
+        self.assertFalse(Ticket.objects.filter(qr_payload__isnull=True).exists())
+        self.assertEqual({ticket.price_ttc for ticket in tickets}, {Decimal('1100')})
+
+
+class TicketQrImageTest(TestCase):
+    """QR codes rendus à la demande depuis qr_payload, plus stockés en base64"""
+
+    def setUp(self):
+        organizer = User.objects.create_user(username='organizer', password='password123')
+        self.buyer = User.objects.create_user(
+            username='buyer', password='password123', wallet_balance=Decimal('100000')
+        )
+        event = Event.objects.create(
+            title='Concert', description='', category=Category.objects.create(name='Musique'),
+            location='Bujumbura', date=timezone.now() + timedelta(days=7), organizer=organizer,
+        )
+        ticket_category = TicketCategory.objects.create(event=event, name='VIP', price=Decimal('1000'))
+        self.tickets = Order.objects.create(
+            user=self.buyer, event=event, ticket_category=ticket_category, quantity=3, payment_method='wallet',
+        ).create_tickets()
+        self.client = APIClient()
+        self.client.force_authenticate(self.buyer)
+
+    def test_png_and_svg_with_etag(self):
+        ticket = self.tickets[0]
+        url = f'/api/tickets/{ticket.pk}/qr.png/'
+        response = self.client.get(url, HTTP_ACCEPT='image/png')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertTrue(response.content.startswith(b'\x89PNG'))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        response = self.client.get(f'/api/tickets/{ticket.pk}/qr.svg/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'<svg', response.content)
+
+        row = self.client.get('/api/tickets/').data['results'][0]
+        self.assertTrue(row['qr_code_url'].endswith('/qr.png/'))
+        self.assertEqual(self.client.get('/api/tickets/0/qr.png/', HTTP_ACCEPT='image/png').status_code, 404)
+
+    def test_strip_ticket_qr_blobs(self):
+        kept = self.tickets[0]
+        Ticket.objects.update(qr_code='data:image/png;base64,AAAA')
+        Ticket.objects.exclude(pk=kept.pk).update(qr_payload=None)
+        with CaptureQueriesContext(connection) as queries:
+            call_command('strip_ticket_qr_blobs', chunk_size=1, stdout=StringIO())
+        self.assertFalse(Ticket.objects.filter(qr_code__isnull=False).exists())
+        self.assertEqual(Ticket.objects.get(pk=kept.pk).qr_payload, kept.qr_payload)
+        # Le blob n'est jamais relu
+        selects = [query['sql'] for query in queries if query['sql'].startswith('SELECT')]
+        self.assertTrue(selects)
+        self.assertFalse([sql for sql in selects if '"tickets"."qr_code",' in sql or 'JOIN' in sql])
+        self.assertEqual(
+            set(Ticket.objects.values_list('qr_payload', flat=True)),
+            {ticket.build_qr_payload() for ticket in Ticket.objects.all()},
+        )
+
+
+class TicketQrTokenTest(TestCase):
+    """Jetons QR signés : vérifiés en mémoire, l'ancien JSON reste accepté"""
+
+    def setUp(self):
+        organizer = User.objects.create_user(username='organizer', password='password123')
+        buyer = User.objects.create_user(username='buyer', password='password123', wallet_balance=Decimal('100000'))
+        event = Event.objects.create(
+            title='Concert', description='', category=Category.objects.create(name='Musique'),
+            location='Bujumbura', date=timezone.now() + timedelta(days=7), organizer=organizer,
+        )
+        ticket_category = TicketCategory.objects.create(event=event, name='VIP', price=Decimal('1000'))
+        self.ticket, = Order.objects.create(
+            user=buyer, event=event, ticket_category=ticket_category, quantity=1, payment_method='wallet',
+        ).create_tickets()
+
+    def test_signed_and_legacy_payloads(self):
+        payload = self.ticket.qr_payload
+        self.assertTrue(payload.startswith('G1.'))
+        self.assertLess(len(payload), 80)
+        self.assertEqual(Ticket.validate_qr_code(payload), (self.ticket, 'Billet valide'))
+        self.assertEqual(Ticket.validate_qr_code(self.ticket.build_legacy_qr_payload())[0], self.ticket)
+
+    def test_forged_tokens_are_rejected_without_query(self):
+        body, signature = self.ticket.qr_payload.rsplit('.', 1)
+        forged_signature = f"{body}.{'A' if signature[0] != 'A' else 'B'}{signature[1:]}"
+        forged_event = f"G1.{self.ticket.code}.{self.ticket.event_id + 1}.{signature}"
+        for payload in (forged_signature, forged_event, '[1]', 'n importe quoi'):
+            with self.subTest(payload=payload), self.assertNumQueries(0):
+                self.assertEqual(Ticket.validate_qr_code(payload), (None, 'QR code invalide'))
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class SeatInventoryStressTest(TransactionTestCase):
+    """
+    Plusieurs acheteurs commandent en parallèle plus de places qu'il n'en
+    reste : aucune survente ne doit être possible.
+    """
+    buyers_count = 12
+    quantity = 2
+    capacity = 9
+
+    def setUp(self):
+        organizer = User.objects.create_user(
+            username='organizer', password='password123', wallet_balance=Decimal('0')
+        )
+        category = Category.objects.create(name='Musique')
+        self.event = Event.objects.create(
+            title='Concert flash',
+            description='Vente flash',
+            category=category,
+            location='Bujumbura',
+            date=timezone.now() + timedelta(days=7),
+            organizer=organizer,
+            price=Decimal('1000'),
+            total_capacity=self.capacity,
+        )
+        self.ticket_category = TicketCategory.objects.create(
+            event=self.event, name='Basique', price=Decimal('1000'), capacity=self.capacity
+        )
+        self.buyers = [
+            User.objects.create_user(
+                username=f'buyer{i}', password='password123', wallet_balance=Decimal('100000')
+            )
+            for i in range(self.buyers_count)
+        ]
+
+    def _buy(self, order, results):
+        try:
+            # SQLite verrouille toute la base : on réessaie les conflits de verrou
+            for attempt in range(50):
+                try:
+                    order.create_tickets()
+                    results.append('ok')
+                    return
+                except OperationalError:
+                    time.sleep(0.01 * (attempt + 1))
+                except ValueError:
+                    results.append('sold_out')
+                    return
+            results.append('locked')
+        except Exception as e:
+            results.append(repr(e))
+        finally:
+            connection.close()
+
+    def test_concurrent_orders_never_oversell(self):
+        results = []
+        start = threading.Barrier(self.buyers_count)
+
+        orders = [
+            Order.objects.create(
+                user=buyer,
+                event=self.event,
+                ticket_category=self.ticket_category,
+                quantity=self.quantity,
+                payment_method='wallet',
+            )
+            for buyer in self.buyers
+        ]
+
+        def worker(order):
+            start.wait()
+            self._buy(order, results)
+
+        threads = [threading.Thread(target=worker, args=(order,)) for order in orders]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.ticket_category.refresh_from_db()
+        self.event.refresh_from_db()
+        sold = Ticket.objects.filter(event=self.event, status='confirmed').count()
+
+        self.assertEqual(
+            [r for r in results if r not in ('ok', 'sold_out', 'locked')], []
+        )
+        self.assertEqual(sold, results.count('ok') * self.quantity)
+        self.assertLessEqual(sold, self.capacity)
+        self.assertGreater(sold, 0)
+        self.assertEqual(self.ticket_category.available_seats, self.capacity - sold)
+        self.assertEqual(self.event.available_seats, self.capacity - sold)
+
+        # Seuls les acheteurs servis ont été débités
+        debited = User.objects.filter(
+            username__startswith='buyer', wallet_balance__lt=Decimal('100000')
+        ).count()
+        self.assertEqual(debited, results.count('ok'))
+
+    def test_insufficient_stock_reserves_nothing(self):
+        order = Order.objects.create(
+            user=self.buyers[0],
+            event=self.event,
+            ticket_category=self.ticket_category,
+            quantity=self.capacity + 1,
+            payment_method='wallet',
+        )
+        with self.assertRaises(ValueError):
+            order.create_tickets()
+
+        self.ticket_category.refresh_from_db()
+        self.buyers[0].refresh_from_db()
+        self.assertEqual(self.ticket_category.available_seats, self.capacity)
+        self.assertEqual(self.buyers[0].wallet_balance, Decimal('100000'))
+        self.assertFalse(Ticket.objects.exists())
+
+
+    def test_cancelled_seat_is_not_reissued(self):
+        first, second = Order.objects.create(
+            user=self.buyers[0], event=self.event, ticket_category=self.ticket_category,
+            quantity=2, payment_method='wallet',
+        ).create_tickets()
+        client = APIClient()
+        client.force_authenticate(self.buyers[0])
+        self.assertEqual(client.post(f'/api/tickets/{first.pk}/cancel/').status_code, 200)
+
+        third, = Order.objects.create(
+            user=self.buyers[1], event=self.event, ticket_category=self.ticket_category,
+            quantity=1, payment_method='wallet',
+        ).create_tickets()
+        self.assertEqual([first.seat, second.seat, third.seat], ['B1', 'B2', 'B3'])
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class ConcurrentCheckInTest(TransactionTestCase):
+    """Le même billet présenté à plusieurs portes en même temps n'est admis qu'une fois"""
+    gates = 8
+
+    def test_single_winner(self):
+        organizer = User.objects.create_user(
+            username='organizer', password='password123', wallet_balance=Decimal('0')
+        )
+        buyer = User.objects.create_user(
+            username='buyer', password='password123', wallet_balance=Decimal('100000')
+        )
+        event = Event.objects.create(
+            title='Concert', description='Entrée', category=Category.objects.create(name='Musique'),
+            location='Bujumbura', date=timezone.now(), organizer=organizer,
+            price=Decimal('1000'), total_capacity=10, status='ongoing',
+        )
+        ticket_category = TicketCategory.objects.create(
+            event=event, name='Basique', price=Decimal('1000'), capacity=10
+        )
+        Order.objects.create(
+            user=buyer, event=event, ticket_category=ticket_category,
+            quantity=1, payment_method='wallet',
+        ).create_tickets()
+        ticket = Ticket.objects.get(event=event)
+
+        results = []
+        start = threading.Barrier(self.gates)
+
+        def gate():
+            try:
+                start.wait()
+                for attempt in range(50):
+                    try:
+                        results.append(check_in(Ticket.objects.get(pk=ticket.pk)))
+                        return
+                    except OperationalError:
+                        time.sleep(0.01 * (attempt + 1))
+                results.append('locked')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=gate) for _ in range(self.gates)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(results.count(False), self.gates - 1)
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.status, 'used')
+
+
+class ValidateQrTest(TestCase):
+    """Validation unitaire d'un QR code à une porte"""
+
+    def test_admit_then_rescan(self):
+        organizer = User.objects.create_user(username='organizer', password='password123')
+        buyer = User.objects.create_user(username='buyer', password='password123', wallet_balance=Decimal('100000'))
+        event = Event.objects.create(
+            title='Concert', description='', category=Category.objects.create(name='Musique'),
+            location='Bujumbura', date=timezone.now(), organizer=organizer, status='ongoing',
+        )
+        ticket_category = TicketCategory.objects.create(event=event, name='Basique', price=Decimal('1000'), capacity=10)
+        ticket, = Order.objects.create(
+            user=buyer, event=event, ticket_category=ticket_category, quantity=1, payment_method='wallet',
+        ).create_tickets()
+        client = APIClient()
+        client.force_authenticate(organizer)
+
+        payload = {'qr_data': ticket.qr_payload, 'gate': 'A'}
+        response = client.post('/api/tickets/validate_qr/', payload, format='json')
+        self.assertTrue(response.data['valid'])
+        self.assertEqual(response.data['ticket']['status'], 'used')
+
+        response = client.post('/api/tickets/validate_qr/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['message'], 'Ce billet a déjà été utilisé')
+        self.assertEqual(
+            list(TicketScan.objects.order_by('id').values_list('ticket_id', 'event_id', 'result')),
+            [(ticket.pk, event.pk, 'admitted'), (ticket.pk, event.pk, 'already_used')],
+        )
+        self.assertEqual(gate_throughput(event)['gates'][0]['scans'], 2)
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class ValidateQrBatchTest(TestCase):
+    """Validation groupée des QR codes d'un tourniquet"""
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='organizer', password='password123')
+        self.buyer = User.objects.create_user(
+            username='buyer', password='password123', wallet_balance=Decimal('1000000')
+        )
+        self.event = Event.objects.create(
+            title='Concert', description='', category=Category.objects.create(name='Musique'),
+            location='Bujumbura', date=timezone.now(), organizer=self.organizer, status='ongoing',
+        )
+        self.ticket_category = TicketCategory.objects.create(
+            event=self.event, name='Basique', price=Decimal('1000'), capacity=100
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.organizer)
+
+    def payloads(self, quantity):
+        return [ticket.qr_payload for ticket in Order.objects.create(
+            user=self.buyer, event=self.event, ticket_category=self.ticket_category,
+            quantity=quantity, payment_method='wallet',
+        ).create_tickets()]
+
+    def validate(self, payloads):
+        return self.client.post('/api/tickets/validate_qr_batch/', {'qr_data': payloads, 'gate': 'T1'}, format='json')
+
+    def test_results_per_code(self):
+        payloads = self.payloads(5)
+        response = self.validate(payloads + [payloads[0], 'illisible', payloads[1][:-1] + '#'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['admitted'], 5)
+        self.assertEqual(
+            [result['result'] for result in response.data['results'][5:]],
+            ['duplicate', 'rejected', 'rejected'],
+        )
+        response = self.validate(payloads[:2])
+        self.assertEqual([result['result'] for result in response.data['results']], ['already_used'] * 2)
+
+        self.client.force_authenticate(self.buyer)
+        self.assertEqual(self.validate(payloads[:1]).data['results'][0]['result'], 'forbidden')
+        self.assertEqual(TicketScan.objects.count(), 11)
+
+    def test_lost_race_is_not_reported_as_admitted(self):
+        first, second = self.payloads(2)
+        winner = Ticket.objects.get(qr_payload=first)
+        update = QuerySet.update
+
+        def racing_update(queryset, **kwargs):
+            # Une autre porte valide le billet entre la lecture et l'UPDATE
+            if kwargs.get('status') == 'used' and winner.status == 'confirmed':
+                winner.status = 'used'
+                update(Ticket.objects.filter(pk=winner.pk), status='used', used_at=timezone.now() - timedelta(seconds=1))
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', racing_update):
+            response = self.validate([first, second])
+        self.assertEqual([item['result'] for item in response.data['results']], ['already_used', 'admitted'])
+        self.assertEqual(response.data['admitted'], 1)
+        self.assertEqual(
+            list(TicketScan.objects.order_by('pk').values_list('result', flat=True)), ['already_used', 'admitted']
+        )
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        self.validate(self.payloads(1))
+        payloads = self.payloads(2)
+        with CaptureQueriesContext(connection) as small:
+            self.validate(payloads)
+        small_queries = len(small)
+        payloads = self.payloads(30)
+        with self.assertNumQueries(small_queries):
+            self.assertEqual(self.validate(payloads).data['admitted'], 30)
+
+
+class OfflineScannerTest(TestCase):
+    """Manifeste des scanners hors ligne et envoi groupé de leurs scans"""
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='organizer', password='password123')
+        buyer = User.objects.create_user(username='buyer', password='password123', wallet_balance=Decimal('100000'))
+        self.event = Event.objects.create(
+            title='Concert', description='', category=Category.objects.create(name='Musique'),
+            location='Bujumbura', date=timezone.now(), organizer=self.organizer, status='ongoing',
+        )
+        ticket_category = TicketCategory.objects.create(event=self.event, name='Basique', price=Decimal('1000'))
+        self.tickets = Order.objects.create(
+            user=buyer, event=self.event, ticket_category=ticket_category, quantity=3, payment_method='wallet',
+        ).create_tickets()
+        self.client = APIClient()
+        self.client.force_authenticate(buyer)
+
+    def test_manifest_and_offline_scans(self):
+        url = f'/api/events/{self.event.pk}/'
+        self.assertEqual(self.client.get(url + 'scanner_manifest/').status_code, 403)
+        self.client.force_authenticate(self.organizer)
+        manifest = self.client.get(url + 'scanner_manifest/').data
+        self.assertEqual(sorted(code for code, _ in manifest['tickets']), sorted(t.code for t in self.tickets))
+
+        first, second, third = self.tickets
+        scans = [
+            {'code': first.code, 'gate': 'A', 'scanned_at': '2020-01-01T10:00:00'},
+            {'code': first.code},
+            {'code': 'inconnu'},
+            {'code': second.code},
+        ]
+        response = self.client.post(url + 'offline_scans/', {'scans': scans}, format='json')
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            ['admitted', 'duplicate', 'not_found', 'admitted'],
+        )
+        response = self.client.post(url + 'offline_scans/', {'scans': [{'code': first.code}]}, format='json')
+        self.assertEqual(response.data['results'][0]['status'], 'already_used')
+
+        delta = self.client.get(url + f"scanner_manifest/?since={manifest['version']}").data
+        self.assertEqual(sorted(delta['revoked']), sorted([first.code, second.code]))
+        # `since` est inclusif : un billet à la date exacte de la version peut être renvoyé
+        self.assertLessEqual({code for code, _ in delta['tickets']}, {third.code})
+        self.assertGreater(delta['version'], manifest['version'])
+
+    def test_version_is_read_before_rows(self):
+        with CaptureQueriesContext(connection) as queries:
+            build_scanner_manifest(self.event)
+        self.assertIn('MAX(', queries[0]['sql'])
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, EVENT_CANCELLATION_CHUNK_SIZE=2)
+class EventCancellationJobTest(TestCase):
+    """Une annulation interrompue reprend sans rembourser deux fois"""
+
+    def test_resume_after_insufficient_balance(self):
+        organizer = User.objects.create_user(
+            username='organizer', password='password123', wallet_balance=Decimal('0')
+        )
+        buyer = User.objects.create_user(
+            username='buyer', password='password123', wallet_balance=Decimal('100000')
+        )
+        event = Event.objects.create(
+            title='Concert', description='Annulé', category=Category.objects.create(name='Musique'),
+            location='Bujumbura', date=timezone.now() + timedelta(days=7), organizer=organizer,
+            price=Decimal('1000'), total_capacity=10,
+        )
+        ticket_category = TicketCategory.objects.create(
+            event=event, name='Basique', price=Decimal('1000'), capacity=10
+        )
+        Order.objects.create(
+            user=buyer, event=event, ticket_category=ticket_category,
+            quantity=5, payment_method='wallet',
+        ).create_tickets()
+        buyer.refresh_from_db()
+        balance_after_purchase = buyer.wallet_balance
+
+        # L'organisateur ne peut couvrir que deux lots sur trois
+        User.objects.filter(pk=organizer.pk).update(wallet_balance=Decimal('4000'))
+        job = start_cancellation(event, organizer)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.processed_tickets, 4)
+        self.assertEqual(Ticket.objects.filter(event=event, status='confirmed').count(), 1)
+
+        User.objects.filter(pk=organizer.pk).update(wallet_balance=Decimal('1000'))
+        job = run_cancellation(job.pk)
+
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.processed_tickets, 5)
+        self.assertEqual(job.refunded_amount, Decimal('5500'))
+        buyer.refresh_from_db()
+        organizer.refresh_from_db()
+        event.refresh_from_db()
+        self.assertEqual(buyer.wallet_balance - balance_after_purchase, Decimal('5500'))
+        self.assertEqual(organizer.wallet_balance, Decimal('0'))
+        self.assertEqual(event.status, 'cancelled')
+        self.assertEqual(event.available_seats, event.total_capacity)
+        self.assertEqual(EventCancellationJob.objects.count(), 1)
+        self.assertEqual(
+            WalletTransaction.objects.filter(user=buyer, transaction_type='refund').count(), 3
+        )
+
+
+class WalletLedgerTest(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(
+            username='alice', password='password123', wallet_balance=Decimal('100')
+        )
+        self.bob = User.objects.create_user(
+            username='bob', password='password123', wallet_balance=Decimal('0')
+        )
+
+    def test_balanced_entry_updates_balances_and_history(self):
+        post_entry([
+            Leg(self.alice, Decimal('-60'), 'purchase', 'Achat'),
+            Leg(self.bob, Decimal('60'), 'deposit', 'Vente'),
+        ])
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual(self.alice.wallet_balance, Decimal('40'))
+        self.assertEqual(self.bob.wallet_balance, Decimal('60'))
+        debit = WalletTransaction.objects.get(user=self.alice)
+        self.assertEqual((debit.balance_before, debit.balance_after), (Decimal('100'), Decimal('40')))
+
+    def test_accounts_are_locked_in_pk_order_before_updates(self):
+        post_entry([Leg(self.bob, Decimal('10'), 'deposit', 'Dépôt'), Leg(EXTERNAL, Decimal('-10'), 'deposit', 'Dépôt')])
+        # Jambes dans l'ordre inverse des pk : le verrouillage ne doit pas en dépendre
+        with CaptureQueriesContext(connection) as queries:
+            post_entry([
+                Leg(self.bob, Decimal('-5'), 'purchase', 'Achat'),
+                Leg(self.alice, Decimal('-5'), 'purchase', 'Achat'),
+                Leg(EXTERNAL, Decimal('10'), 'withdrawal', 'Retrait'),
+            ])
+        statements = [query['sql'] for query in queries if not query['sql'].startswith(('SAVEPOINT', 'RELEASE'))]
+        self.assertTrue(statements[0].startswith('SELECT "users"."id" FROM "users"'), statements[0])
+        self.assertIn('ORDER BY "users"."id" ASC', statements[0])
+        self.assertTrue(statements[1].startswith('UPDATE "users"'))
+
+    def test_rejected_entries_write_nothing(self):
+        with self.assertRaises(ValueError):
+            post_entry([Leg(self.bob, Decimal('10'), 'deposit', 'Dépôt')])
+        with self.assertRaises(InsufficientFunds):
+            post_entry([
+                Leg(self.alice, Decimal('-150'), 'withdrawal', 'Retrait'),
+                Leg(EXTERNAL, Decimal('150'), 'withdrawal', 'Retrait'),
+            ])
+        self.alice.refresh_from_db()
+        self.assertEqual(self.alice.wallet_balance, Decimal('100'))
+        self.assertFalse(WalletTransaction.objects.exists())
+
+
+    def test_order_posts_vat_to_platform_journal(self):
+        gcash = User.objects.create_user(username='gcash', password='password123')
+        event = Event.objects.create(
+            title='Concert', description='', category=Category.objects.create(name='Musique'),
+            location='Bujumbura', date=timezone.now() + timedelta(days=7), organizer=self.bob,
+        )
+        ticket_category = TicketCategory.objects.create(event=event, name='VIP', price=Decimal('30'))
+        self.alice.wallet_balance = Decimal('100')
+        self.alice.save()
+        Order.objects.create(
+            user=self.alice, event=event, ticket_category=ticket_category, quantity=2, payment_method='wallet',
+        ).create_tickets()
+
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        gcash.refresh_from_db()
+        self.assertEqual(self.alice.wallet_balance, Decimal('34'))
+        self.assertEqual(self.bob.wallet_balance, Decimal('60'))
+        # La TVA attend le rapprochement : la ligne gcash n'est pas verrouillée à chaque vente
+        self.assertEqual(gcash.wallet_balance, Decimal('0'))
+        self.assertEqual(
+            list(PlatformLedgerEntry.objects.values_list('entry_type', 'amount')), [('vat', Decimal('6'))]
+        )
+
+    def test_reconcile_credits_system_account_resolved_once(self):
+        gcash = User.objects.create_user(username='gcash', password='password123')
+        _system_account_cache.clear()
+        PlatformLedgerEntry.objects.create(entry_type='vat', amount=Decimal('300'), description='TVA')
+        PlatformLedgerEntry.objects.create(entry_type='vat_refund', amount=Decimal('-100'), description='TVA remboursée')
+        self.assertEqual(PlatformLedgerEntry.reconcile(), (2, Decimal('200')))
+        gcash.refresh_from_db()
+        self.assertEqual(gcash.wallet_balance, Decimal('200'))
+        self.assertEqual(
+            WalletTransaction.objects.filter(user=gcash).values_list('balance_before', 'balance_after').get(),
+            (Decimal('0'), Decimal('200')),
+        )
+        self.assertFalse(PlatformLedgerEntry.objects.filter(reconciled_at__isnull=True).exists())
+        # pk en cache : plus de recherche par nom d'utilisateur
+        with self.assertNumQueries(0):
+            User.system_account_filter()
+
+        # Compte recréé : le pk en cache ne désigne plus le compte système
+        gcash.delete()
+        gcash = User.objects.create_user(username='gcash', password='password123')
+        self.assertEqual(User.get_system_account(), gcash)
+
+
+class EventSearchTest(TestCase):
+    """L'index plein texte suit les enregistrements et ignore accents et casse"""
+
+    def setUp(self):
+        organizer = User.objects.create_user(username='organizer', password='password123')
+        category = Category.objects.create(name='Musique')
+        self.concert, self.theatre = [
+            Event.objects.create(
+                title=title, description=description, category=category, location='Bujumbura',
+                date=timezone.now() + timedelta(days=7), organizer=organizer,
+            )
+            for title, description in [
+                ('Fête de la Musique', 'Grand concert au stade'),
+                ('Soirée théâtre', 'Après la fête, une pièce'),
+            ]
+        ]
+
+    def search(self, terms):
+        return list(search_events(Event.objects.all(), terms).order_by('-search_rank').values_list('pk', flat=True))
+
+    def test_accents_prefix_and_ranking(self):
+        self.assertEqual(self.search('fete'), [self.concert.pk, self.theatre.pk])
+        self.assertEqual(self.search('FÊTE musi'), [self.concert.pk])
+        self.assertEqual(self.search('theat'), [self.theatre.pk])
+        self.assertEqual(self.search('!!!'), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.theatre.description = 'Une pièce classique'
+        self.theatre.save()
+        self.assertEqual(self.search('fete'), [self.concert.pk])
+        self.concert.delete()
+        self.assertEqual(self.search('musique'), [])
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class RecommendationTest(TestCase):
+    """Affinité par catégorie tenue à jour par les signaux et classement de la liste"""
+
+    def setUp(self):
+        cache.clear()
+        organizer = User.objects.create_user(username='organizer', password='password123')
+        self.buyer = User.objects.create_user(
+            username='buyer', password='password123', wallet_balance=Decimal('100000')
+        )
+        self.sport = Category.objects.create(name='Sport')
+        self.events = {
+            category.name: [
+                Event.objects.create(
+                    title=f'{category.name} {i}', description='', category=category, location='Bujumbura',
+                    date=timezone.now() + timedelta(days=3), organizer=organizer, is_approved=True,
+                )
+                for i in range(3)
+            ]
+            for category in (Category.objects.create(name='Musique'), self.sport)
+        }
+        self.client = APIClient()
+        self.client.force_authenticate(self.buyer)
+
+    def affinity(self):
+        return UserCategoryAffinity.objects.get(user=self.buyer, category=self.sport).score
+
+    def test_affinity_follows_activity_and_ranks_list(self):
+        match = self.events['Sport'][1]
+        Favorite.objects.create(user=self.buyer, event=self.events['Sport'][2])
+        ticket_category = TicketCategory.objects.create(event=match, name='Tribune', price=Decimal('1000'))
+        Order.objects.create(
+            user=self.buyer, event=match, ticket_category=ticket_category, quantity=2, payment_method='wallet',
+        ).create_tickets()
+        review = Review.objects.create(user=self.buyer, event=match, rating=5)
+        self.assertEqual(self.affinity(), 3 + 4 + 3)
+        review.rating = 4
+        review.save()
+        self.assertEqual(self.affinity(), 3 + 4 + 1.5)
+
+        rows = self.client.get('/api/events/').data['results']
+        self.assertEqual({row['category']['name'] for row in rows[:3]}, {'Sport'})
+
+        # Parcours complet malgré les égalités de score
+        seen, url = [], '/api/events/?page_size=4'
+        while url:
+            response = self.client.get(url)
+            seen += [row['id'] for row in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(sorted(seen), sorted(event.pk for events in self.events.values() for event in events))
+
+        Favorite.objects.filter(user=self.buyer).delete()
+        self.assertEqual(self.affinity(), 4 + 1.5)
+        UserCategoryAffinity.objects.update(score=0)
+        call_command('rebuild_category_affinity', stdout=StringIO())
+        self.assertEqual(self.affinity(), 4 + 1.5)
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, TRENDING_GRACE_SECONDS=0)
+class TrendingTest(TestCase):
+    """Score de tendance incrémental et événements populaires"""
+
+    def setUp(self):
+        cache.clear()
+        self.organizer = User.objects.create_user(username='organizer', password='password123')
+        self.buyer = User.objects.create_user(username='buyer', password='password123', wallet_balance=Decimal('100000'))
+        category = Category.objects.create(name='Musique')
+        self.events = [
+            Event.objects.create(
+                title=f'Concert {i}', description='', category=category, location='Bujumbura',
+                date=timezone.now() + timedelta(days=7), organizer=self.organizer, is_approved=True,
+            )
+            for i in range(3)
+        ]
+
+    def test_rollup_counts_activity_once_and_ranks_popular(self):
+        first, second, third = self.events
+        ticket_category = TicketCategory.objects.create(event=first, name='VIP', price=Decimal('1000'))
+        Order.objects.create(
+            user=self.buyer, event=first, ticket_category=ticket_category, quantity=3, payment_method='wallet',
+        ).create_tickets()
+        Favorite.objects.create(user=self.buyer, event=second)
+        self.assertEqual(rollup(), 2)
+        self.assertEqual(rollup(), 0)
+
+        client = APIClient()
+        client.force_authenticate(self.buyer)
+        response = client.get('/api/events/popular/')
+        self.assertEqual([row['id'] for row in response.data['results']], [first.pk, second.pk])
+
+        for i in range(8):
+            fan = User.objects.create_user(username=f'fan{i}', password='password123')
+            Favorite.objects.create(user=fan, event=third)
+        with override_settings(TRENDING_POPULAR_COUNT=1):
+            rollup()
+        self.assertEqual(list(Event.objects.filter(is_popular=True)), [third])
+
+        # Changement d'origine : le classement ne bouge pas
+        ranking = list(Event.objects.order_by('-trending_score').values_list('pk', flat=True))
+        rollup(full=True)
+        self.assertEqual(list(Event.objects.order_by('-trending_score').values_list('pk', flat=True)), ranking)
+
+    def test_past_events_are_not_popular(self):
+        past = self.events[0]
+        Event.objects.filter(pk=past.pk).update(date=timezone.now() - timedelta(days=1))
+        for event in self.events:
+            Favorite.objects.create(user=self.buyer, event=event)
+        rollup()
+        self.assertEqual(set(Event.objects.filter(is_popular=True)), set(self.events[1:]))
+
+        client = APIClient()
+        client.force_authenticate(self.buyer)
+        ids = [row['id'] for row in client.get('/api/events/popular/').data['results']]
+        self.assertEqual(set(ids), {event.pk for event in self.events[1:]})
+
+    def test_activity_windows_use_an_index(self):
+        since = timezone.now()
+        for queryset, field in (
+            (Ticket.objects.filter(status__in=['confirmed', 'used']), 'purchase_date'),
+            (Favorite.objects.all(), 'created_at'),
+            (Review.objects.all(), 'created_at'),
+        ):
+            plan = queryset.filter(**{f'{field}__gt': since, f'{field}__lte': since}).explain()
+            with self.subTest(model=queryset.model.__name__):
+                self.assertIn(f'({field}>? AND {field}<?)', plan)
+
+    @override_settings(TRENDING_GRACE_SECONDS=300)
+    def test_late_commit_is_counted_on_next_pass(self):
+        rollup()
+        # Ligne datée avant le passage mais validée après (transaction longue)
+        Favorite.objects.create(user=self.buyer, event=self.events[0])
+        Favorite.objects.filter(event=self.events[0]).update(created_at=timezone.now() - timedelta(seconds=60))
+        self.assertEqual(rollup(), 0)
+        with mock.patch('events.trending.timezone.now', return_value=timezone.now() + timedelta(minutes=10)):
+            self.assertEqual(rollup(), 1)
+            self.assertEqual(rollup(), 0)
+        self.assertGreater(Event.objects.get(pk=self.events[0].pk).trending_score, 0)
+
+
+class NearbyEventsTest(TestCase):
+    def setUp(self):
+        organizer = User.objects.create_user(username='organizer', password='password123')
+        category = Category.objects.create(name='Musique')
+        self.events = [
+            Event.objects.create(
+                title=f'Concert {index}', description='', category=category, location='',
+                latitude=latitude, longitude=longitude, date=timezone.now() + timedelta(days=7),
+                organizer=organizer,
+            )
+            for index, (latitude, longitude) in enumerate([
+                (Decimal('-3.3822'), Decimal('29.3644')),  # Bujumbura
+                (Decimal('-3.4271'), Decimal('29.9246')),  # Gitega, ~62 km
+                (Decimal('-3.3900'), Decimal('29.3700')),  # ~1 km
+                (None, None),
+            ])
+        ]
+
+    def test_sorted_by_distance_within_radius(self):
+        bujumbura, gitega, close, _ = self.events
+        found = list(nearby_events(Event.objects.all(), -3.3822, 29.3644, 70))
+        self.assertEqual(found, [bujumbura, close, gitega])
+        self.assertAlmostEqual(found[1].distance, 1.067, places=3)
+        self.assertAlmostEqual(found[2].distance, 62.5, places=0)
+        self.assertEqual(list(nearby_events(Event.objects.all(), -3.3822, 29.3644, 10)), [bujumbura, close])
+
+    def test_geo_cell_follows_coordinates(self):
+        event = self.events[3]
+        event.latitude, event.longitude = Decimal('-3.3822'), Decimal('29.3644')
+        event.save(update_fields=['latitude', 'longitude'])
+        self.assertEqual(list(nearby_events(Event.objects.all(), -3.3822, 29.3644, 1)), [self.events[0], event])
+
+
+class NestedEventQueryPlanTest(TestCase):
+    """Billets, commandes et favoris : le nombre de requêtes ne dépend pas du nombre de lignes"""
+
+    def setUp(self):
+        cache.clear()
+        self.organizer = User.objects.create_user(username='organizer', password='password123')
+        self.buyer = User.objects.create_user(username='buyer', password='password123', wallet_balance=Decimal('100000'))
+        self.category = Category.objects.create(name='Musique')
+        self.client = APIClient()
+        self.client.force_authenticate(self.buyer)
+
+    def add_event(self):
+        event = Event.objects.create(
+            title='Concert', description='', category=self.category, location='Bujumbura',
+            date=timezone.now() + timedelta(days=7), organizer=self.organizer, is_approved=True,
+        )
+        ticket_category = TicketCategory.objects.create(event=event, name='VIP', price=Decimal('1000'), capacity=10)
+        Order.objects.create(
+            user=self.buyer, event=event, ticket_category=ticket_category, quantity=1, payment_method='wallet',
+        ).create_tickets()
+        Attendee.objects.get_or_create(event=event, user=self.buyer)
+        Favorite.objects.create(user=self.buyer, event=event)
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(queries)
+
+    def test_constant_query_count(self):
+        urls = ['/api/tickets/', '/api/orders/', '/api/favorites/', '/api/events/?expand=attendees']
+        self.add_event()
+        single = {url: self.count_queries(url) for url in urls}
+        for _ in range(4):
+            self.add_event()
+        for url in urls:
+            cache.clear()
+            with self.subTest(url=url), self.assertNumQueries(single[url]):
+                response = self.client.get(url)
+        rows = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['attendees'][0]['tickets_info'][0]['quantity'], 1)
+
+
+class ConditionalGetTest(TestCase):
+    """Un client qui possède la version courante reçoit 304, sans sérialisation"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='password123')
+        self.event = Event.objects.create(
+            title='Concert', description='', category=Category.objects.create(name='Musique'),
+            location='Bujumbura', date=timezone.now() + timedelta(days=7), organizer=self.user,
+            is_approved=True,
+        )
+        self.ticket_category = TicketCategory.objects.create(event=self.event, name='VIP', price=1000)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertRevalidates(self, url, change):
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        change()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_event_detail(self):
+        url = f'/api/events/{self.event.pk}/'
+        self.assertRevalidates(url, lambda: Favorite.objects.create(user=self.user, event=self.event))
+        self.assertRevalidates(url, lambda: self.ticket_category.delete())
+
+    def test_lists(self):
+        self.assertRevalidates('/api/categories/', lambda: Category.objects.create(name='Sport'))
+        self.assertRevalidates(
+            f'/api/ticket-categories/?event={self.event.pk}',
+            lambda: TicketCategory.objects.filter(pk=self.ticket_category.pk).update(
+                available_seats=10, updated_at=timezone.now()
+            )
+        )
+
+
+class ResponseCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.organizer = User.objects.create_user(username='organizer', password='password123')
+        self.buyer = User.objects.create_user(username='buyer', password='password123')
+        self.event = Event.objects.create(
+            title='Concert', description='', category=Category.objects.create(name='Musique'),
+            location='Bujumbura', date=timezone.now() + timedelta(days=7), organizer=self.organizer,
+            is_approved=True,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.buyer)
+
+    def test_hit_keeps_favorites_per_user_and_signals_invalidate(self):
+        url = '/api/events/upcoming/'
+        self.client.get(url)
+        Favorite.objects.create(user=self.buyer, event=self.event)
+        # Page servie par le cache : seule la requête des favoris est exécutée
+        with self.assertNumQueries(1):
+            row = self.client.get(url).data['results'][0]
+        self.assertTrue(row['is_favorited'])
+        self.client.force_authenticate(self.organizer)
+        self.assertFalse(self.client.get(url).data['results'][0]['is_favorited'])
+
+        TicketCategory.objects.create(event=self.event, name='VIP', price=1000)
+        Event.objects.filter(pk=self.event.pk).update(available_seats=7)
+        self.assertEqual(self.client.get(url).data['results'][0]['available_seats'], 7)
+
+    def test_cached_detail_matches_its_etag(self):
+        ticket_category = TicketCategory.objects.create(event=self.event, name='VIP', price=1000, capacity=50)
+        url = f'/api/events/{self.event.pk}/'
+        etag = self.client.get(url)['ETag']
+
+        # Les places sont décomptées par UPDATE, sans signal ni nouvelle génération du cache
+        User.objects.filter(pk=self.buyer.pk).update(wallet_balance=Decimal('100000'))
+        self.buyer.refresh_from_db()
+        Order.objects.create(
+            user=self.buyer, event=self.event, ticket_category=ticket_category, quantity=3, payment_method='wallet'
+        ).create_tickets()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['available_seats'], 97)
+        self.assertEqual(response.data['ticket_categories'][0]['available_seats'], 47)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    @override_settings(RESPONSE_CACHE_TIMEOUT=60, RESPONSE_CACHE_LOCK_TIMEOUT=5)
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+
+        class View(ResponseCacheMixin):
+            cache_namespace = 'test'
+            cached_actions = ['list']
+            action = 'list'
+
+        def handler(request):
+            calls.append(1)
+            time.sleep(0.2)
+            return Response({'count': len(calls)})
+
+        request = APIRequestFactory().get('/api/categories/')
+        request.user = self.buyer
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(View().cached_response(handler, request).data))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'count': 1}] * 5)
+
+
+@mock.patch('events.replicas.replica_alias', return_value='replica')
+class ReplicaRoutingTest(TestCase):
+    """Lectures des actions déclarées sur le réplica, sauf juste après une écriture de l'utilisateur"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='buyer', password='password123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_router(self, replica_alias):
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Event))
+        token = _use_replica.set(True)
+        try:
+            self.assertEqual(router.db_for_read(Event), 'replica')
+            self.assertEqual(router.db_for_write(Event), 'default')
+        finally:
+            _use_replica.reset(token)
+        self.assertFalse(router.allow_migrate('replica', 'events'))
+
+    def test_read_your_writes(self, replica_alias):
+        routed = []
+
+        def db_for_read(router, model, **hints):
+            routed.append(_use_replica.get())
+
+        with mock.patch.object(ReplicaRouter, 'db_for_read', db_for_read):
+            self.client.get('/api/wallet/')
+            self.assertTrue(routed and all(routed))
+
+            self.client.post('/api/wallet/deposit/', {'amount': 500}, format='json')
+            self.assertTrue(is_pinned(self.user))
+            routed.clear()
+            self.assertEqual(len(self.client.get('/api/wallet/').data['results']), 1)
+            self.assertFalse(any(routed))
+        self.assertFalse(_use_replica.get())
+
+
+class HardenedSQLiteTest(SimpleTestCase):
+    """Profil SQLite durci : pragmas appliqués, verrou d'écriture pris dès le début de la transaction"""
+
+    def _connect(self, name):
+        settings_dict = {
+            **connection.settings_dict, 'ENGINE': 'Gevent.sqlite', 'NAME': name,
+            'OPTIONS': {'timeout': 0.05, 'lock_retries': 1},
+        }
+        wrapper = HardenedSQLiteWrapper(settings_dict, alias='hardened')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def test_wal_and_begin_immediate(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        name = os.path.join(directory.name, 'db.sqlite3')
+        first, second = self._connect(name), self._connect(name)
+
+        with first.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('CREATE TABLE seats (id integer)')
+
+        # Aucune écriture encore, mais le verrou est déjà détenu
+        first._start_transaction_under_autocommit()
+        with self.assertRaises(OperationalError):
+            second.cursor().execute('INSERT INTO seats VALUES (1)')
+        # Les lectures ne sont pas bloquées
+        second.cursor().execute('SELECT count(*) FROM seats')
+
+        first.cursor().execute('ROLLBACK')
+        second.cursor().execute('INSERT INTO seats VALUES (1)')
+
+
+class OneRequestThrottle(UserRateThrottle):
+    rate = '1/min'
+
+
+class AsyncReadViewTest(TestCase):
+    """Les lectures asynchrones rendent exactement les réponses des vues DRF synchrones"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='buyer', password='password123', wallet_balance=Decimal('100000')
+        )
+        self.token = Token.objects.create(user=self.user)
+        category = Category.objects.create(name='Musique')
+        self.events = [
+            Event.objects.create(
+                title=f'Concert {i}', description='', category=category, location='Bujumbura',
+                date=timezone.now() + timedelta(days=i + 1), organizer=self.user, is_approved=True,
+            )
+            for i in range(3)
+        ]
+        ticket_category = TicketCategory.objects.create(event=self.events[0], name='VIP', price=1000)
+        Order.objects.create(
+            user=self.user, event=self.events[0], ticket_category=ticket_category,
+            quantity=2, payment_method='wallet',
+        ).create_tickets()
+        Favorite.objects.create(user=self.user, event=self.events[1])
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.factory = AsyncRequestFactory()
+        # Premier motif de chaque nom (les suivants sont les suffixes de format)
+        self.views = {pattern.name: pattern.callback for pattern in reversed(async_read_urls(router.urls))}
+
+    def _get(self, url, **headers):
+        return self.factory.get(url, headers={'Authorization': f'Token {self.token.key}', **headers})
+
+    async def test_same_responses_without_sync_fallback(self):
+        urls = [
+            ('event-list', '/api/events/?page_size=2', {}),
+            ('event-detail', f'/api/events/{self.events[0].pk}/', {'pk': str(self.events[0].pk)}),
+            ('event-upcoming', '/api/events/upcoming/', {}),
+            ('category-list', '/api/categories/', {}),
+            ('ticket-list', '/api/tickets/', {}),
+        ]
+        for name, url, kwargs in urls:
+            expected = await sync_to_async(self.client.get)(url)
+            await cache.aclear()
+            with mock.patch('events.async_views.sync_to_async', side_effect=AssertionError(name)):
+                response = await self.views[name](self._get(url), **kwargs)
+            self.assertEqual(response.status_code, 200, name)
+            self.assertEqual(json.loads(response.content), json.loads(expected.content), name)
+
+    async def test_conditional_get(self):
+        url = f'/api/events/{self.events[0].pk}/'
+        view = self.views['event-detail']
+        etag = (await view(self._get(url), pk=str(self.events[0].pk)))['ETag']
+        response = await view(self._get(url, **{'If-None-Match': etag}), pk=str(self.events[0].pk))
+        self.assertEqual(response.status_code, 304)
+
+    async def test_errors_and_throttling_without_sync_fallback(self):
+        view = self.views['event-detail']
+        url = f'/api/events/{self.events[0].pk}/'
+        expected = await sync_to_async(self.client.get)('/api/events/0/')
+        with mock.patch('events.async_views.sync_to_async', side_effect=AssertionError('fallback')):
+            response = await view(self._get('/api/events/0/'), pk='0')
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(json.loads(response.content), json.loads(expected.content))
+            # Session anonyme, comme après AuthenticationMiddleware
+            anonymous = self.factory.get('/api/events/')
+            anonymous.auser = sync_to_async(AnonymousUser)
+            self.assertEqual((await self.views['event-list'](anonymous)).status_code, 401)
+            with mock.patch.object(EventViewSet, 'throttle_classes', [OneRequestThrottle]):
+                self.assertEqual((await view(self._get(url), pk=str(self.events[0].pk))).status_code, 200)
+                response = await view(self._get(url), pk=str(self.events[0].pk))
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    async def test_delegates_to_drf(self):
+        view = self.views['event-list']
+        # Sans identifiants : erreur produite par DRF
+        response = await view(self.factory.get('/api/events/'))
+        self.assertEqual(response.status_code, 401)
+        # Écriture : vue synchrone
+        response = await view(self.factory.post(
+            '/api/events/', {}, content_type='application/json',
+            headers={'Authorization': f'Token {self.token.key}'},
+        ))
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(
+    BACKGROUND_TASKS_EAGER=True, IMAGE_VARIANT_WIDTHS={'thumb': 160, 'card': 640}, MEDIA_ROOT=tempfile.mkdtemp()
+)
+class ImageVariantTest(TestCase):
+    """Variantes responsives générées à l'enregistrement d'une image, sans EXIF"""
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='organizer', password='password123')
+        self.event = Event.objects.create(
+            title='Concert', description='', category=Category.objects.create(name='Musique'),
+            location='Bujumbura', date=timezone.now() + timedelta(days=7), organizer=self.organizer,
+            is_approved=True,
+        )
+
+    def _photo(self, name):
+        # Photo de téléphone : 2000x1500 à pivoter (orientation 6), avec marque de l'appareil
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'PhoneMaker'
+        buffer = BytesIO()
+        Image.new('RGB', (2000, 1500), 'red').save(buffer, format='JPEG', exif=exif)
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+    def test_variants_exposed_as_srcset(self):
+        self.event.image_url = self._photo('affiche.jpg')
+        self.event.save()
+        self.event.refresh_from_db()
+        variants = self.event.image_variants
+        self.assertEqual(variants['source'], self.event.image_url.name)
+        self.assertEqual((variants['card']['width'], variants['card']['height']), (640, 853))
+
+        storage = self.event.image_url.storage
+        for name in (variants['card']['webp'], variants['card']['jpeg']):
+            with storage.open(name) as file, Image.open(file) as image:
+                self.assertEqual(image.size, (640, 853))
+                self.assertEqual(dict(image.getexif()), {})
+
+        client = APIClient()
+        client.force_authenticate(self.organizer)
+        data = client.get(f'/api/events/{self.event.pk}/').data
+        self.assertEqual(data['image_srcset']['thumb']['width'], 160)
+        self.assertTrue(data['image_srcset']['card']['webp'].startswith('http://testserver/media/variants/events/'))
+        self.assertIsNone(data['organizer_image_srcset'])
+
+        # Nouvelle image : nouvelles variantes, les anciennes sont supprimées
+        old = variants['card']['webp']
+        self.event.image_url = self._photo('affiche2.jpg')
+        self.event.save()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.image_variants['source'], self.event.image_url.name)
+        self.assertFalse(storage.exists(old))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class DefaultAvatarTest(TestCase):
+    """Avatars par défaut partagés par initiales et couleur, rendus à la demande"""
+
+    def test_shared_avatar_served_once_and_cached(self):
+        users = [
+            User.objects.create_user(username=username, password='password123', first_name='Jean', last_name='Dupont')
+            for username in ('jean', 'jeanne')
+        ]
+        self.assertFalse(users[0].profile_image)
+        request = APIRequestFactory().get('/')
+        urls = {UserSerializer(user, context={'request': request}).data['profile_image'] for user in users}
+        self.assertEqual(urls, {'http://testserver/api/avatars/JD-007bff.png'})
+
+        client = APIClient()
+        response = client.get('/api/avatars/JD-007bff.png')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertIn('immutable', response['Cache-Control'])
+        with Image.open(BytesIO(response.content)) as image:
+            self.assertEqual(image.size, (200, 200))
+        self.assertEqual(client.get('/api/avatars/JD-007bff.png', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(client.get('/api/avatars/JD-007bff.svg')['Content-Type'], 'image/svg+xml')
+        self.assertEqual(client.get('/api/avatars/JD-ff0000.png').status_code, 404)
+
+    def test_unusual_names(self):
+        request = APIRequestFactory().get('/')
+        client = APIClient()
+        cases = [("'Ali", 'Baba', 'AB'), ('ßig', 'Xu', 'SX'), ('1Bob', 'Carl', 'BC'), ('Élise', 'öz', 'ÉÖ')]
+        for index, (first_name, last_name, initials) in enumerate(cases):
+            user = User.objects.create_user(
+                username=f'user{index}', password='password123', first_name=first_name, last_name=last_name
+            )
+            url = UserSerializer(user, context={'request': request}).data['profile_image']
+            self.assertEqual(url, f'http://testserver{reverse("default_avatar", args=[initials, "007bff", "png"])}')
+            self.assertEqual(client.get(url).status_code, 200, first_name)
+
+        user = User.objects.create_user(username='digits', password='password123', first_name='123', last_name='X')
+        self.assertIsNone(UserSerializer(user, context={'request': request}).data['profile_image'])
+
+    def test_prune_per_user_avatar_files(self):
+        user = User.objects.create_user(username='jean', password='password123', first_name='Jean', last_name='Dupont')
+        name = default_storage.save('profiles/default_avatar_jean.png', ContentFile(b'png'))
+        User.objects.filter(pk=user.pk).update(profile_image=name)
+
+        call_command('prune_default_avatars', stdout=StringIO())
+        user.refresh_from_db()
+        self.assertFalse(user.profile_image)
+        self.assertFalse(default_storage.exists(name))
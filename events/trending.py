@@ -0,0 +1,174 @@
+"""
+Score de tendance des événements, précalculé dans Event.trending_score.
+
+Chaque vente de billet, favori ou avis contribue `poids * 2^(-âge / demi-vie)`.
+Pour ne jamais réécrire tous les scores quand le temps passe, on utilise une
+décroissance « vers l'avant » : une contribution datée t est stockée comme
+`poids * 2^((t - epoch) / demi-vie)`. Le facteur de décroissance commun à tous
+les événements est ignoré, ce qui ne change pas le classement. Un passage ne
+traite donc que l'activité depuis le passage précédent.
+
+Un passage s'arrête à `maintenant - TRENDING_GRACE_SECONDS` : une ligne est
+datée à sa création mais n'est visible qu'au commit de sa transaction. Avec ce
+délai, une ligne encore en cours d'écriture est comptée au passage suivant
+(chaque ligne une seule fois, les fenêtres ne se recouvrent pas).
+
+Quand les valeurs stockées deviennent trop grandes, tous les scores sont
+rapportés à une nouvelle origine (rare : environ une fois par an avec la
+demi-vie par défaut).
+
+is_popular est rafraîchi à chaque passage : les TRENDING_POPULAR_COUNT
+meilleurs scores parmi les événements à venir ou en cours, pas encore
+terminés (popular_candidates).
+"""
+import logging
+import math
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.utils import timezone
+
+from .models import Event, Favorite, Review, Ticket, TrendingRollup
+from .response_cache import invalidate_on_commit
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ['upcoming', 'ongoing']
+
+# Exposant au-delà duquel les scores sont rapportés à une nouvelle origine
+MAX_EXPONENT = 200
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _growth(moment, epoch):
+    """Poids d'une contribution datée `moment`, relativement à l'origine"""
+    half_life = _setting('TRENDING_HALF_LIFE_HOURS', 48) * 3600
+    return 2 ** ((moment - epoch).total_seconds() / half_life)
+
+
+def _activity(since, until):
+    """(événement, date, poids) de l'activité entre deux passages"""
+    weights = _setting('TRENDING_WEIGHTS', {'ticket': 1.0, 'favorite': 0.5, 'review': 0.3})
+    sources = [
+        (Ticket.objects.filter(status__in=['confirmed', 'used']), 'purchase_date', weights['ticket']),
+        (Favorite.objects.all(), 'created_at', weights['favorite']),
+        (Review.objects.all(), 'created_at', weights['review']),
+    ]
+    for queryset, date_field, weight in sources:
+        queryset = queryset.filter(**{f'{date_field}__lte': until})
+        if since is not None:
+            queryset = queryset.filter(**{f'{date_field}__gt': since})
+        for event_id, moment in queryset.values_list('event_id', date_field).iterator():
+            yield event_id, moment, weight
+
+
+def _rebase(state, now):
+    """Rapporte tous les scores à une nouvelle origine `now`"""
+    factor = 1 / _growth(now, state.epoch)
+    Event.objects.filter(trending_score__gt=0).update(trending_score=F('trending_score') * factor)
+    state.epoch = now
+
+
+def popular_candidates(queryset, now=None):
+    """
+    Événements éligibles à /popular : actifs et pas encore terminés. Un
+    événement passé garde un score décroissant non nul, il est écarté ici.
+    """
+    now = now or timezone.now()
+    return queryset.filter(
+        Q(date__gte=now) | Q(end_date__gte=now),
+        status__in=ACTIVE_STATUSES,
+        trending_score__gt=0,
+    )
+
+
+def refresh_popular():
+    """Marque is_popular les meilleurs scores actifs ; retourne le nombre d'événements populaires"""
+    now = timezone.now()
+    popular_ids = list(
+        popular_candidates(Event.objects.all(), now)
+        .order_by('-trending_score')
+        .values_list('id', flat=True)[:_setting('TRENDING_POPULAR_COUNT', 20)]
+    )
+    Event.objects.filter(is_popular=True).exclude(pk__in=popular_ids).update(is_popular=False, updated_at=now)
+    Event.objects.filter(pk__in=popular_ids, is_popular=False).update(is_popular=True, updated_at=now)
+    return len(popular_ids)
+
+
+@transaction.atomic
+def rollup(full=False, chunk_size=500):
+    """
+    Ajoute aux scores l'activité depuis le dernier passage (ou tout
+    l'historique avec full=True). Retourne le nombre d'événements mis à jour.
+    """
+    now = timezone.now()
+    # Verrou sur l'état : deux processus ne peuvent pas compter deux fois la même activité
+    TrendingRollup.objects.get_or_create(pk=1, defaults={'epoch': now})
+    state = TrendingRollup.objects.select_for_update().get(pk=1)
+
+    if full:
+        Event.objects.filter(trending_score__gt=0).update(trending_score=0)
+        state.epoch = now
+        state.last_run_at = None
+    elif math.log2(_growth(now, state.epoch)) > MAX_EXPONENT:
+        _rebase(state, now)
+
+    # Fin de fenêtre en retrait de la période de grâce, jamais avant la précédente
+    until = now - timedelta(seconds=_setting('TRENDING_GRACE_SECONDS', 300))
+    if state.last_run_at is not None:
+        until = max(until, state.last_run_at)
+
+    deltas = defaultdict(float)
+    for event_id, moment, weight in _activity(state.last_run_at, until):
+        deltas[event_id] += weight * _growth(moment, state.epoch)
+
+    event_ids = list(deltas)
+    for start in range(0, len(event_ids), chunk_size):
+        chunk = event_ids[start:start + chunk_size]
+        Event.objects.filter(pk__in=chunk).update(trending_score=F('trending_score') + Case(
+            *[When(pk=event_id, then=Value(deltas[event_id])) for event_id in chunk],
+            output_field=FloatField()
+        ))
+
+    state.last_run_at = until
+    state.save()
+    refresh_popular()
+    invalidate_on_commit('events')
+    return len(event_ids)
+
+
+_scheduler = None
+
+
+def start_scheduler(interval):
+    """
+    Lance le calcul toutes les `interval` secondes dans un thread du
+    processus (TRENDING_REFRESH_INTERVAL). À réserver aux déploiements sans
+    planificateur externe ; sinon utiliser la commande refresh_trending.
+    """
+    global _scheduler
+    if _scheduler is not None:
+        return _scheduler
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            close_old_connections()
+            try:
+                rollup()
+            except Exception:
+                logger.exception("Échec du calcul des tendances")
+            finally:
+                close_old_connections()
+
+    _scheduler = threading.Thread(target=loop, name='gevent-trending', daemon=True)
+    _scheduler.start()
+    return _scheduler
@@ -1,7 +1,9 @@
-from django.urls import path, include
+from django.conf import settings
+from django.urls import path, include, re_path
 from rest_framework.routers import DefaultRouter
 from . import views
 from . import auth_views
+from .async_views import async_read_urls
 
 router = DefaultRouter()
 router.register(r'events', views.EventViewSet)
@@ -13,6 +15,10 @@ router.register(r'reviews', views.ReviewViewSet, basename='review')
 router.register(r'favorites', views.FavoriteViewSet, basename='favorite')
 router.register(r'wallet', views.WalletViewSet, basename='wallet')
 
+api_urls = router.urls
+if settings.ASYNC_READ_VIEWS:
+    api_urls = async_read_urls(api_urls)
+
 urlpatterns = [
     # Authentification (APIView)
     path('api/auth/register/', auth_views.RegisterView.as_view(), name='register'),
@@ -20,6 +26,10 @@ urlpatterns = [
     path('api/auth/login/', auth_views.LoginView.as_view(), name='login'),
     path('api/auth/user/', auth_views.UserProfileView.as_view(), name='user_profile'),
     
+    # Avatars par défaut, partagés entre utilisateurs (events.avatars)
+    re_path(r'^api/avatars/(?P<initials>\w{1,2})-(?P<color>[0-9a-f]{6})\.(?P<fmt>png|svg)$',
+            views.DefaultAvatarView.as_view(), name='default_avatar'),
+
     # API avec ViewSets
-    path('api/', include(router.urls)),
+    path('api/', include(api_urls)),
 ]
\ No newline at end of file
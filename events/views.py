@@ -1,36 +1,106 @@
 from rest_framework import viewsets, filters, status, permissions, serializers
 from rest_framework.decorators import action
+from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from django_filters.rest_framework import DjangoFilterBackend
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from django.db import models
+from django.db import models, transaction
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+import time
+from .cancellation import refund_total, start_cancellation
+from .ledger import EXTERNAL, InsufficientFunds, Leg, balance_of, post_entry
+from .checkin import (
+    EVENT_STATUS_MESSAGES, apply_offline_scans, build_scanner_manifest, check_in, gate_throughput,
+    record_scan, validate_batch
+)
+from .async_views import AsyncReadMixin
+from .avatars import AVATAR_CONTENT_TYPES, avatar_etag, is_valid_avatar, render_avatar
+from .conditional import ConditionalGetMixin, aevent_state, event_state
+from .pagination import PaginatedActionMixin
+from .qr import QR_CONTENT_TYPES, qr_etag, render_qr
+from .renderers import PNGRenderer, SVGRenderer
+from .recommendations import rank_events
+from .replicas import ReplicaReadMixin
+from .response_cache import ResponseCacheMixin
+from .search import EventSearchFilter, search_events
+from .trending import popular_candidates
+from .geo import max_radius_km, nearby_events
+from .query_plans import EVENT_RELATIONS, aattach_attendee_summaries, expanded_relations, with_event_plan, with_order_plan, with_ticket_plan, nested_event_prefetch
 from .models import Event, Category, Attendee, Ticket, Order, Review, Favorite, WalletTransaction, TicketCategory
 from .serializers import (
-    EventSerializer, CategorySerializer, AttendeeSerializer,
+    EventSerializer, EventSummarySerializer, NearbyEventSerializer, CategorySerializer, AttendeeSerializer,
     TicketSerializer, OrderSerializer, ReviewSerializer,
-    FavoriteSerializer, UserSerializer, WalletTransactionSerializer, TicketCategorySerializer
+    FavoriteSerializer, UserSerializer, WalletTransactionSerializer, TicketCategorySerializer,
+    EventCancellationJobSerializer
 )
 
 User = get_user_model()
 
-class EventViewSet(viewsets.ModelViewSet):
+class EventViewSet(ReplicaReadMixin, ConditionalGetMixin, ResponseCacheMixin, PaginatedActionMixin, AsyncReadMixin,
+                   viewsets.ModelViewSet):
     queryset = Event.objects.all()
     serializer_class = EventSerializer
     parser_classes = [JSONParser, MultiPartParser, FormParser]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, EventSearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'is_free', 'is_popular']
     search_fields = ['title', 'description', 'location']
     ordering_fields = ['date', 'price', 'rating', 'created_at']
     ordering = ['-date']
+    summary_actions = ['list', 'upcoming', 'popular', 'nearby', 'my_events', 'pending_approval']
+    detail_actions = ['retrieve', 'update', 'partial_update', 'change_status', 'approve']
+    cache_namespace = 'events'
+    cached_actions = ['retrieve', 'upcoming', 'popular']
+    replica_actions = ['list', 'retrieve', 'upcoming', 'popular', 'nearby', 'attendees']
+    max_offline_scans = 5000
+
+    def _detail_queryset(self):
+        if self.action != 'retrieve':
+            return None
+        try:
+            return self.get_queryset().filter(pk=self.kwargs['pk'])
+        except (TypeError, ValueError):
+            return None
+
+    def get_validator_state(self):
+        """ETag du détail : l'événement et tout ce que sa représentation inclut"""
+        queryset = self._detail_queryset()
+        return None if queryset is None else event_state(queryset)
+
+    async def aget_validator_state(self):
+        queryset = self._detail_queryset()
+        return None if queryset is None else await aevent_state(queryset)
+
+    async def aprepare_objects(self, events):
+        await aattach_attendee_summaries(events)
+
+    def get_serializer_class(self):
+        if self.action == 'nearby':
+            return NearbyEventSerializer
+        if self.action in self.summary_actions:
+            return EventSummarySerializer
+        return super().get_serializer_class()
+
+    def apply_query_plan(self, queryset):
+        """Charge organisateur, catégorie, compteurs et relations rendues en requêtes constantes"""
+        if self.action in self.summary_actions:
+            relations = expanded_relations(self.request)
+        elif self.action in self.detail_actions:
+            relations = EVENT_RELATIONS
+        else:
+            # Actions qui ne renvoient pas l'événement sérialisé
+            relations = ()
+        return with_event_plan(queryset, self.request.user, relations)
 
     def get_queryset(self):
-        """Recommandations basées sur les catégories des favoris et tickets achetés"""
-        queryset = super().get_queryset().prefetch_related('ticket_categories')
+        """Recommandations basées sur l'affinité de l'utilisateur pour les catégories"""
+        queryset = self.apply_query_plan(super().get_queryset())
         
         # Pour les actions d'organisateur (my_events, soft_delete, etc.), ne pas filtrer par approbation
-        if self.action in ['soft_delete', 'cancel_event', 'change_status', 'upload_image', 'add_ticket_category']:
+        if self.action in ['soft_delete', 'cancel_event', 'change_status', 'upload_image', 'add_ticket_category',
+                           'scanner_manifest', 'offline_scans', 'scan_stats', 'cancellation_status']:
             return queryset
         
         # Exclure les événements annulés et supprimés pour tous les utilisateurs
@@ -42,35 +112,42 @@ class EventViewSet(viewsets.ModelViewSet):
         
         category = self.request.query_params.get('category')
         
-        # Si action est list (recommandations)
+        # Si action est list (recommandations) : classement par affinité, nouveauté et popularité
         if self.action == 'list':
-            # Récupérer les catégories des favoris de l'utilisateur
-            favorite_categories = Favorite.objects.filter(
-                user=self.request.user
-            ).values_list('event__category', flat=True).distinct()
-            
-            # Récupérer les catégories des tickets achetés
-            ticket_categories = Ticket.objects.filter(
-                user=self.request.user
-            ).values_list('event__category', flat=True).distinct()
-            
-            # Combiner les catégories
-            user_categories = set(list(favorite_categories) + list(ticket_categories))
-            
-            if user_categories:
-                # Recommander des événements dans ces catégories
-                queryset = queryset.filter(category__id__in=user_categories)
+            queryset = rank_events(queryset, self.request.user)
             
         if category:
             queryset = queryset.filter(category__name=category)
         return queryset
 
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        # Sans ?ordering= explicite, la liste suit la pertinence de la recherche puis la recommandation
+        if self.action == 'list' and not self.request.query_params.get('ordering'):
+            if self.request.query_params.get('search', '').strip():
+                queryset = queryset.order_by('-search_rank', '-recommendation_score', '-date')
+            else:
+                queryset = queryset.order_by('-recommendation_score', '-date')
+        return queryset
+
     def perform_create(self, serializer):
         serializer.save(organizer=self.request.user)
 
     @action(detail=False, methods=['get'])
     def upcoming(self, request):
         """Événements à venir - status upcoming ET date future ET non annulés"""
+        return self.cached_response(self._upcoming, request)
+
+    async def aupcoming(self, request):
+        return await self.acached_response(self._aupcoming, request)
+
+    def _upcoming(self, request):
+        return self.paginated_response(self._upcoming_queryset(request))
+
+    async def _aupcoming(self, request):
+        return await self.apaginated_response(self._upcoming_queryset(request))
+
+    def _upcoming_queryset(self, request):
         queryset = self.queryset.filter(
             status='upcoming', 
             date__gte=timezone.now()
@@ -86,24 +163,17 @@ class EventViewSet(viewsets.ModelViewSet):
         if category:
             queryset = queryset.filter(category__name=category)
         if search:
-            queryset = queryset.filter(
-                models.Q(title__icontains=search) |
-                models.Q(description__icontains=search) |
-                models.Q(location__icontains=search)
-            )
+            queryset = search_events(queryset, search)
         
-        queryset = queryset.order_by('date')
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return self.apply_query_plan(queryset.order_by('date'))
 
     @action(detail=False, methods=['get'])
     def popular(self, request):
-        """Événements populaires - basé sur le nombre de tickets vendus"""
-        from django.db.models import Count
-        
-        queryset = self.queryset.annotate(
-            tickets_sold=Count('tickets', filter=models.Q(tickets__status='confirmed'))
-        ).filter(tickets_sold__gt=0).exclude(status__in=['cancelled', 'deleted']).order_by('-tickets_sold')
+        """Événements populaires - classés par score de tendance précalculé (refresh_trending)"""
+        return self.cached_response(self._popular, request)
+
+    def _popular(self, request):
+        queryset = popular_candidates(self.queryset).order_by('-trending_score')
         
         # Filtrer les événements approuvés pour les utilisateurs normaux
         if not request.user.is_staff:
@@ -115,22 +185,34 @@ class EventViewSet(viewsets.ModelViewSet):
         if category:
             queryset = queryset.filter(category__name=category)
         if search:
-            queryset = queryset.filter(
-                models.Q(title__icontains=search) |
-                models.Q(description__icontains=search) |
-                models.Q(location__icontains=search)
-            )
+            queryset = search_events(queryset, search)
         
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(self.apply_query_plan(queryset))
+
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        """Événements autour d'un point (?lat=&lng=&radius_km=), du plus proche au plus lointain"""
+        try:
+            latitude = float(request.query_params['lat'])
+            longitude = float(request.query_params['lng'])
+            radius_km = float(request.query_params.get('radius_km', 10))
+        except (KeyError, ValueError):
+            return Response({'error': 'Paramètres lat et lng requis'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180 and 0 < radius_km <= max_radius_km()):
+            return Response({
+                'error': f'Coordonnées invalides ou rayon hors de ]0, {max_radius_km()}] km'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        queryset = nearby_events(self.filter_queryset(self.get_queryset()), latitude, longitude, radius_km)
+        return self.paginated_response(queryset)
 
     @action(detail=True, methods=['get'])
     def attendees(self, request, pk=None):
         """Liste des participants"""
         event = self.get_object()
-        attendees = event.attendees.all()
-        serializer = AttendeeSerializer(attendees, many=True)
-        return Response(serializer.data)
+        attendees = event.attendees.select_related('user')
+        return self.paginated_response(attendees, AttendeeSerializer)
 
     @action(detail=True, methods=['post'])
     def join(self, request, pk=None):
@@ -159,107 +241,53 @@ class EventViewSet(viewsets.ModelViewSet):
     def my_events(self, request):
         """Événements organisés par l'utilisateur connecté"""
         my_events = self.queryset.filter(organizer=request.user).exclude(status='deleted')
-        serializer = self.get_serializer(my_events, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(self.apply_query_plan(my_events))
 
     @action(detail=True, methods=['post'])
     def cancel_event(self, request, pk=None):
-        """Annuler un événement - remboursement 100% (55% gcash + 45% organisateur)"""
+        """
+        Annuler un événement - remboursement 100% (55% gcash + 45% organisateur).
+        Les remboursements sont exécutés en arrière-plan : suivre l'avancement
+        via cancellation_status.
+        """
         event = self.get_object()
         
         if event.organizer != request.user:
             return Response({'error': 'Permission refusée'}, status=status.HTTP_403_FORBIDDEN)
         
-        if event.status in ['cancelled', 'completed', 'deleted']:
+        # Un événement annulé dont les remboursements n'ont pas abouti peut être relancé
+        resumable = event.status == 'cancelled' and event.cancellation_jobs.exclude(status='completed').exists()
+        if event.status in ['cancelled', 'completed', 'deleted'] and not resumable:
             return Response({'error': 'Cet événement ne peut pas être annulé'}, status=status.HTTP_400_BAD_REQUEST)
         
-        from decimal import Decimal
+        # Vérifier le solde de l'organisateur (la TVA est reprise sur le journal plateforme)
+        to_refund = refund_total(event)
+        if event.organizer.wallet_balance < to_refund:
+            return Response({
+                'error': f'Solde organisateur insuffisant pour rembourser les billets ({to_refund} BIF requis)'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        tickets = Ticket.objects.filter(event=event, status='confirmed')
-        refunded_count = 0
-        total_refunded = Decimal('0')
+        job = start_cancellation(event, request.user)
+        job.refresh_from_db()
         
-        # Récupérer le compte gcash
-        try:
-            gcash_user = User.objects.get(username='gcash')
-        except User.DoesNotExist:
-            return Response({'error': 'Compte système gcash introuvable'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        
-        for ticket in tickets:
-            # Prix de base (HT) et commission
-            base_price = Decimal(str(ticket.price))
-            commission = base_price * Decimal('0.10')
-            total_paid = base_price + commission  # 110% du prix de base
-            
-            # Vérifier les soldes
-            if gcash_user.wallet_balance < commission:
-                return Response({'error': f'Solde gcash insuffisant pour rembourser le billet {ticket.code}'}, status=status.HTTP_400_BAD_REQUEST)
-            if event.organizer.wallet_balance < base_price:
-                return Response({'error': f'Solde organisateur insuffisant pour rembourser le billet {ticket.code}'}, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Rembourser 110% à l'acheteur (100% prix de base + 10% commission)
-            buyer_balance_before = ticket.user.wallet_balance
-            ticket.user.wallet_balance += total_paid
-            ticket.user.save()
-            
-            WalletTransaction.objects.create(
-                user=ticket.user,
-                transaction_type='refund',
-                amount=total_paid,
-                balance_before=buyer_balance_before,
-                balance_after=ticket.user.wallet_balance,
-                description=f"Remboursement 110% - Événement annulé: {event.title}",
-                ticket=ticket
-            )
-            
-            # Déduire 10% de gcash (commission)
-            gcash_balance_before = gcash_user.wallet_balance
-            gcash_user.wallet_balance -= commission
-            gcash_user.save()
-            
-            WalletTransaction.objects.create(
-                user=gcash_user,
-                transaction_type='refund',
-                amount=-commission,
-                balance_before=gcash_balance_before,
-                balance_after=gcash_user.wallet_balance,
-                description=f"Remboursement commission 10% - Événement annulé: {event.title} - Billet {ticket.code}",
-                ticket=ticket
-            )
-            
-            # Déduire 100% de l'organisateur (prix de base)
-            organizer_balance_before = event.organizer.wallet_balance
-            event.organizer.wallet_balance -= base_price
-            event.organizer.save()
-            
-            WalletTransaction.objects.create(
-                user=event.organizer,
-                transaction_type='refund',
-                amount=-base_price,
-                balance_before=organizer_balance_before,
-                balance_after=event.organizer.wallet_balance,
-                description=f"Remboursement 100% - Événement annulé: {event.title} - Billet {ticket.code}",
-                ticket=ticket
-            )
-            
-            # Annuler le billet
-            ticket.status = 'cancelled'
-            ticket.cancelled_at = timezone.now()
-            ticket.save()
-            
-            refunded_count += 1
-            total_refunded += total_paid
+        return Response({
+            'message': 'Annulation de l\'événement en cours',
+            'job': EventCancellationJobSerializer(job).data
+        }, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=True, methods=['get'])
+    def cancellation_status(self, request, pk=None):
+        """Avancement des remboursements d'un événement annulé - Organisateur seulement"""
+        event = self.get_object()
         
-        # Restaurer les sièges
-        event.available_seats = event.total_capacity
-        event.status = 'cancelled'
-        event.save()
+        if event.organizer_id != request.user.id:
+            return Response({'error': 'Permission refusée'}, status=status.HTTP_403_FORBIDDEN)
         
-        return Response({
-            'message': 'Événement annulé avec succès',
-            'refunded_tickets': refunded_count,
-            'total_refunded': str(total_refunded)
-        })
+        job = event.cancellation_jobs.first()
+        if job is None:
+            return Response({'error': 'Aucune annulation pour cet événement'}, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response(EventCancellationJobSerializer(job).data)
     
     @action(detail=True, methods=['delete'], url_path='soft_delete')
     def soft_delete(self, request, pk=None):
@@ -341,8 +369,7 @@ class EventViewSet(viewsets.ModelViewSet):
     def pending_approval(self, request):
         """Événements en attente d'approbation - Admin seulement"""
         queryset = self.queryset.filter(is_approved=False).exclude(status='deleted')
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(self.apply_query_plan(queryset))
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAdminUser])
     def approve(self, request, pk=None):
@@ -393,9 +420,61 @@ class EventViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class TicketCategoryViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['get'])
+    def scanner_manifest(self, request, pk=None):
+        """Manifeste des billets valides pour les scanners hors ligne - Organisateur seulement"""
+        event = self.get_object()
+        
+        if event.organizer_id != request.user.id:
+            return Response({'error': 'Permission refusée'}, status=status.HTTP_403_FORBIDDEN)
+        
+        since = request.query_params.get('since')
+        if since and not since.isdigit():
+            return Response({'error': 'Version invalide'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(build_scanner_manifest(event, int(since) if since else None))
+
+    @action(detail=True, methods=['post'])
+    def offline_scans(self, request, pk=None):
+        """Synchroniser les billets scannés hors ligne - Organisateur seulement"""
+        event = self.get_object()
+        
+        if event.organizer_id != request.user.id:
+            return Response({'error': 'Permission refusée'}, status=status.HTTP_403_FORBIDDEN)
+        
+        scans = request.data.get('scans')
+        if not isinstance(scans, list) or not scans:
+            return Response({'error': 'Aucun scan fourni'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(scans) > self.max_offline_scans:
+            return Response({'error': f'Maximum {self.max_offline_scans} scans par envoi'}, status=status.HTTP_400_BAD_REQUEST)
+        if not all(isinstance(scan, dict) and isinstance(scan.get('code'), str) for scan in scans):
+            return Response({'error': 'Format de scan invalide'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        results = apply_offline_scans(event, scans, request.user)
+        return Response({
+            'admitted': sum(1 for result in results if result['status'] == 'admitted'),
+            'conflicts': sum(1 for result in results if result['status'] != 'admitted'),
+            'results': results
+        })
+
+    @action(detail=True, methods=['get'])
+    def scan_stats(self, request, pk=None):
+        """Débit des portes en direct (scans par minute) - Organisateur seulement"""
+        event = self.get_object()
+        
+        if event.organizer_id != request.user.id:
+            return Response({'error': 'Permission refusée'}, status=status.HTTP_403_FORBIDDEN)
+        
+        minutes = request.query_params.get('minutes', '30')
+        if not minutes.isdigit() or not 1 <= int(minutes) <= 24 * 60:
+            return Response({'error': 'Fenêtre invalide'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(gate_throughput(event, int(minutes)))
+
+class TicketCategoryViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = TicketCategory.objects.all()
     serializer_class = TicketCategorySerializer
+    validator_field = 'updated_at'
     
     def get_queryset(self):
         event_id = self.request.query_params.get('event')
@@ -438,24 +517,59 @@ class TicketCategoryViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class CategoryViewSet(ReplicaReadMixin, ConditionalGetMixin, ResponseCacheMixin, PaginatedActionMixin, AsyncReadMixin,
+                      viewsets.ReadOnlyModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
+    validator_field = 'updated_at'
+    cache_namespace = 'categories'
+    cached_actions = ['list']
+    replica_actions = ['list', 'retrieve', 'events']
 
     @action(detail=True, methods=['get'])
     def events(self, request, pk=None):
         """Événements par catégorie"""
         category = self.get_object()
-        events = category.events.all()
-        serializer = EventSerializer(events, many=True, context={'request': request})
-        return Response(serializer.data)
+        events = with_event_plan(category.events.all(), request.user, expanded_relations(request))
+        return self.paginated_response(events, EventSummarySerializer)
 
-class TicketViewSet(viewsets.ReadOnlyModelViewSet):
+class TicketViewSet(PaginatedActionMixin, AsyncReadMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = TicketSerializer
+    max_qr_batch = 500
+    
+    async def aprepare_objects(self, tickets):
+        await aattach_attendee_summaries([ticket.event for ticket in tickets])
     
     def get_queryset(self):
-        return Ticket.objects.filter(user=self.request.user)
+        if self.action in ['qr_png', 'qr_svg']:
+            return Ticket.objects.filter(user=self.request.user).select_related('event', 'ticket_category')
+        return with_ticket_plan(Ticket.objects.filter(user=self.request.user), self.request.user)
+
+    def _qr_response(self, request, fmt):
+        """Image du QR code rendue à la demande, avec ETag fort et cache client"""
+        ticket = self.get_object()
+        payload = ticket.qr_payload or ticket.build_qr_payload()
+        etag = qr_etag(payload, fmt)
+        
+        if_none_match = request.headers.get('If-None-Match', '')
+        if if_none_match.strip() == '*' or etag in parse_etags(if_none_match):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(render_qr(payload, fmt), content_type=QR_CONTENT_TYPES[fmt])
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, max-age=86400'
+        return response
+
+    @action(detail=True, methods=['get'], url_path='qr.png', url_name='qr-png', renderer_classes=[PNGRenderer])
+    def qr_png(self, request, pk=None):
+        """QR code du billet en PNG"""
+        return self._qr_response(request, 'png')
+
+    @action(detail=True, methods=['get'], url_path='qr.svg', url_name='qr-svg', renderer_classes=[SVGRenderer])
+    def qr_svg(self, request, pk=None):
+        """QR code du billet en SVG"""
+        return self._qr_response(request, 'svg')
 
     @action(detail=False, methods=['get'])
     def upcoming(self, request):
@@ -464,8 +578,7 @@ class TicketViewSet(viewsets.ReadOnlyModelViewSet):
             status='confirmed',
             event__date__gte=timezone.now()
         )
-        serializer = self.get_serializer(tickets, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(tickets)
 
     @action(detail=False, methods=['get'])
     def completed(self, request):
@@ -474,8 +587,7 @@ class TicketViewSet(viewsets.ReadOnlyModelViewSet):
             status__in=['used', 'expired'],
             event__date__lt=timezone.now()
         )
-        serializer = self.get_serializer(tickets, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(tickets)
 
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
@@ -488,54 +600,37 @@ class TicketViewSet(viewsets.ReadOnlyModelViewSet):
         
         # Remboursement de 45% du prix HT (prix de base sans commission)
         refund_rate = Decimal('0.45')
-        refund_amount = Decimal(str(ticket.price)) * refund_rate
+        refund_amount = (Decimal(str(ticket.price)) * refund_rate).quantize(Decimal('0.01'))
         
-        # Vérifier que l'organisateur a assez de fonds
-        organizer = ticket.event.organizer
-        if organizer.wallet_balance < refund_amount:
+        # Rembourser 45% à l'acheteur, débité de l'organisateur seulement si son solde le permet
+        try:
+            with transaction.atomic():
+                post_entry([
+                    Leg(ticket.user_id, refund_amount, 'refund',
+                        f"Remboursement 45% - Billet {ticket.code} - {ticket.event.title}"),
+                    Leg(ticket.event.organizer_id, -refund_amount, 'refund',
+                        f"Remboursement 45% client - Billet {ticket.code} - {ticket.event.title}"),
+                ], ticket=ticket)
+                
+                # Annuler le billet (UPDATE conditionnel : un seul remboursement par billet)
+                now = timezone.now()
+                cancelled = Ticket.objects.filter(pk=ticket.pk, status='confirmed').update(
+                    status='cancelled', cancelled_at=now, updated_at=now
+                )
+                if not cancelled:
+                    raise ValueError('Ce billet ne peut pas être annulé')
+                
+                # Libérer les sièges dans la catégorie ET l'événement
+                TicketCategory.objects.filter(pk=ticket.ticket_category_id).update(
+                    available_seats=models.F('available_seats') + 1, updated_at=now
+                )
+                Event.objects.filter(pk=ticket.event_id).update(
+                    available_seats=models.F('available_seats') + 1, updated_at=now
+                )
+        except InsufficientFunds:
             return Response({'error': 'Solde insuffisant de l\'organisateur pour le remboursement'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Rembourser 45% à l'acheteur
-        buyer_balance_before = ticket.user.wallet_balance
-        ticket.user.wallet_balance += refund_amount
-        ticket.user.save()
-        
-        WalletTransaction.objects.create(
-            user=ticket.user,
-            transaction_type='refund',
-            amount=refund_amount,
-            balance_before=buyer_balance_before,
-            balance_after=ticket.user.wallet_balance,
-            description=f"Remboursement 45% - Billet {ticket.code} - {ticket.event.title}",
-            ticket=ticket
-        )
-        
-        # Déduire 45% de l'organisateur
-        organizer_balance_before = organizer.wallet_balance
-        organizer.wallet_balance -= refund_amount
-        organizer.save()
-        
-        WalletTransaction.objects.create(
-            user=organizer,
-            transaction_type='refund',
-            amount=-refund_amount,
-            balance_before=organizer_balance_before,
-            balance_after=organizer.wallet_balance,
-            description=f"Remboursement 45% client - Billet {ticket.code} - {ticket.event.title}",
-            ticket=ticket
-        )
-        
-        # Annuler le billet
-        ticket.status = 'cancelled'
-        ticket.cancelled_at = timezone.now()
-        ticket.save()
-        
-        # Libérer les sièges dans la catégorie ET l'événement
-        ticket.ticket_category.available_seats += 1
-        ticket.ticket_category.save()
-        
-        ticket.event.available_seats += 1
-        ticket.event.save()
+        except ValueError as e:
+            return Response({'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         # Vérifier si l'utilisateur a encore des tickets valides pour cet événement
         remaining_tickets = Ticket.objects.filter(
@@ -557,57 +652,82 @@ class TicketViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['post'])
     def validate_qr(self, request):
         """Valider un QR code - seuls les organisateurs peuvent valider leurs billets"""
+        started = time.perf_counter()
+        gate = str(request.data.get('gate') or '')[:50]
         qr_data = request.data.get('qr_data')
         if not qr_data:
             return Response({'error': 'Données QR manquantes'}, status=status.HTTP_400_BAD_REQUEST)
         
-        ticket, message = Ticket.validate_qr_code(qr_data)
+        ticket, error = Ticket.resolve_qr_code(qr_data)
+        if error:
+            record_scan(None, request.user, gate, error[0], started)
+            return Response({
+                'valid': False,
+                'message': error[1]
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        if ticket:
-            # Vérifier que l'utilisateur est l'organisateur de l'événement
-            if ticket.event.organizer != request.user:
-                return Response({
-                    'valid': False,
-                    'message': 'Vous n\'êtes pas autorisé à valider ce billet'
-                }, status=status.HTTP_403_FORBIDDEN)
-            
-            # Vérifier le statut de l'événement
-            if ticket.event.status != 'ongoing':
-                status_messages = {
-                    'upcoming': 'L\'événement n\'a pas encore commencé',
-                    'completed': 'L\'événement est déjà terminé',
-                    'cancelled': 'L\'événement a été annulé',
-                    'deleted': 'L\'événement a été supprimé'
-                }
-                return Response({
-                    'valid': False,
-                    'message': status_messages.get(ticket.event.status, 'L\'événement n\'est pas en cours')
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            serializer = self.get_serializer(ticket)
-            if ticket.status == 'confirmed':
-                ticket.status = 'used'
-                ticket.used_at = timezone.now()
-                ticket.save()
-            
+        # Vérifier que l'utilisateur est l'organisateur de l'événement
+        if ticket.event.organizer_id != request.user.id:
+            record_scan(ticket, request.user, gate, 'forbidden', started)
             return Response({
-                'valid': True,
-                'message': message,
-                'ticket': serializer.data
-            })
-        else:
+                'valid': False,
+                'message': 'Vous n\'êtes pas autorisé à valider ce billet'
+            }, status=status.HTTP_403_FORBIDDEN)
+        
+        # Vérifier le statut de l'événement
+        if ticket.event.status != 'ongoing':
+            record_scan(ticket, request.user, gate, 'event_closed', started)
+            return Response({
+                'valid': False,
+                'message': EVENT_STATUS_MESSAGES.get(ticket.event.status, 'L\'événement n\'est pas en cours')
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Billet déjà passé, annulé ou expiré : journalisé contre le billet (doubles scans)
+        status_error = ticket.get_status_error()
+        # Une seule porte peut faire passer le billet de confirmed à used
+        if status_error is None and not check_in(ticket):
+            ticket.refresh_from_db(fields=['status'])
+            status_error = ticket.get_status_error() or 'Ce billet a déjà été utilisé'
+        if status_error:
+            result = 'already_used' if ticket.status in ('used', 'confirmed') else ticket.status
+            record_scan(ticket, request.user, gate, result, started)
             return Response({
                 'valid': False,
-                'message': message
+                'message': status_error
             }, status=status.HTTP_400_BAD_REQUEST)
+        
+        record_scan(ticket, request.user, gate, 'admitted', started)
+        return Response({
+            'valid': True,
+            'message': 'Billet valide',
+            'ticket': self.get_serializer(ticket).data
+        })
+    
+    @action(detail=False, methods=['post'])
+    def validate_qr_batch(self, request):
+        """Valider plusieurs QR codes en une requête (tourniquets) - organisateurs seulement"""
+        qr_data = request.data.get('qr_data')
+        if not isinstance(qr_data, list) or not qr_data:
+            return Response({'error': 'Données QR manquantes'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(qr_data) > self.max_qr_batch:
+            return Response({'error': f'Maximum {self.max_qr_batch} QR codes par envoi'}, status=status.HTTP_400_BAD_REQUEST)
+        if not all(isinstance(payload, str) for payload in qr_data):
+            return Response({'error': 'Format de QR code invalide'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        gate = str(request.data.get('gate') or '')[:50]
+        results = validate_batch(qr_data, request.user, gate)
+        return Response({
+            'admitted': sum(1 for result in results if result['valid']),
+            'rejected': sum(1 for result in results if not result['valid']),
+            'results': results
+        })
     
-
 
 class OrderViewSet(viewsets.ModelViewSet):
     serializer_class = OrderSerializer
     
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user)
+        return with_order_plan(Order.objects.filter(user=self.request.user), self.request.user)
 
     def perform_create(self, serializer):
         """Créer une commande et générer automatiquement les billets si paiement immédiat"""
@@ -670,7 +790,9 @@ class FavoriteViewSet(viewsets.ModelViewSet):
     serializer_class = FavoriteSerializer
     
     def get_queryset(self):
-        return Favorite.objects.filter(user=self.request.user)
+        return Favorite.objects.filter(user=self.request.user).prefetch_related(
+            nested_event_prefetch(self.request.user)
+        )
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -694,8 +816,9 @@ class FavoriteViewSet(viewsets.ModelViewSet):
         except Event.DoesNotExist:
             return Response({'message': 'Événement non trouvé'}, status=status.HTTP_404_NOT_FOUND)
 
-class WalletViewSet(viewsets.ReadOnlyModelViewSet):
+class WalletViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = WalletTransactionSerializer
+    replica_actions = ['list']
     
     def get_queryset(self):
         return WalletTransaction.objects.filter(user=self.request.user)
@@ -709,25 +832,37 @@ class WalletViewSet(viewsets.ReadOnlyModelViewSet):
         if not amount or Decimal(str(amount)) <= 0:
             return Response({'error': 'Montant invalide'}, status=status.HTTP_400_BAD_REQUEST)
         
-        balance_before = request.user.wallet_balance
-        request.user.wallet_balance += Decimal(str(amount))
-        request.user.save()
-        
-        WalletTransaction.objects.create(
-            user=request.user,
-            transaction_type='deposit',
-            amount=Decimal(str(amount)),
-            balance_before=balance_before,
-            balance_after=request.user.wallet_balance,
-            description=f"Dépôt de {amount} BIF"
-        )
+        post_entry([
+            Leg(request.user, Decimal(str(amount)), 'deposit', f"Dépôt de {amount} BIF"),
+            Leg(EXTERNAL, -Decimal(str(amount)), 'deposit', f"Dépôt de {amount} BIF"),
+        ])
         
         return Response({
             'message': 'Dépôt réussi',
-            'balance': request.user.wallet_balance
+            'balance': balance_of(request.user)
         })
     
     @action(detail=False, methods=['get'])
     def balance(self, request):
         """Obtenir le solde du wallet"""
-        return Response({'balance': request.user.wallet_balance})
\ No newline at end of file
+        return Response({'balance': balance_of(request.user)})
+
+class DefaultAvatarView(APIView):
+    """Avatar par défaut partagé (events.avatars) : public, rendu une fois, mis en cache par les clients"""
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+    renderer_classes = [PNGRenderer, SVGRenderer]
+
+    def get(self, request, initials, color, fmt):
+        if not is_valid_avatar(initials, color):
+            raise Http404
+        etag = avatar_etag(initials, color, fmt)
+        if_none_match = request.headers.get('If-None-Match', '')
+        if if_none_match.strip() == '*' or etag in parse_etags(if_none_match):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(render_avatar(initials, color, fmt), content_type=AVATAR_CONTENT_TYPES[fmt])
+        response['ETag'] = etag
+        # L'URL ne désigne qu'une seule image
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response